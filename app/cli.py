@@ -0,0 +1,153 @@
+"""
+Maintenance commands, run with the flask CLI:
+
+    FLASK_APP=app.app flask partition-voters --strategy range --width 25
+    FLASK_APP=app.app flask partition-status
+    FLASK_APP=app.app flask backfill-search-keys
+    FLASK_APP=app.app flask backfill-mobile-keys
+    FLASK_APP=app.app flask compact-star-logs --keep-days 90 --export star_logs_2024.csv.gz
+    FLASK_APP=app.app flask vendor-assets
+    FLASK_APP=app.app flask sqlite-maintenance
+"""
+import click
+from sqlalchemy import update
+
+from app.database import db
+from app.models.voter import Voter
+from app.utils import partitioning, star_history
+from app.utils.assets import vendor_assets
+from app.utils.sqlite_tuning import is_file_database, run_maintenance
+from app.utils.ingest import looks_like_booth_name
+from app.utils.events import publish_data_change
+from app.utils.search_keys import voter_search_keys
+from app.utils.mobile_numbers import mobile_keys
+
+
+def register_commands(app):
+    def notify_workers():
+        # The commands run in their own process: the workers' search caches and name indexes are told over the event backend
+        if not publish_data_change():
+            click.echo('The workers could not be notified (EVENTS_BACKEND is memory, or see the log): '
+                       'restart them so that searches see the changes')
+
+    @app.cli.command('partition-voters')
+    @click.option('--strategy', type=click.Choice(partitioning.STRATEGIES), default='range', show_default=True,
+                  help='range: one partition per block of booths; list: one partition per booth')
+    @click.option('--width', type=int, default=25, show_default=True, help='booths per partition for range partitioning')
+    @click.option('--drop-old', is_flag=True, help='drop the unpartitioned tables after copying them')
+    def partition_voters(strategy, width, drop_old):
+        """Move voters and star_logs to tables partitioned by booth number (PostgreSQL only)."""
+        if width < 1:
+            raise click.BadParameter('width must be at least 1', param_hint='--width')
+        try:
+            created = partitioning.migrate(db.engine, strategy=strategy, width=width, drop_old=drop_old)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Created {len(created)} partitions: {", ".join(created)}')
+        if not drop_old:
+            click.echo('The previous tables are kept as voters_unpartitioned and star_logs_unpartitioned')
+        click.echo('Restart the application workers so that they pick up the partitioned tables')
+
+    @app.cli.command('partition-status')
+    def partition_status():
+        """List the partitions of voters and star_logs with estimated row counts."""
+        rows = partitioning.partition_status(db.engine)
+        if not rows:
+            click.echo('The voters table is not partitioned')
+            return
+        for name, bound, estimate in rows:
+            click.echo(f'{name:<32} {bound:<40} ~{max(estimate, 0)} rows')
+
+    @app.cli.command('backfill-search-keys')
+    @click.option('--batch-size', type=int, default=2000, show_default=True)
+    @click.option('--all', 'recompute_all', is_flag=True, help='recompute keys that are already set')
+    def backfill_search_keys(batch_size, recompute_all):
+        """Compute the transliterated name keys of voters loaded before they existed."""
+        query = db.session.query(Voter.id, Voter.first_name, Voter.father_name, Voter.surname, Voter.full_name)
+        if not recompute_all:
+            query = query.filter(Voter.first_name_key.is_(None), Voter.father_name_key.is_(None), Voter.surname_key.is_(None))
+        last_id = 0
+        updated = 0
+        while True:
+            rows = query.filter(Voter.id > last_id).order_by(Voter.id).limit(batch_size).all()
+            if not rows:
+                break
+            values = []
+            for voter_id, first_name, father_name, surname, full_name in rows:
+                parts = (part if part and not looks_like_booth_name(part) else '' for part in (first_name, father_name, surname))
+                values.append({'id': voter_id, **voter_search_keys(*parts, full_name)})
+            db.session.execute(update(Voter), values)
+            db.session.commit()
+            updated += len(values)
+            last_id = rows[-1][0]
+            click.echo(f'{updated} voters updated')
+        click.echo(f'Done: search keys computed for {updated} voters')
+        notify_workers()
+
+    @app.cli.command('backfill-mobile-keys')
+    @click.option('--batch-size', type=int, default=5000, show_default=True)
+    @click.option('--all', 'recompute_all', is_flag=True, help='recompute numbers that are already normalized')
+    def backfill_mobile_keys(batch_size, recompute_all):
+        """Store the normalized and reversed mobile numbers of voters loaded before they existed."""
+        query = db.session.query(Voter.id, Voter.mobile_no).filter(Voter.mobile_no.isnot(None), Voter.mobile_no != '')
+        if not recompute_all:
+            query = query.filter(Voter.mobile_norm.is_(None))
+        last_id = 0
+        scanned = normalized = 0
+        while True:
+            rows = query.filter(Voter.id > last_id).order_by(Voter.id).limit(batch_size).all()
+            if not rows:
+                break
+            values = [{'id': voter_id, **mobile_keys(mobile_no)} for voter_id, mobile_no in rows]
+            db.session.execute(update(Voter), values)
+            db.session.commit()
+            scanned += len(values)
+            normalized += sum(1 for value in values if value['mobile_norm'])
+            last_id = rows[-1][0]
+            click.echo(f'{scanned} voters scanned')
+        click.echo(f'Done: {normalized} of {scanned} mobile numbers normalized; the rest are not 10-digit numbers')
+        notify_workers()
+
+    @app.cli.command('compact-star-logs')
+    @click.option('--keep-days', type=int, default=None,
+                  help='days of full history to keep (default: STAR_LOG_KEEP_DAYS)')
+    @click.option('--archive-table/--no-archive-table', default=True, show_default=True,
+                  help='copy compacted logs to the star_log_archive table')
+    @click.option('--export', 'export_path', type=click.Path(dir_okay=False),
+                  help='append compacted logs to this gzip-compressed CSV file')
+    @click.option('--batch-size', type=int, default=500, show_default=True, help='voters per transaction')
+    def compact_star_logs(keep_days, archive_table, export_path, batch_size):
+        """Fold star logs older than the retention window into per-voter summaries."""
+        if keep_days is None:
+            keep_days = app.config['STAR_LOG_KEEP_DAYS']
+        if keep_days < 0:
+            raise click.BadParameter('keep-days cannot be negative', param_hint='--keep-days')
+        if not archive_table and not export_path:
+            raise click.UsageError('Compacted logs would be lost; keep --archive-table or pass --export')
+        cutoff = star_history.retention_cutoff(db.session, keep_days)
+        click.echo(f'Compacting star logs older than {cutoff:%Y-%m-%d %H:%M}')
+        voters, compacted = star_history.compact_star_logs(
+            cutoff, archive_table=archive_table, export_path=export_path, batch_size=batch_size,
+            progress=lambda voters, logs: click.echo(f'{voters} voters, {logs} logs compacted'),
+        )
+        click.echo(f'Done: {compacted} logs of {voters} voters compacted')
+
+    @app.cli.command('vendor-assets')
+    @click.option('--force', is_flag=True, help='download files that are already present again')
+    def vendor_assets_command(force):
+        """Download the pinned CSS/JS libraries into static/vendor so they are served fingerprinted."""
+        try:
+            written = vendor_assets(app.static_folder, force=force, log=click.echo)
+        except (OSError, ValueError) as e:
+            raise click.ClickException(f'Download failed: {e}')
+        click.echo(f'Done: {len(written)} files downloaded')
+
+    @app.cli.command('sqlite-maintenance')
+    def sqlite_maintenance():
+        """Analyze every table and truncate the write-ahead log of a SQLite database."""
+        if not is_file_database(db.engine):
+            raise click.ClickException('The database is not a SQLite file')
+        busy, frames, checkpointed = run_maintenance(db.engine, analyze=True, truncate=True)
+        if busy:
+            click.echo('Readers kept the write-ahead log busy; it was checkpointed but not truncated')
+        click.echo(f'Done: statistics refreshed, {checkpointed} of {frames} WAL frames checkpointed')
@@ -0,0 +1,63 @@
+import hmac
+
+from flask import Blueprint, current_app, request, redirect, url_for, flash, render_template, abort
+from flask_login import login_required, current_user
+from app.utils.metrics import render_metrics
+from app.utils.profiler import profile_store
+from app.utils.search_cache import search_cache
+
+admin_bp = Blueprint('admin', __name__)
+
+
+def metrics_authorized():
+    """Main users may read metrics from the browser; scrapers use the METRICS_TOKEN bearer token"""
+    if current_user.is_authenticated and current_user.role == 'main':
+        return True
+    token = current_app.config.get('METRICS_TOKEN')
+    auth_header = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(auth_header, f'Bearer {token}')
+
+
+@admin_bp.route('/metrics')
+def metrics():
+    if not metrics_authorized():
+        if current_user.is_authenticated:
+            flash('Only main user can view metrics', 'error')
+            return redirect(url_for('voter.search'))
+        return current_app.response_class('Unauthorized\n', status=401, mimetype='text/plain')
+    
+    cache = search_cache.stats()
+    body = render_metrics(extra=[
+        ('voter_search_cache_hits_total', 'counter', 'Live search results served from the cache.', cache['hits']),
+        ('voter_search_cache_misses_total', 'counter', 'Live searches that queried the database.', cache['misses']),
+        ('voter_search_cache_not_modified_total', 'counter', 'Live searches answered with 304 Not Modified.', cache['not_modified']),
+        ('voter_search_cache_entries', 'gauge', 'Results currently held in the search cache.', cache['entries']),
+        ('voter_data_generation', 'gauge', 'Data generation counter of this worker.', cache['generation']),
+    ])
+    return current_app.response_class(body, mimetype='text/plain; version=0.0.4')
+
+
+@admin_bp.route('/admin/profiles')
+@login_required
+def profiles():
+    # Only main user can view request profiles
+    if current_user.role != 'main':
+        flash('Only main user can view request profiles', 'error')
+        return redirect(url_for('voter.search'))
+    
+    return render_template('admin/profiles.html', profiles=profile_store.all(),
+                           enabled=current_app.config['PROFILER_ENABLED'])
+
+
+@admin_bp.route('/admin/profiles/<int:profile_id>')
+@login_required
+def profile_detail(profile_id):
+    # Only main user can view request profiles
+    if current_user.role != 'main':
+        flash('Only main user can view request profiles', 'error')
+        return redirect(url_for('voter.search'))
+    
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        abort(404)
+    return render_template('admin/profile_detail.html', profile=profile)
@@ -2,7 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from flask_login import login_user, logout_user, login_required, current_user
 from app.models.user import User
 from app.database import db
-from werkzeug.security import check_password_hash
+from app.utils.passwords import PasswordBusy, needs_rehash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -15,7 +15,21 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.is_active and check_password_hash(user.password, password):
+        try:
+            valid = bool(user and user.is_active and user.check_password(password))
+        except PasswordBusy:
+            flash('Too many people are logging in right now. Please try again in a moment.', 'error')
+            return render_template('auth/login.html'), 503
+        
+        if valid:
+            # Move the stored hash to the current hashing policy while the plain password is at hand
+            if needs_rehash(user.password):
+                try:
+                    user.set_password(password)
+                    db.session.commit()
+                except PasswordBusy:
+                    # Optional; the hash is moved on a later login
+                    pass
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page) if next_page else redirect(url_for('voter.search'))
@@ -41,7 +55,12 @@ def change_password():
         confirm_password = request.form.get('confirm_password')
         
         # Verify old password
-        if not check_password_hash(current_user.password, old_password):
+        try:
+            valid = current_user.check_password(old_password)
+        except PasswordBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('auth/change_password.html'), 503
+        if not valid:
             flash('Old password is incorrect', 'error')
             return render_template('auth/change_password.html')
         
@@ -51,7 +70,11 @@ def change_password():
             return render_template('auth/change_password.html')
         
         # Update password
-        current_user.set_password(new_password)
+        try:
+            current_user.set_password(new_password)
+        except PasswordBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('auth/change_password.html'), 503
         db.session.commit()
         flash('Password updated successfully', 'success')
         return redirect(url_for('voter.search'))
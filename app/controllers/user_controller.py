@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from app.models.user import User
 from app.database import db
+from app.utils.passwords import PasswordBusy
 from werkzeug.security import generate_password_hash
 
 user_bp = Blueprint('user', __name__)
@@ -51,7 +52,11 @@ def create_user():
             username=username,
             role=role
         )
-        user.set_password(password)
+        try:
+            user.set_password(password)
+        except PasswordBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('user/create.html'), 503
         
         db.session.add(user)
         db.session.commit()
@@ -82,7 +87,11 @@ def edit_user(user_id):
         # Handle password change
         new_password = request.form.get('password')
         if new_password:
-            user.set_password(new_password)
+            try:
+                user.set_password(new_password)
+            except PasswordBusy:
+                flash('The server is busy. Please try again in a moment.', 'error')
+                return render_template('user/edit.html', user=user, is_self_edit=is_self_edit), 503
         
         # Handle deactivation (only for sub users)
         if not is_self_edit and user.role != 'main':
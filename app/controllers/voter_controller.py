@@ -1,8 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, session
 from flask_login import login_required, current_user
 from app.models.voter import Voter
 from app.models.user import User
-from app.models.star_log import StarLog
+from app.models.mapping_profile import MappingProfile
+from app.models.ingest_ledger import IngestLedger
+from app.models.star_log_summary import StarLogSummary
 from app.database import db
 import pandas as pd
 import os
@@ -11,11 +13,31 @@ import re
 from datetime import datetime
 from openpyxl.styles import Font, PatternFill
 from openpyxl.styles.colors import Color
+from app.utils.column_mapping import FIELD_KEYWORDS, normalize_headers, header_signature, detect_column_mapping, compute_fallbacks
+from app.utils.search_cache import search_cache, bump_data_generation
+from app.utils.ingest import discover_units, read_headers, parse_units, iter_chunks, hash_chunk
+from app.utils.partitioning import is_partitioned, ensure_partitions, partition_order, registered_voter_ids
+from app.utils.search_keys import name_search_condition
+from app.utils.mobile_numbers import mobile_search_condition
+from app.utils.fuzzy import get_name_index, invalidate_name_index, is_current
+from app.utils.events import broker, publish_star_change, publish_data_change, stream_star_events, busy_stream
+from app.utils.star_history import latest_raters, history_page, serialize_summary, HISTORY_PAGE_SIZE
+from app.utils.replica import read_replica, use_replica, used_replica
+from app.utils.star_ratings import change_star_rating, RatingConflict, VoterNotFound
+from app.utils.duplicates import find_duplicates, POLICIES as DUPLICATE_POLICIES
+from app.utils.exports import report_row, filter_star_status, start_export_job, delete_export_job, fail_stale_export_jobs, GROUP_BY, FILE_FORMATS
+from app.utils.uploads import upload_digest
+from app.utils.bulk_edit import filter_conditions, parse_assignments, preview_bulk_edit, apply_bulk_edit
+from app.models.export_job import ExportJob
+import time
 
 voter_bp = Blueprint('voter', __name__)
 
 # Allowed file extensions
-ALLOWED_EXTENSIONS = {'xlsx', 'xls'}
+ALLOWED_EXTENSIONS = {'xlsx', 'xls', 'zip'}
+
+# Name parts searched through their transliterated keys
+NAME_KEY_COLUMNS = (Voter.first_name_key, Voter.father_name_key, Voter.surname_key)
 
 
 def allowed_file(filename):
@@ -23,286 +45,25 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def process_excel_file(file_path):
-    """Process Excel file and extract voter data without restrictions"""
-    try:
-        # Read Excel file
-        df = pd.read_excel(file_path)
-        
-        # Check if voter ID column exists
-        voter_id_column_found = False
-        for col in df.columns:
-            col_lower = col.lower().strip()
-            if any(keyword in col_lower for keyword in ['voter', 'id', 'voterid', 'voter_id', 'voter id', 'srno', 'voter srno', 'voter_srno', 'votersrno', 'voting card no', 'voting card no.', 'voting_card_no']):
-                voter_id_column_found = True
-                break
-        
-        if not voter_id_column_found:
-            raise ValueError('No Voter ID column found in Excel file. Please include a column with voter identification (e.g., voter_id, srno, voting card no, etc.)')
-        
-        # Get all column names and map them to our expected fields based on similarity
-        column_mapping = {}
-        available_columns = [col.lower().strip() for col in df.columns]
-        
-        # Map available columns to our expected fields
-        field_keywords = {
-            'voter_id': ['voter', 'id', 'voterid', 'voter_id', 'voter id', 'srno', 'voter srno', 'voter_srno', 'votersrno', 'voting card no', 'voting card no.', 'voting_card_no', 'voting card no.', 'votingcardno'],
-            'booth_no': ['booth no.', 'booth_no', 'booth no', 'boothno', 'booth no.', 'booth_no.', 'booth'],
-            'first_name': ['englishname', 'english_name', 'first', 'first_name', 'first name'],  # Prioritize EnglishName for actual names
-            'father_name': ['middle', 'middle_name', 'middle name', 'father', 'father_name', 'father name'],
-            'surname': ['last name', 'surname', 'last', 'last_name', 'last name'],
-            'full_name': ['full name', 'full_name', 'fullname', 'complete name'],  # Don't map general 'name' or yadibhag name to full name
-            'mobile_no': ['mobile no.', 'mobile number', 'phone', 'mobile', 'phone number', 'mobile_no.', 'mobile no', 'mobile_no'],
-            'yadibhag_no': ['yadibhag no', 'yadibhag_no', 'yadibhag no.', 'yadibhag', 'yadi no', 'yadi_no'],
-            'yadibhag_name': ['yadibhag name', 'yadibhag_name', 'yadibhag name', 'yadibhagname', 'yadi name', 'yadi_name'],
-            'voter_srno': ['voter srno', 'voter_srno', 'voter serial', 'voter_serial', 'votersrno', 'serial no', 'serial_no'],
-            'age': ['age'],
-            'gender': ['gender'],
-            'voting_card_no': ['voting card no.', 'voting card no', 'voting_card_no', 'votingcardno', 'voting card', 'card no'],
-            'karyakarta': ['karyakarta', 'karyakarta']
-        }
-        
-        # Find matching columns
-        used_columns = set()
-        for field, keywords in field_keywords.items():
-            for col in df.columns:
-                col_lower = col.lower().strip()
-                if col_lower in keywords or any(keyword in col_lower for keyword in keywords):
-                    if col not in used_columns:
-                        column_mapping[col] = field
-                        used_columns.add(col)
-                        break
-        
-        # Rename columns based on mapping
-        renamed_df = df.rename(columns=column_mapping)
-        
-        # Process each row
-        voters_data = []
-        for index, row in renamed_df.iterrows():
-            # Extract data - no validation, accept any data
-            # Only use actual voter ID from Excel, don't generate one
-            voter_id_val = row.get('voter_id')
-            if voter_id_val is None or pd.isna(voter_id_val) or str(voter_id_val).strip() == '':
-                raise ValueError(f'Voter ID is missing in row {index + 1}. All voters must have a valid ID.')
-            voter_data = {
-                'voter_id': str(voter_id_val).strip(),
-                'booth_no': None,
-                'first_name': str(row.get('first_name', '')).strip() if pd.notna(row.get('first_name', '')) else '',
-                'father_name': str(row.get('father_name', '')).strip() if pd.notna(row.get('father_name', '')) else '',
-                'surname': str(row.get('surname', '')).strip() if pd.notna(row.get('surname', '')) else '',
-                'full_name': str(row.get('full_name', '')).strip() if pd.notna(row.get('full_name', '')) else '',
-                'mobile_no': str(row.get('mobile_no', '')).strip() if pd.notna(row.get('mobile_no', '')) else '',
-                'yadibhag_no': str(row.get('yadibhag_no', '')).strip() if pd.notna(row.get('yadibhag_no', '')) else '',
-                'yadibhag_name': str(row.get('yadibhag_name', '')).strip() if pd.notna(row.get('yadibhag_name', '')) else '',
-                'voter_srno': str(row.get('voter_srno', '')).strip() if pd.notna(row.get('voter_srno', '')) else '',
-                'age': None,
-                'gender': str(row.get('gender', '')).strip() if pd.notna(row.get('gender', '')) else '',
-                'voting_card_no': str(row.get('voting_card_no', '')).strip() if pd.notna(row.get('voting_card_no', '')) else '',
-                'karyakarta': str(row.get('karyakarta', '')).strip() if pd.notna(row.get('karyakarta', '')) else ''
-            }
-            
-            # Extract age if available
-            age_val = row.get('age')
-            if age_val is not None and pd.notna(age_val):
-                try:
-                    voter_data['age'] = int(age_val)
-                except (ValueError, TypeError):
-                    # If age is not numeric, ignore it
-                    pass
-            
-            # Extract booth number if available and is numeric
-            booth_val = row.get('booth_no')
-            if booth_val is not None and pd.notna(booth_val):
-                try:
-                    voter_data['booth_no'] = int(booth_val)
-                except (ValueError, TypeError):
-                    # If booth number is not numeric, ignore it
-                    pass
-            
-            # Extract specific data from other columns if not already mapped
-            # Look for name-related fields
-            if not voter_data['first_name']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    # Only use EnglishName or first name columns, not general 'name' which may contain booth names
-                    if col_lower in ['englishname', 'english_name', 'first', 'first_name', 'first name'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            val_str = str(val).strip()
-                            # Skip if it looks like a booth name or yadibhag name
-                            if not any(indicator in val_str.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                                voter_data['first_name'] = val_str
-                                break
-            
-            # Look for father name/middle name
-            if not voter_data['father_name']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['middle', 'father name', 'father', 'middle name', 'middle_name', 'father_name'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            val_str = str(val).strip()
-                            # Skip if it looks like a booth name or yadibhag name
-                            if not any(indicator in val_str.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                                voter_data['father_name'] = val_str
-                                break
-            
-            # Look for surname/last name
-            if not voter_data['surname']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['last name', 'surname', 'last', 'last_name', 'last_name'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            val_str = str(val).strip()
-                            # Skip if it looks like a booth name or yadibhag name
-                            if not any(indicator in val_str.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                                voter_data['surname'] = val_str
-                                break
-            
-            # Look for full name
-            if not voter_data['full_name']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    # Only look for actual full name fields, not general 'name' which might contain booth names
-                    # Exclude 'name' column which often contains booth names in voter data
-                    if col_lower in ['full name', 'fullname', 'full_name'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            val_str = str(val).strip()
-                            # Skip if it looks like a booth name or yadibhag name
-                            if not any(indicator in val_str.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                                voter_data['full_name'] = val_str
-                                break
-            
-            # Look for mobile number
-            if not voter_data['mobile_no']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['mobile no.', 'mobile number', 'phone', 'mobile', 'phone number', 'mobile_no.', 'mobile no'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            voter_data['mobile_no'] = str(val).strip()
-                            break
-            
-            # Look for yadibhag number
-            if not voter_data['yadibhag_no']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['yadibhag no', 'yadibhag_no', 'yadibhag no.', 'yadibhag'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            voter_data['yadibhag_no'] = str(val).strip()
-                            break
-            
-            # Look for yadibhag name
-            if not voter_data['yadibhag_name']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['yadibhag name', 'yadibhag_name', 'yadibhag name'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            val_str = str(val).strip()
-                            # Skip if it looks like a booth name
-                            if not any(indicator in val_str.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                                # Only set yadibhag_name if it's not already set as full_name
-                                if not voter_data['full_name'] or voter_data['full_name'] == '':
-                                    # Don't set yadibhag name as full name
-                                    pass
-                                voter_data['yadibhag_name'] = val_str
-                                break
-            
-            # Look for voter serial number
-            if not voter_data['voter_srno']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['voter srno', 'voter_srno', 'voter serial', 'voter_serial'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            voter_data['voter_srno'] = str(val).strip()
-                            break
-            
-            # Look for age
-            if voter_data['age'] is None:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['age'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            try:
-                                voter_data['age'] = int(val)
-                                break
-                            except (ValueError, TypeError):
-                                pass
-            
-            # Look for gender
-            if not voter_data['gender']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['gender'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            voter_data['gender'] = str(val).strip()
-                            break
-            
-            # Look for voting card number
-            if not voter_data['voting_card_no']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['voting card no.', 'voting card no', 'voting_card_no', 'voting card', 'card no', 'card_no'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            voter_data['voting_card_no'] = str(val).strip()
-                            break
-            
-            # Look for full name (constructed from other name fields if no explicit full name field exists)
-            if not voter_data['full_name']:
-                # Try to construct full name from first, middle, and last name
-                first_name = voter_data.get('first_name', '')
-                father_name = voter_data.get('father_name', '')  # Using middle name as father name
-                surname = voter_data.get('surname', '')
-                
-                full_name_parts = []
-                if first_name and not any(indicator in first_name.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                    full_name_parts.append(first_name)
-                if father_name and not any(indicator in father_name.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                    full_name_parts.append(father_name)
-                if surname and not any(indicator in surname.lower() for indicator in ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको', 'कपूर']):
-                    full_name_parts.append(surname)
-                
-                if full_name_parts:
-                    voter_data['full_name'] = ' '.join(full_name_parts)
-            
-            # Look for karyakarta
-            if not voter_data['karyakarta']:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    if col_lower in ['karyakarta'] and col not in column_mapping:
-                        val = row.get(col)
-                        if val is not None and pd.notna(val):
-                            voter_data['karyakarta'] = str(val).strip()
-                            break
-            
-            # Try to extract booth number from any column if not already set
-            if voter_data['booth_no'] is None:
-                for col in df.columns:
-                    col_lower = col.lower().strip()
-                    # Check for booth-related column names that might not have been mapped
-                    if any(keyword in col_lower for keyword in ['booth no.', 'booth_no', 'booth no', 'boothno', 'booth no.', 'booth_no.', 'booth']) and col not in column_mapping:
-                        booth_val = row.get(col)
-                        if booth_val is not None and pd.notna(booth_val):
-                            try:
-                                voter_data['booth_no'] = int(booth_val)
-                                break
-                            except (ValueError, TypeError):
-                                pass
-            
-            voters_data.append(voter_data)
-        
-        return voters_data
-        
-    except Exception as e:
-        raise e
+def get_mapping_profile(columns):
+    """Return the saved mapping profile for a header row, detecting and saving it on first sight"""
+    headers = normalize_headers(columns)
+    signature = header_signature(columns)
+    profile = MappingProfile.query.filter_by(signature=signature).first()
+    if not profile:
+        mapping = detect_column_mapping(headers)
+        profile = MappingProfile(
+            signature=signature,
+            headers=headers,
+            mapping=mapping,
+            fallbacks=compute_fallbacks(headers, mapping),
+            created_by=current_user.id if current_user.is_authenticated else None
+        )
+        db.session.add(profile)
+    profile.use_count = (profile.use_count or 0) + 1
+    profile.last_used_at = datetime.now()
+    db.session.commit()
+    return profile
 
 
 @voter_bp.route('/')
@@ -313,128 +74,261 @@ def index():
 
 @voter_bp.route('/search')
 @login_required
+@read_replica
 def search():
-    # Get all search parameters
+    # Get the search parameters that choose the search path; scope_conditions() and field_condition() read the rest
     query = request.args.get('query', '')
-    voter_id = request.args.get('voter_id', '')
     full_name = request.args.get('full_name', '')
-    booth_no = request.args.get('booth_no', '')
-    mobile_no = request.args.get('mobile_no', '')
-    yadibhag_no = request.args.get('yadibhag_no', '')
-    yadibhag_name = request.args.get('yadibhag_name', '')
-    voter_srno = request.args.get('voter_srno', '')
-    age = request.args.get('age', '')
-    gender = request.args.get('gender', '')
-    voting_card_no = request.args.get('voting_card_no', '')
-    karyakarta = request.args.get('karyakarta', '')
     star_status = request.args.get('star_status', '')
+    booth_scope = request.args.get('booth_scope', '')
+    
+    # Live search repeats the same parameter combinations constantly; answer them from the result cache.
+    # Searches read from the replica bypass it: the cache is shared with users pinned to the primary
+    # after their own writes, and replica rows may be older than the generation they would be cached under
+    is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    cacheable = is_ajax and not use_replica()
+    if cacheable:
+        cache_key = search_cache.make_key(request.args)
+        generation = search_cache.generation
+        etag = search_cache.etag(cache_key)
+        # Weak comparison: compressed responses carry the ETag as a weak validator
+        if request.if_none_match.contains_weak(etag):
+            search_cache.record_not_modified()
+            return search_response(None, etag, status=304)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return search_response(cached, etag)
     
     # Build search query
     search_query = Voter.query
     
-    # Apply star status filter if specified
-    if star_status == 'with_stars':
-        search_query = search_query.filter(Voter.star_rating > 0)
-    elif star_status == 'without_stars':
-        search_query = search_query.filter(Voter.star_rating == 0)
+    # Apply the star status filter and the booth scope; on a partitioned voters table a
+    # booth scope only scans that booth's partition
+    try:
+        search_query = search_query.filter(*scope_conditions(request.args))
+    except ValueError as e:
+        flash(str(e), 'error')
+        return render_template('voter/search.html', voters=[])
     
-    # Check if any search parameter is provided
-    if any([query, voter_id, full_name, booth_no, mobile_no, voting_card_no, yadibhag_no, yadibhag_name, voter_srno, age, gender, karyakarta]):
-        # Create a list of OR conditions
-        or_conditions = []
-        
-        # Add individual field filters if provided
-        if voter_id:
-            # For voter_id, use exact match
-            or_conditions.append(Voter.voter_id == voter_id)
-        if full_name:
-            or_conditions.append(Voter.full_name.ilike(f'%{full_name}%'))
-        if mobile_no:
-            or_conditions.append(Voter.mobile_no.ilike(f'%{mobile_no}%'))
-        if booth_no:
-            try:
-                booth_no_int = int(booth_no)
-                or_conditions.append(Voter.booth_no == booth_no_int)
-            except ValueError:
-                flash('Invalid booth number', 'error')
-                # Return empty results if booth number is invalid
-                voters = []
-                return render_template('voter/search.html', voters=voters)
-        if yadibhag_no:
-            or_conditions.append(Voter.yadibhag_no.ilike(f'%{yadibhag_no}%'))
-        if yadibhag_name:
-            or_conditions.append(Voter.yadibhag_name.ilike(f'%{yadibhag_name}%'))
-        if voter_srno:
-            or_conditions.append(Voter.voter_srno.ilike(f'%{voter_srno}%'))
-        if age:
-            try:
-                age_int = int(age)
-                or_conditions.append(Voter.age == age_int)
-            except ValueError:
-                flash('Invalid age', 'error')
-                # Return empty results if age is invalid
-                voters = []
-                return render_template('voter/search.html', voters=voters)
-        if gender:
-            or_conditions.append(Voter.gender.ilike(f'%{gender}%'))
-        if voting_card_no:
-            # For voting card number, use exact match
-            or_conditions.append(Voter.voting_card_no == voting_card_no)
-        if karyakarta:
-            or_conditions.append(Voter.karyakarta.ilike(f'%{karyakarta}%'))
-        
-        # Apply general query filter (searches all fields) if provided
-        if query:
-            general_conditions = db.or_(
-                Voter.voter_id.ilike(f'%{query}%'),
-                Voter.full_name.ilike(f'%{query}%'),
-                Voter.mobile_no.ilike(f'%{query}%'),
-                Voter.yadibhag_no.ilike(f'%{query}%'),
-                Voter.yadibhag_name.ilike(f'%{query}%'),
-                Voter.voter_srno.ilike(f'%{query}%'),
-                Voter.karyakarta.ilike(f'%{query}%')
-            )
-            # If both specific and general filters exist, combine them with OR
-            if or_conditions:
-                or_conditions.append(general_conditions)
-                search_query = search_query.filter(db.or_(*or_conditions))
-            else:
-                # Only general query provided
-                search_query = search_query.filter(general_conditions)
-        elif or_conditions:
-            # Only specific filters provided
-            search_query = search_query.filter(db.or_(*or_conditions))
+    # Typo-tolerant name search ranks voters by similarity instead of filtering
+    fuzzy_pending = False
+    if request.args.get('mode') == 'fuzzy' and (full_name or query):
+        ranked = fuzzy_search(search_query, full_name or query, filtered=bool(star_status or booth_scope))
+        if ranked is None:
+            # The name index of this worker is still being built; answer with the exact name search meanwhile
+            fuzzy_pending = True
+        else:
+            voters, fuzzy_info = ranked
+            if is_ajax:
+                payload = {'voters': [dict(serialize_voter(voter), score=round(score, 3)) for voter, score in voters],
+                           'fuzzy': fuzzy_info}
+                if fuzzy_info.get('indexing') or not cacheable or used_replica():
+                    return uncached_search_response(payload)
+                search_cache.put(cache_key, payload, generation)
+                return search_response(payload, etag)
+            return render_template('voter/search.html', voters=[voter for voter, _ in voters])
+    
+    try:
+        condition = field_condition(request.args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        # Return empty results if a number is invalid
+        return render_template('voter/search.html', voters=[])
+    if condition is not None:
+        search_query = search_query.filter(condition)
     
     voters = search_query.order_by(Voter.full_name).limit(100).all()  # Limit results for performance
     
     # If request is AJAX, return JSON response
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        voters_data = []
-        for voter in voters:
-            voters_data.append({
-                'id': voter.id,
-                'voter_id': voter.voter_id,
-                'first_name': voter.first_name,
-                'father_name': voter.father_name,
-                'surname': voter.surname,
-                'full_name': voter.full_name,
-                'booth_no': voter.booth_no,
-                'mobile_no': voter.mobile_no,
-                'yadibhag_no': voter.yadibhag_no,
-                'yadibhag_name': voter.yadibhag_name,
-                'voter_srno': voter.voter_srno,
-                'age': voter.age,
-                'gender': voter.gender,
-                'voting_card_no': voter.voting_card_no,
-                'karyakarta': voter.karyakarta,
-                'star_display': voter.get_star_display(),
-                'star_rating': voter.star_rating
-            })
-        return jsonify({'voters': voters_data})
+    if is_ajax:
+        payload = {'voters': [serialize_voter(voter) for voter in voters]}
+        if fuzzy_pending:
+            return uncached_search_response(dict(payload, fuzzy={'indexing': True}))
+        if not cacheable or used_replica():
+            return uncached_search_response(payload)
+        search_cache.put(cache_key, payload, generation)
+        return search_response(payload, etag)
     
     return render_template('voter/search.html', voters=voters)
 
 
+def scope_conditions(args):
+    """Star status and booth scope filters of the search parameters; raises ValueError for an invalid booth"""
+    conditions = []
+    star_status = args.get('star_status', '')
+    if star_status == 'with_stars':
+        conditions.append(Voter.star_rating > 0)
+    elif star_status == 'without_stars':
+        conditions.append(Voter.star_rating == 0)
+    booth_scope = args.get('booth_scope', '')
+    if booth_scope:
+        try:
+            conditions.append(Voter.booth_no == int(booth_scope))
+        except ValueError:
+            raise ValueError('Invalid booth number')
+    return conditions
+
+
+def field_condition(args):
+    """
+    Field and general query filters of the search parameters as one condition, or None without any.
+
+    A voter matches when any of the given filters matches. Raises ValueError
+    for an invalid booth number or age.
+    """
+    query = args.get('query', '')
+    voter_id = args.get('voter_id', '')
+    full_name = args.get('full_name', '')
+    booth_no = args.get('booth_no', '')
+    mobile_no = args.get('mobile_no', '')
+    yadibhag_no = args.get('yadibhag_no', '')
+    yadibhag_name = args.get('yadibhag_name', '')
+    voter_srno = args.get('voter_srno', '')
+    age = args.get('age', '')
+    gender = args.get('gender', '')
+    voting_card_no = args.get('voting_card_no', '')
+    karyakarta = args.get('karyakarta', '')
+    
+    # Create a list of OR conditions
+    or_conditions = []
+    
+    # Add individual field filters if provided
+    if voter_id:
+        # For voter_id, use exact match
+        or_conditions.append(Voter.voter_id == voter_id)
+    if full_name:
+        # Indexed prefix match on the transliterated name keys, so 'Ghanwat' also finds 'घनवट'
+        name_condition = name_search_condition(NAME_KEY_COLUMNS, full_name)
+        or_conditions.append(name_condition if name_condition is not None else Voter.full_name.ilike(f'%{full_name}%'))
+    if mobile_no:
+        # Indexed exact, leading or trailing digits match on the normalized number
+        mobile_condition = mobile_search_condition(Voter.mobile_norm, Voter.mobile_rev, mobile_no)
+        or_conditions.append(mobile_condition if mobile_condition is not None else Voter.mobile_no.ilike(f'%{mobile_no}%'))
+    if booth_no:
+        try:
+            or_conditions.append(Voter.booth_no == int(booth_no))
+        except ValueError:
+            raise ValueError('Invalid booth number')
+    if yadibhag_no:
+        or_conditions.append(Voter.yadibhag_no.ilike(f'%{yadibhag_no}%'))
+    if yadibhag_name:
+        or_conditions.append(Voter.yadibhag_name.ilike(f'%{yadibhag_name}%'))
+    if voter_srno:
+        or_conditions.append(Voter.voter_srno.ilike(f'%{voter_srno}%'))
+    if age:
+        try:
+            or_conditions.append(Voter.age == int(age))
+        except ValueError:
+            raise ValueError('Invalid age')
+    if gender:
+        or_conditions.append(Voter.gender.ilike(f'%{gender}%'))
+    if voting_card_no:
+        # For voting card number, use exact match
+        or_conditions.append(Voter.voting_card_no == voting_card_no)
+    if karyakarta:
+        or_conditions.append(Voter.karyakarta.ilike(f'%{karyakarta}%'))
+    
+    # General query filter (searches all fields), combined with the specific filters by OR
+    if query:
+        name_condition = name_search_condition(NAME_KEY_COLUMNS, query)
+        mobile_condition = mobile_search_condition(Voter.mobile_norm, Voter.mobile_rev, query)
+        or_conditions.append(db.or_(
+            Voter.voter_id.ilike(f'%{query}%'),
+            name_condition if name_condition is not None else Voter.full_name.ilike(f'%{query}%'),
+            mobile_condition if mobile_condition is not None else Voter.mobile_no.ilike(f'%{query}%'),
+            Voter.yadibhag_no.ilike(f'%{query}%'),
+            Voter.yadibhag_name.ilike(f'%{query}%'),
+            Voter.voter_srno.ilike(f'%{query}%'),
+            Voter.karyakarta.ilike(f'%{query}%')
+        ))
+    
+    if not or_conditions:
+        return None
+    return or_conditions[0] if len(or_conditions) == 1 else db.or_(*or_conditions)
+
+
+def serialize_voter(voter):
+    """JSON representation of a voter for live search results"""
+    return {
+        'id': voter.id,
+        'voter_id': voter.voter_id,
+        'first_name': voter.first_name,
+        'father_name': voter.father_name,
+        'surname': voter.surname,
+        'full_name': voter.full_name,
+        'booth_no': voter.booth_no,
+        'mobile_no': voter.mobile_no,
+        'yadibhag_no': voter.yadibhag_no,
+        'yadibhag_name': voter.yadibhag_name,
+        'voter_srno': voter.voter_srno,
+        'age': voter.age,
+        'gender': voter.gender,
+        'voting_card_no': voter.voting_card_no,
+        'karyakarta': voter.karyakarta,
+        'star_display': voter.get_star_display(),
+        'star_rating': voter.star_rating
+    }
+
+
+def fuzzy_search(search_query, text, filtered=False):
+    """
+    Rank voters by name similarity to text within the FUZZY_BUDGET_MS latency budget.
+
+    Returns [(voter, score)] best first and a dict describing the search, or
+    None while the worker's name index is still being built.
+    """
+    started = time.perf_counter()
+    config = current_app.config
+    index = get_name_index(ttl=config['FUZZY_INDEX_TTL'])
+    if index is None:
+        return None
+    limit = config['FUZZY_RESULTS']
+    # Star and booth filters are applied to the ranked candidates, so ask the index for more of them
+    ranked, truncated = index.search(text, limit=limit * 5 if filtered else limit, budget_ms=config['FUZZY_BUDGET_MS'])
+    scores = dict(ranked)
+    voters = search_query.filter(Voter.id.in_(scores)).all() if scores else []
+    voters.sort(key=lambda voter: (-scores[voter.id], voter.full_name or ''))
+    info = {
+        'truncated': truncated,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+    if not is_current(index):
+        # Searched the index from before the last data change while its replacement is built
+        info['indexing'] = True
+    return [(voter, scores[voter.id]) for voter in voters[:limit]], info
+
+
+def uncached_search_response(payload):
+    """
+    JSON search response that is neither cached nor given an ETag.
+
+    For results that a repeated search may answer differently under the same
+    data generation: read from the replica, or ranked while the name index
+    is being rebuilt.
+    """
+    response = jsonify(payload)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def search_response(payload, etag, status=200):
+    """JSON search response that browsers must revalidate with If-None-Match"""
+    response = jsonify(payload) if payload is not None else current_app.response_class(status=status)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@voter_bp.route('/search/cache_stats')
+@login_required
+def search_cache_stats():
+    # Only main user can view cache statistics
+    if current_user.role != 'main':
+        return jsonify({'success': False, 'message': 'Only main user can view cache statistics'}), 403
+    
+    return jsonify(search_cache.stats())
+
+
 @voter_bp.route('/upload', methods=['GET', 'POST'])
 @login_required
 def upload_excel():
@@ -456,73 +350,216 @@ def upload_excel():
         
         if file and allowed_file(file.filename):
             try:
-                # Save file temporarily in the system's temp directory
-                import tempfile
                 filename = secure_filename(file.filename)
-                temp_path = os.path.join(tempfile.gettempdir(), filename)
                 
-                file.save(temp_path)
+                # The file was spooled and hashed while the request streamed in (see app.utils.uploads), so
+                # identical uploads are recognised without a second read; the sheets are parsed from that buffer
+                file_hash, file_size = upload_digest(file)
                 
-                # Process the Excel file
-                voters_data = process_excel_file(temp_path)
+                previous = IngestLedger.query.filter_by(sha256=file_hash).first()
+                # An upload of this file that was interrupted part-way resumes from its checkpoint
+                resuming = previous is not None and previous.checkpoint_row is not None
+                if previous and not resuming and not request.form.get('force'):
+                    uploaded_by = previous.uploader.username if previous.uploader else 'unknown user'
+                    flash(f'This file was already uploaded on {previous.created_at.strftime("%Y-%m-%d %H:%M")} by {uploaded_by}: '
+                          f'added {previous.added_count} new voters, skipped {previous.skipped_count} duplicates', 'info')
+                    return redirect(url_for('voter.search'))
                 
-                # Check for duplicates before inserting
-                new_voters = []
-                skipped_count = 0
+                # Resolve the column mapping of every sheet, reusing a saved profile when the layout is known
+                units = discover_units(file.stream, filename)
+                jobs = []
+                profile_ids = []
+                ignored_sheets = []
+                for unit in units:
+                    headers = read_headers(unit)
+                    if not headers:
+                        # Skip blank sheets
+                        continue
+                    profile = get_mapping_profile(headers)
+                    if len(units) > 1 and 'voter_id' not in profile.mapping.values():
+                        # Notes or summary sheets in a multi-sheet workbook carry no voters
+                        ignored_sheets.append(unit.label)
+                        continue
+                    jobs.append((unit, profile.mapping, profile.fallbacks))
+                    profile_ids.append(profile.id)
                 
-                for voter_data in voters_data:
-                    existing_voter = Voter.query.filter_by(voter_id=voter_data['voter_id']).first()
-                    if existing_voter:
-                        # Skip duplicate voter
-                        skipped_count += 1
-                    else:
-                        # Create new voter
-                        new_voter = Voter(
-                            voter_id=voter_data['voter_id'],
-                            booth_no=voter_data['booth_no'],
-                            first_name=voter_data['first_name'],
-                            father_name=voter_data['father_name'],
-                            surname=voter_data['surname'],
-                            full_name=voter_data['full_name'],
-                            mobile_no=voter_data['mobile_no'],
-                            yadibhag_no=voter_data['yadibhag_no'],
-                            yadibhag_name=voter_data['yadibhag_name'],
-                            voter_srno=voter_data['voter_srno'],
-                            age=voter_data['age'],
-                            gender=voter_data['gender'],
-                            voting_card_no=voter_data['voting_card_no'],
-                            karyakarta=voter_data['karyakarta']
-                        )
-                        new_voters.append(new_voter)
+                if not jobs:
+                    raise ValueError('No sheets with data found in the uploaded file')
                 
-                # Bulk insert new voters
-                for voter in new_voters:
-                    db.session.add(voter)
+                # Process the sheets, in parallel worker processes when there are several
+                results = parse_units(jobs, current_app.config['INGEST_WORKERS'], file_size,
+                                      current_app.config['INGEST_PARALLEL_MIN_KB'] * 1024)
                 
+                # Resolve voter IDs repeated within the file before loading anything; the report lists every copy
+                duplicate_policy = request.form.get('duplicate_policy') or current_app.config['INGEST_DUPLICATE_POLICY']
+                duplicates = find_duplicates([(unit.label, rows) for (unit, _, _), rows in zip(jobs, results)], duplicate_policy)
+                if duplicates.report is not None:
+                    report_path = duplicate_report_path(file_hash[:16])
+                    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+                    # BOM so that Excel opens Marathi names as UTF-8
+                    duplicates.report.to_csv(report_path, index=False, encoding='utf-8-sig')
+                    session['duplicate_report'] = file_hash[:16]
+                    if duplicate_policy == 'reject' and duplicates.conflicts:
+                        raise ValueError(f'{duplicates.conflicts} voter IDs appear more than once with different details. '
+                                         f'Nothing was loaded; download the duplicate report below')
+                
+                # On a partitioned voters table create the partitions for new booths before inserting
+                partitioned = is_partitioned(db.engine)
+                if partitioned:
+                    ensure_partitions(db.engine, {record.booth_no for records in results for record in records})
+                
+                # Optionally hash the normalized rows in chunks; a chunk seen in an earlier upload only holds
+                # voters that were already loaded, so it is counted as skipped without querying each row
+                chunk_hashing = current_app.config['INGEST_CHUNK_HASHING']
+                chunk_size = current_app.config['INGEST_CHUNK_ROWS']
+                seen_chunks = set()
+                if chunk_hashing:
+                    for (hashes,) in db.session.query(IngestLedger.chunk_hashes).filter(IngestLedger.chunk_hashes.isnot(None)):
+                        # Ledgers without hashes may hold a JSON null rather than SQL NULL
+                        seen_chunks.update(hashes or [])
+                unchanged_chunks = 0
+                
+                # Rows are numbered in sheet order, so a checkpoint only carries over while the sheets parse the same way
+                total_rows = sum(len(rows) for rows in results)
+                if resuming and (previous.mapping_profile_ids != profile_ids or previous.total_rows != total_rows):
+                    resuming = False
+                if resuming:
+                    ledger = previous
+                    flash(f'Resuming an interrupted upload of this file after row {ledger.checkpoint_row} '
+                          f'({ledger.added_count} voters were already added)', 'info')
+                else:
+                    if previous:
+                        db.session.delete(previous)
+                        db.session.flush()
+                    ledger = IngestLedger(
+                        sha256=file_hash,
+                        filename=filename,
+                        file_size=file_size,
+                        total_rows=total_rows,
+                        added_count=0,
+                        skipped_count=0,
+                        sheet_counts=[[unit.label, len(rows), 0] for (unit, _, _), rows in zip(jobs, results)],
+                        mapping_profile_ids=profile_ids,
+                        chunk_hashes=[] if chunk_hashing else None,
+                        checkpoint_row=0,
+                        uploaded_by=current_user.id
+                    )
+                    db.session.add(ledger)
                 db.session.commit()
                 
-                # Clean up temp file
+                # Insert and commit chunk by chunk, moving the ledger checkpoint forward in the same transaction,
+                # so a recycled worker loses at most one chunk and each transaction stays small
+                start_row = ledger.checkpoint_row
+                sheet_counts = [list(counts) for counts in ledger.sheet_counts]
+                chunk_hashes = list(ledger.chunk_hashes or [])
+                position = 0
+                committed = False
                 try:
-                    os.remove(temp_path)
-                except OSError:
-                    # File might have already been removed or inaccessible
-                    pass
+                    for sheet_index, voters_data in enumerate(results):
+                        dropped = duplicates.dropped[sheet_index]
+                        sheet_start = position
+                        for chunk in iter_chunks(voters_data, chunk_size):
+                            chunk_start, position = position, position + len(chunk)
+                            if position <= start_row:
+                                # Committed before the interruption
+                                continue
+                            resumed_rows = max(start_row - chunk_start, 0)
+                            chunk = chunk[resumed_rows:]
+                            first_row = chunk_start - sheet_start + resumed_rows
+                            new_records = []
+                            chunk_hash = hash_chunk(chunk) if chunk_hashing else None
+                            if chunk_hash is not None and chunk_hash in seen_chunks:
+                                unchanged_chunks += 1
+                            else:
+                                # Check the whole chunk for voters that are already loaded with one query
+                                voter_ids = [record.voter_id for record in chunk]
+                                if partitioned:
+                                    # One registry lookup instead of probing the voter_id index of every partition
+                                    existing = registered_voter_ids(db.session, voter_ids)
+                                else:
+                                    existing = {voter_id for (voter_id,) in
+                                                db.session.query(Voter.voter_id).filter(Voter.voter_id.in_(voter_ids))}
+                                for row_index, record in enumerate(chunk, start=first_row):
+                                    if record.voter_id in existing or row_index in dropped:
+                                        # Skip voters already loaded and copies set aside by the duplicate policy
+                                        continue
+                                    existing.add(record.voter_id)
+                                    new_records.append(record)
+                                if partitioned:
+                                    # Insert booth by booth so that consecutive rows are routed to the same partition
+                                    new_records.sort(key=lambda record: partition_order(record.booth_no))
+                                if new_records:
+                                    # Core executemany: no ORM instances or identity map entries for the chunk
+                                    db.session.execute(Voter.__table__.insert(),
+                                                       [record.as_dict() for record in new_records])
+                            if chunk_hash is not None:
+                                chunk_hashes.append(chunk_hash)
+                                ledger.chunk_hashes = list(chunk_hashes)
+                            sheet_counts[sheet_index][2] += len(new_records)
+                            ledger.sheet_counts = [list(counts) for counts in sheet_counts]
+                            ledger.added_count += len(new_records)
+                            ledger.skipped_count += len(chunk) - len(new_records)
+                            ledger.checkpoint_row = position
+                            db.session.commit()
+                            committed = True
+                    
+                    ledger.checkpoint_row = None
+                    db.session.commit()
+                finally:
+                    if committed:
+                        bump_data_generation()
+                        invalidate_name_index()
+                        publish_data_change()
                 
-                success_count = len(new_voters)
-                flash(f'Upload successful! Added {success_count} new voters', 'success')
-                if skipped_count > 0:
-                    flash(f'Skipped {skipped_count} duplicate voters', 'info')
+                flash(f'Upload successful! Added {ledger.added_count} new voters', 'success')
+                if ledger.skipped_count > 0:
+                    flash(f'Skipped {ledger.skipped_count} duplicate voters', 'info')
+                if len(sheet_counts) > 1:
+                    for label, row_count, added_count in sheet_counts:
+                        flash(f'{label}: {row_count} rows, {added_count} added', 'info')
+                if duplicates.duplicate_rows:
+                    flash(f'{duplicates.duplicate_rows} rows repeated a voter ID of this file and were not loaded '
+                          f'(the {duplicate_policy} copy was kept); {duplicates.conflicts} of these voter IDs had conflicting details. '
+                          f'The duplicate report can be downloaded from the upload page', 'info')
+                if unchanged_chunks:
+                    flash(f'{unchanged_chunks} unchanged chunk{"s" if unchanged_chunks != 1 else ""} matched earlier uploads and were not re-checked', 'info')
+                if ignored_sheets:
+                    flash(f'Ignored sheets without a Voter ID column: {", ".join(ignored_sheets)}', 'info')
                 
                 return redirect(url_for('voter.search'))
                 
             except ValueError as ve:
+                # A chunk that failed mid-flush leaves the session unusable until it is rolled back;
+                # the committed chunks and the ledger checkpoint are kept
+                db.session.rollback()
                 flash(f'Invalid data in Excel file: {str(ve)}', 'error')
             except Exception as e:
+                db.session.rollback()
                 flash(f'Error processing Excel file: {str(e)}', 'error')
         else:
-            flash('Invalid file type. Please upload .xlsx or .xls files', 'error')
+            flash('Invalid file type. Please upload .xlsx, .xls or .zip files', 'error')
     
-    return render_template('voter/upload.html')
+    return render_template('voter/upload.html', duplicate_policies=DUPLICATE_POLICIES,
+                           duplicate_policy=current_app.config['INGEST_DUPLICATE_POLICY'],
+                           duplicate_report=session.get('duplicate_report'))
+
+
+def duplicate_report_path(report_id):
+    return os.path.join(current_app.config['EXPORT_DIR'], f'duplicates_{report_id}.csv')
+
+
+@voter_bp.route('/upload/duplicates/<report_id>')
+@login_required
+def duplicate_report(report_id):
+    if current_user.role != 'main':
+        flash('Only main user can upload Excel files', 'error')
+        return redirect(url_for('voter.search'))
+    
+    path = duplicate_report_path(report_id)
+    if not re.fullmatch(r'[0-9a-f]{16}', report_id) or not os.path.exists(path):
+        flash('This duplicate report is no longer available', 'error')
+        return redirect(url_for('voter.upload_excel'))
+    return send_file(path, as_attachment=True, download_name=f'duplicates_{report_id}.csv')
 
 
 @voter_bp.route('/preview_excel', methods=['POST'])
@@ -538,45 +575,95 @@ def preview_excel():
     file = request.files['file']
     
 
+@voter_bp.route('/mapping_profiles')
+@login_required
+def mapping_profiles():
+    # Only main user can review column mappings
+    if current_user.role != 'main':
+        flash('Only main user can manage column mappings', 'error')
+        return redirect(url_for('voter.search'))
+    
+    profiles = MappingProfile.query.order_by(MappingProfile.last_used_at.desc()).all()
+    return render_template('voter/mapping_profiles.html', profiles=profiles)
+
+
+@voter_bp.route('/mapping_profiles/<int:profile_id>', methods=['GET', 'POST'])
+@login_required
+def edit_mapping_profile(profile_id):
+    # Only main user can override column mappings
+    if current_user.role != 'main':
+        flash('Only main user can manage column mappings', 'error')
+        return redirect(url_for('voter.search'))
+    
+    profile = MappingProfile.query.get_or_404(profile_id)
+    
+    if request.method == 'POST':
+        mapping = {}
+        for index, header in enumerate(profile.headers):
+            field = request.form.get(f'field_{index}', '')
+            if not field:
+                continue
+            if field not in FIELD_KEYWORDS:
+                flash(f'Unknown field {field}', 'error')
+                return render_template('voter/mapping_profile_edit.html', profile=profile, fields=list(FIELD_KEYWORDS))
+            if field in mapping.values():
+                flash(f'Field {field} is mapped to more than one column', 'error')
+                return render_template('voter/mapping_profile_edit.html', profile=profile, fields=list(FIELD_KEYWORDS))
+            mapping[header] = field
+        
+        if 'voter_id' not in mapping.values():
+            flash('A column must be mapped to voter_id', 'error')
+            return render_template('voter/mapping_profile_edit.html', profile=profile, fields=list(FIELD_KEYWORDS))
+        
+        profile.mapping = mapping
+        profile.fallbacks = compute_fallbacks(profile.headers, mapping)
+        profile.is_override = True
+        db.session.commit()
+        flash('Column mapping updated successfully', 'success')
+        return redirect(url_for('voter.mapping_profiles'))
+    
+    return render_template('voter/mapping_profile_edit.html', profile=profile, fields=list(FIELD_KEYWORDS))
+
+
+@voter_bp.route('/mapping_profiles/delete/<int:profile_id>', methods=['POST'])
+@login_required
+def delete_mapping_profile(profile_id):
+    # Only main user can delete column mappings
+    if current_user.role != 'main':
+        flash('Only main user can manage column mappings', 'error')
+        return redirect(url_for('voter.search'))
+    
+    profile = MappingProfile.query.get_or_404(profile_id)
+    db.session.delete(profile)
+    db.session.commit()
+    
+    flash('Column mapping deleted. It will be detected again on the next upload.', 'success')
+    return redirect(url_for('voter.mapping_profiles'))
+
+
 @voter_bp.route('/star_report')
 @login_required
+@read_replica
 def star_report():
     try:
         # Get all voters with their star ratings
         # Apply star status filter if specified in request args
         star_status = request.args.get('star_status', '')
+        booth_no = request.args.get('booth_no', '')
         query = Voter.query
         
-        if star_status == 'with_stars':
-            query = query.filter(Voter.star_rating > 0)
-        elif star_status == 'without_stars':
-            query = query.filter(Voter.star_rating == 0)
+        # A booth-level report only reads that booth's partition when voters is partitioned
+        if booth_no:
+            query = query.filter(Voter.booth_no == int(booth_no))
+        
+        query = filter_star_status(query, star_status)
         
         voters = query.all()
+        # Who rated each voter last, from the raw logs or the compacted summaries
+        raters = latest_raters()
         
         # Create a list of voter data for the report
-        report_data = []
-        for voter in voters:
-            star_count = voter.star_rating
-            star_status_text = f"{star_count} stars" if star_count > 0 else "No stars"
-            
-            # Get the user who gave the star by looking at the latest star log for this voter
-            latest_star_log = StarLog.query.filter_by(voter_id=voter.id).order_by(StarLog.timestamp.desc()).first()
-            star_given_by = "N/A"
-            if latest_star_log and latest_star_log.user:
-                star_given_by = latest_star_log.user.username
-            
-            report_data.append({
-                'Voter ID': voter.voter_id,
-                'Full Name': voter.get_display_name(),
-                'Voting Card No': voter.voting_card_no or 'N/A',
-                'Number of Stars': star_count,
-                'Star Status': star_status_text,
-                'Karyakarta Name': voter.karyakarta or 'N/A',
-                'Star Given By': star_given_by,
-                'Booth No': voter.booth_no or 'N/A',
-                'Mobile No': voter.mobile_no or 'N/A',
-            })
+        report_data = [report_row(voter, raters.get(voter.id)) for voter in voters]
 
         # Create DataFrame and generate Excel file
         df = pd.DataFrame(report_data)
@@ -612,11 +699,125 @@ def star_report():
         return redirect(url_for('voter.search'))
 
 
+@voter_bp.route('/exports', methods=['GET', 'POST'])
+@login_required
+def exports():
+    # Only main user can export the whole roll
+    if current_user.role != 'main':
+        flash('Only main user can export booth reports', 'error')
+        return redirect(url_for('voter.search'))
+    
+    if request.method == 'POST':
+        try:
+            job = start_export_job(current_user, request.form.get('group_by', 'booth'),
+                                   request.form.get('file_format', 'xlsx'), request.form.get('star_status'))
+        except ValueError as e:
+            flash(str(e), 'error')
+        else:
+            flash(f'Export #{job.id} started; it can be downloaded here when it is ready', 'success')
+        return redirect(url_for('voter.exports'))
+    
+    fail_stale_export_jobs()
+    jobs = ExportJob.query.order_by(ExportJob.id.desc()).limit(20).all()
+    return render_template('voter/exports.html', jobs=jobs, group_by=GROUP_BY, file_formats=FILE_FORMATS)
+
+
+@voter_bp.route('/exports/<int:job_id>')
+@login_required
+def export_status(job_id):
+    if current_user.role != 'main':
+        return jsonify({'error': 'Only main user can export booth reports'}), 403
+    # The page polls running jobs; one whose worker was recycled is reported failed instead of running forever
+    fail_stale_export_jobs()
+    return jsonify(ExportJob.query.get_or_404(job_id).to_dict())
+
+
+@voter_bp.route('/exports/<int:job_id>/download')
+@login_required
+def download_export(job_id):
+    if current_user.role != 'main':
+        flash('Only main user can export booth reports', 'error')
+        return redirect(url_for('voter.search'))
+    
+    job = ExportJob.query.get_or_404(job_id)
+    if job.status != 'done' or not job.path or not os.path.exists(job.path):
+        flash('This export is not available for download', 'error')
+        return redirect(url_for('voter.exports'))
+    return send_file(job.path, as_attachment=True, download_name=os.path.basename(job.path))
+
+
+@voter_bp.route('/exports/<int:job_id>/delete', methods=['POST'])
+@login_required
+def delete_export(job_id):
+    if current_user.role != 'main':
+        flash('Only main user can export booth reports', 'error')
+        return redirect(url_for('voter.search'))
+    
+    fail_stale_export_jobs()
+    job = ExportJob.query.get_or_404(job_id)
+    if job.status in ('pending', 'running'):
+        flash('An export cannot be deleted while it is running', 'error')
+    else:
+        delete_export_job(job)
+        flash(f'Export #{job_id} deleted', 'success')
+    return redirect(url_for('voter.exports'))
+
+
+@voter_bp.route('/bulk_edit', methods=['GET', 'POST'])
+@login_required
+def bulk_edit():
+    is_json = request.is_json
+    if current_user.role != 'main':
+        if is_json:
+            return jsonify({'success': False, 'message': 'Only main user can bulk edit voters'}), 403
+        flash('Only main user can bulk edit voters', 'error')
+        return redirect(url_for('voter.search'))
+    
+    if request.method == 'GET':
+        return render_template('voter/bulk_edit.html', params={}, preview=None)
+    
+    # Filters take the parameters of search() but must all match exactly; assignments are set_<field> parameters
+    params = (request.get_json(silent=True) or {}) if is_json else request.form
+    dry_run = str(params.get('dry_run', '')).lower() in ('1', 'true', 'on')
+    try:
+        conditions = scope_conditions(params) + filter_conditions(params)
+        if not conditions:
+            raise ValueError('Choose at least one filter; a bulk edit cannot change every voter')
+        assignments = parse_assignments(params)
+    except ValueError as e:
+        if is_json:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        flash(str(e), 'error')
+        return render_template('voter/bulk_edit.html', params=params, preview=None)
+    
+    if dry_run:
+        count, sample = preview_bulk_edit(conditions, assignments)
+        if is_json:
+            return jsonify({'success': True, 'dry_run': True, 'count': count, 'assignments': assignments,
+                            'voters': [serialize_voter(voter) for voter in sample]})
+        return render_template('voter/bulk_edit.html', params=params,
+                               preview={'count': count, 'voters': sample, 'assignments': assignments})
+    
+    try:
+        count = apply_bulk_edit(conditions, assignments)
+    except Exception as e:
+        db.session.rollback()
+        if is_json:
+            return jsonify({'success': False, 'message': f'Error updating voters: {str(e)}'}), 500
+        flash(f'Error updating voters: {str(e)}', 'error')
+        return render_template('voter/bulk_edit.html', params=params, preview=None)
+    bump_data_generation()
+    publish_data_change()
+    
+    if is_json:
+        return jsonify({'success': True, 'dry_run': False, 'count': count, 'assignments': assignments})
+    flash(f'Updated {count} voters', 'success')
+    return redirect(url_for('voter.bulk_edit'))
+
+
 @voter_bp.route('/star/<int:voter_id>', methods=['POST'])
 @login_required
 def star_voter(voter_id):
-    voter = Voter.query.get_or_404(voter_id)
-    
     # Get the star rating from the request
     rating = request.json.get('rating', 1) if request.is_json else request.form.get('rating', 1)
     
@@ -627,58 +828,41 @@ def star_voter(voter_id):
     except (ValueError, TypeError):
         return jsonify({'success': False, 'message': 'Invalid rating value'}), 400
     
-    # Store old rating for audit log
-    old_rating = voter.star_rating
-    
-    # Update voter rating
-    voter.star_rating = rating
-    db.session.commit()
-    
-    # Create audit log
-    star_log = StarLog(
-        voter_id=voter.id,
-        user_id=current_user.id,
-        action='ADD' if old_rating == 0 else 'EDIT',
-        old_rating=old_rating,
-        new_rating=rating
-    )
-    db.session.add(star_log)
-    db.session.commit()
+    # Conditional update and audit log in one transaction, retried if another request changed the rating
+    try:
+        change_star_rating(voter_id, rating, current_user.id, current_app.config['STAR_RATING_RETRIES'])
+    except VoterNotFound:
+        return jsonify({'success': False, 'message': 'Voter not found'}), 404
+    except RatingConflict:
+        return jsonify({'success': False, 'message': 'The rating is being changed by someone else, please try again'}), 409
+    bump_data_generation()
+    publish_star_change(voter_id, rating, current_user.username)
     
     return jsonify({
         'success': True, 
         'message': 'Star rating updated successfully',
-        'star_display': voter.get_star_display(),
-        'rating': voter.star_rating
+        # Same as Voter.get_star_display() for a rating of 1-5, without reloading a voter that may be gone
+        'star_display': '★' * rating,
+        'rating': rating
     })
 
 
 @voter_bp.route('/unstar/<int:voter_id>', methods=['POST'])
 @login_required
 def unstar_voter(voter_id):
-    voter = Voter.query.get_or_404(voter_id)
-    
     # Only main user can remove star ratings
     if current_user.role != 'main':
         return jsonify({'success': False, 'message': 'Only main user can remove star ratings'}), 403
     
-    # Store old rating for audit log
-    old_rating = voter.star_rating
-    
-    # Remove star rating
-    voter.star_rating = 0
-    db.session.commit()
-    
-    # Create audit log
-    star_log = StarLog(
-        voter_id=voter.id,
-        user_id=current_user.id,
-        action='DELETE',
-        old_rating=old_rating,
-        new_rating=0
-    )
-    db.session.add(star_log)
-    db.session.commit()
+    # Remove star rating, logged in the same transaction
+    try:
+        change_star_rating(voter_id, 0, current_user.id, current_app.config['STAR_RATING_RETRIES'])
+    except VoterNotFound:
+        return jsonify({'success': False, 'message': 'Voter not found'}), 404
+    except RatingConflict:
+        return jsonify({'success': False, 'message': 'The rating is being changed by someone else, please try again'}), 409
+    bump_data_generation()
+    publish_star_change(voter_id, 0, current_user.username)
     
     return jsonify({
         'success': True, 
@@ -688,13 +872,57 @@ def unstar_voter(voter_id):
     })
 
 
+@voter_bp.route('/events/stars')
+@login_required
+def star_events():
+    subscriber = broker.subscribe(current_app.config['EVENTS_MAX_STREAMS'])
+    if subscriber is None:
+        # Every stream holds a worker thread (or greenlet); the client is told when to try again
+        body = busy_stream()
+    else:
+        # Not wrapped in stream_with_context: the stream needs no request state, so the
+        # database session is released as soon as the response starts
+        body = stream_star_events(subscriber, request.headers.get('Last-Event-ID'),
+                                  current_app.config['EVENTS_STREAM_SECONDS'])
+    return current_app.response_class(body, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @voter_bp.route('/voter/<int:voter_id>')
 @login_required
+@read_replica
 def voter_detail(voter_id):
     voter = Voter.query.get_or_404(voter_id)
     return render_template('voter/detail.html', voter=voter)
 
 
+@voter_bp.route('/voter/<int:voter_id>/star_history')
+@login_required
+@read_replica
+def star_history(voter_id):
+    # Only main user can see who changed ratings
+    if current_user.role != 'main':
+        return jsonify({'success': False, 'message': 'Only main user can view rating history'}), 403
+    
+    try:
+        limit = min(max(int(request.args.get('limit', HISTORY_PAGE_SIZE)), 1), 100)
+        before = int(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid page parameters'}), 400
+    
+    entries, next_cursor = history_page(voter_id, before, limit)
+    
+    payload = {'success': True, 'entries': entries, 'next_cursor': next_cursor, 'summary': None}
+    # The compacted history is older than every raw log, so it follows the last page
+    if next_cursor is None:
+        summary = StarLogSummary.query.filter_by(voter_id=voter_id).first()
+        if summary:
+            payload['summary'] = serialize_summary(summary)
+    return jsonify(payload)
+
+
 @voter_bp.route('/clear_data', methods=['POST'])
 @login_required
 def clear_data():
@@ -704,9 +932,15 @@ def clear_data():
         return redirect(url_for('voter.search'))
     
     try:
-        # Delete all voter records
+        # Delete all voter records; summaries go too, as nothing ties them to the deleted ids
+        db.session.query(StarLogSummary).delete()
         deleted_count = db.session.query(Voter).delete()
+        # Forget earlier uploads so the same files can be loaded again
+        db.session.query(IngestLedger).delete()
         db.session.commit()
+        bump_data_generation()
+        invalidate_name_index()
+        publish_data_change()
         
         flash(f'Successfully deleted {deleted_count} voter records from database', 'success')
         return redirect(url_for('voter.search'))
@@ -3,9 +3,13 @@ Database module with db instance to avoid circular imports
 """
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateIndex
+from app.utils.replica import RoutingSession
 
 # Initialize extensions without app - will be initialized later
-db = SQLAlchemy()
+# Reads of @read_replica views go to the replica bind when one is configured
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
 
 def init_db(app):
@@ -16,4 +20,28 @@ def init_db(app):
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
-    return db, login_manager
\ No newline at end of file
+    return db, login_manager
+
+
+def add_missing_columns():
+    """
+    Add model columns and indexes that are missing from existing tables.
+
+    db.create_all() only creates missing tables, so columns and indexes added
+    to a model after its table was created are added here.
+    """
+    inspector = inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
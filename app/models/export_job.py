@@ -0,0 +1,38 @@
+from app.database import db
+
+
+class ExportJob(db.Model):
+    __tablename__ = 'export_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    group_by = db.Column(db.String(20), nullable=False)  # booth or karyakarta
+    file_format = db.Column(db.String(10), nullable=False)  # xlsx or csv
+    star_status = db.Column(db.String(20), nullable=True)  # Same filter as the star report
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, running, done or failed
+    file_count = db.Column(db.Integer, default=0)
+    row_count = db.Column(db.Integer, default=0)
+    path = db.Column(db.String(500), nullable=True)  # Finished zip on the server
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Stamped while the bundle is being built
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'group_by': self.group_by,
+            'file_format': self.file_format,
+            'star_status': self.star_status,
+            'status': self.status,
+            'file_count': self.file_count,
+            'row_count': self.row_count,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ExportJob {self.id} by {self.group_by} ({self.status})>'
@@ -0,0 +1,24 @@
+from app.database import db
+
+
+class IngestLedger(db.Model):
+    __tablename__ = 'ingest_ledger'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)  # Hash of the uploaded file bytes
+    filename = db.Column(db.String(255), nullable=True)
+    file_size = db.Column(db.BigInteger, nullable=True)  # Bytes
+    total_rows = db.Column(db.Integer, default=0)  # Rows parsed from all sheets
+    added_count = db.Column(db.Integer, default=0)
+    skipped_count = db.Column(db.Integer, default=0)
+    sheet_counts = db.Column(db.JSON, nullable=True)  # [[sheet label, rows, added], ...]
+    mapping_profile_ids = db.Column(db.JSON, nullable=True)  # Mapping profiles used, one per sheet
+    chunk_hashes = db.Column(db.JSON, nullable=True)  # Hashes of normalized row chunks, when chunk hashing is enabled
+    checkpoint_row = db.Column(db.Integer, nullable=True)  # Rows committed so far while the upload is in progress; NULL once complete
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    uploader = db.relationship('User', lazy=True)
+    
+    def __repr__(self):
+        return f'<IngestLedger {self.sha256[:12]} {self.filename} (+{self.added_count})>'
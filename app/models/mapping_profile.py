@@ -0,0 +1,20 @@
+from app.database import db
+
+
+class MappingProfile(db.Model):
+    __tablename__ = 'mapping_profiles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    signature = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the normalized header row
+    headers = db.Column(db.JSON, nullable=False)  # Normalized headers in sheet order
+    mapping = db.Column(db.JSON, nullable=False)  # Normalized header -> voter field
+    fallbacks = db.Column(db.JSON, nullable=False)  # Voter field -> unmapped headers used to fill blanks
+    is_override = db.Column(db.Boolean, default=False)  # True once a main user has edited the mapping
+    use_count = db.Column(db.Integer, default=0)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    last_used_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<MappingProfile {self.signature[:12]} ({len(self.headers)} columns)>'
@@ -0,0 +1,13 @@
+from app.database import db
+
+
+class StarEvent(db.Model):
+    __tablename__ = 'star_events'
+    
+    # Outbox of star changes polled by the other workers when EVENTS_BACKEND=database on SQLite
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON {voter_id, rating, by, origin}
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<StarEvent {self.id}: {self.payload}>'
@@ -4,9 +4,14 @@ from app.database import db
 
 class StarLog(db.Model):
     __tablename__ = 'star_logs'
+    __table_args__ = (
+        # Serves a voter's history newest first, paginated by (timestamp, id)
+        db.Index('ix_star_logs_voter_id_timestamp', 'voter_id', 'timestamp', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     voter_id = db.Column(db.Integer, db.ForeignKey('voters.id'), nullable=False)
+    booth_no = db.Column(db.Integer, nullable=True)  # Copy of the voter's booth, the partition key when star_logs is partitioned
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     action = db.Column(db.Enum('ADD', 'EDIT', 'DELETE', name='star_actions'), nullable=False)  # ADD, EDIT, DELETE
     old_rating = db.Column(db.Integer, nullable=True)  # Previous rating (for EDIT/DELETE)
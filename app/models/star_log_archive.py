@@ -0,0 +1,19 @@
+from app.database import db
+
+
+class StarLogArchive(db.Model):
+    __tablename__ = 'star_log_archive'
+    
+    # Same id as the archived star_logs row; no foreign keys so archived rows outlive voters and users
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    voter_id = db.Column(db.Integer, nullable=False, index=True)
+    booth_no = db.Column(db.Integer, nullable=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)
+    old_rating = db.Column(db.Integer, nullable=True)
+    new_rating = db.Column(db.Integer, nullable=True)
+    timestamp = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    
+    def __repr__(self):
+        return f'<StarLogArchive {self.action} on Voter {self.voter_id} at {self.timestamp}>'
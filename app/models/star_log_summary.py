@@ -0,0 +1,25 @@
+from app.database import db
+
+
+class StarLogSummary(db.Model):
+    __tablename__ = 'star_log_summaries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: voters.id alone is not unique once voters is partitioned by booth
+    voter_id = db.Column(db.Integer, unique=True, nullable=False)
+    booth_no = db.Column(db.Integer, nullable=True)
+    first_rated_at = db.Column(db.DateTime, nullable=True)  # Oldest compacted log
+    last_rated_at = db.Column(db.DateTime, nullable=True)  # Newest compacted log
+    rating_count = db.Column(db.Integer, default=0)  # Compacted ADD and EDIT actions
+    removal_count = db.Column(db.Integer, default=0)  # Compacted DELETE actions
+    last_action = db.Column(db.String(10), nullable=True)
+    last_rating = db.Column(db.Integer, nullable=True)  # Rating after the newest compacted log
+    last_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=db.func.current_timestamp(), onupdate=db.func.current_timestamp())
+    
+    voter = db.relationship('Voter', primaryjoin='foreign(StarLogSummary.voter_id) == Voter.id',
+                            backref=db.backref('star_summary', uselist=False, lazy=True))
+    last_user = db.relationship('User', lazy=True)
+    
+    def __repr__(self):
+        return f'<StarLogSummary Voter {self.voter_id}: {self.rating_count} ratings until {self.last_rated_at}>'
@@ -1,6 +1,6 @@
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.database import db, login_manager
+from app.utils.passwords import hash_password, verify_password
 
 
 @login_manager.user_loader
@@ -23,12 +23,12 @@ class User(db.Model, UserMixin):
     star_logs = db.relationship('StarLog', backref='user', lazy=True)
 
     def set_password(self, password):
-        """Hash and set password"""
-        self.password = generate_password_hash(password)
+        """Hash and set password with the current hashing policy; raises PasswordBusy when too many hashes are waiting"""
+        self.password = hash_password(password)
 
     def check_password(self, password):
-        """Check if provided password matches hash"""
-        return check_password_hash(self.password, password)
+        """Check if provided password matches hash; raises PasswordBusy when too many logins are waiting"""
+        return verify_password(self.password, password)
 
     def __repr__(self):
         return f'<User {self.username} ({self.role})>'
\ No newline at end of file
@@ -26,6 +26,15 @@ class Voter(db.Model):
     voting_card_no = db.Column(db.String(50), nullable=True)  # Voting Card Number
     karyakarta = db.Column(db.String(100), nullable=True)  # Karyakarta
 
+    # Transliterated search keys of the name parts (see app.utils.search_keys)
+    first_name_key = db.Column(db.String(100), nullable=True, index=True)
+    father_name_key = db.Column(db.String(100), nullable=True, index=True)
+    surname_key = db.Column(db.String(100), nullable=True, index=True)
+
+    # 10-digit mobile number and its digits reversed, for exact and last-digits lookups (see app.utils.mobile_numbers)
+    mobile_norm = db.Column(db.String(10), nullable=True, index=True)
+    mobile_rev = db.Column(db.String(10), nullable=True, index=True)
+
     # Relationship with star logs
     star_logs = db.relationship('StarLog', backref='voter', lazy=True)
 
@@ -0,0 +1,108 @@
+"""
+Self-hosted, fingerprinted copies of the CSS and JavaScript libraries.
+
+vendor_assets() downloads the pinned library versions into static/vendor.
+Templates link them through asset_url(), which appends a content hash
+(?v=...) so that they can be cached as immutable; a new file means a new
+URL. Until the files have been vendored asset_url() falls back to the CDN.
+
+Run once after installing, e.g. in the deployment build step:
+
+    python -m app.utils.assets
+    FLASK_APP=app.app flask vendor-assets
+"""
+import hashlib
+import os
+import sys
+import threading
+import urllib.request
+
+from flask import current_app, request, url_for
+
+
+VENDOR_DIR = 'vendor'
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist'
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+
+# Path under static/vendor -> pinned source URL
+ASSETS = {
+    'bootstrap/bootstrap.min.css': f'{BOOTSTRAP}/css/bootstrap.min.css',
+    'bootstrap/bootstrap.bundle.min.js': f'{BOOTSTRAP}/js/bootstrap.bundle.min.js',
+    'jquery/jquery.min.js': 'https://code.jquery.com/jquery-3.6.0.min.js',
+    'fontawesome/css/all.min.css': f'{FONT_AWESOME}/css/all.min.css',
+}
+# all.min.css loads its fonts from ../webfonts/
+for _font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility'):
+    for _extension in ('woff2', 'ttf'):
+        ASSETS[f'fontawesome/webfonts/{_font}.{_extension}'] = f'{FONT_AWESOME}/webfonts/{_font}.{_extension}'
+
+# Fingerprinted URLs are never revalidated; other vendor files (fonts) are cached for a week
+IMMUTABLE = 'public, max-age=31536000, immutable'
+VENDOR_MAX_AGE = 'public, max-age=604800'
+
+_fingerprints = {}  # path -> (mtime, hash)
+_lock = threading.Lock()
+
+
+def fingerprint(path):
+    """Short content hash of a file, recomputed only when its mtime changes"""
+    mtime = os.stat(path).st_mtime_ns
+    with _lock:
+        cached = _fingerprints.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _lock:
+        _fingerprints[path] = (mtime, digest)
+    return digest
+
+
+def asset_url(name):
+    """URL of a vendored library file, fingerprinted, or its CDN URL if it has not been vendored"""
+    path = os.path.join(current_app.static_folder, VENDOR_DIR, name)
+    if not os.path.exists(path):
+        return ASSETS[name]
+    return url_for('static', filename=f'{VENDOR_DIR}/{name}', v=fingerprint(path))
+
+
+def vendor_assets(static_folder, force=False, log=print):
+    """Download the pinned assets that are missing (or all with force); returns the paths written"""
+    written = []
+    for name, url in ASSETS.items():
+        path = os.path.join(static_folder, VENDOR_DIR, name)
+        if os.path.exists(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=60) as response:
+            data = response.read()
+        if not data:
+            raise ValueError(f'{url} returned an empty file')
+        # Write to a temporary name first so a failed download never leaves a truncated asset behind
+        with open(path + '.part', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.part', path)
+        log(f'{name}: {len(data)} bytes')
+        written.append(path)
+    return written
+
+
+def _cache_headers(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        if request.args.get('v'):
+            response.headers['Cache-Control'] = IMMUTABLE
+        elif request.view_args.get('filename', '').startswith(f'{VENDOR_DIR}/'):
+            response.headers['Cache-Control'] = VENDOR_MAX_AGE
+    return response
+
+
+def init_assets(app):
+    """Expose asset_url() to templates and set the cache headers of vendored files"""
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(_cache_headers)
+
+
+if __name__ == '__main__':
+    static = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    vendor_assets(static, force='--force' in sys.argv)
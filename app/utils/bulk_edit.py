@@ -0,0 +1,127 @@
+"""
+Set-based reassignment of the karyakarta, booth and yadibhag of many voters.
+
+When a karyakarta leaves or booths are redrawn, the voters matching a
+filter are changed with one UPDATE in one transaction instead of
+re-uploading the roll (whose voter IDs are skipped anyway) or editing
+voters one by one. Unlike the search filters, which find a voter when any
+of them matches and compare most text fields by substring, the filters of a
+bulk edit must all match and compare whole values: reassigning the voters
+of "Ram" leaves those of "Ramesh" alone, and every added filter narrows the
+edit. Voters that already hold the new values are left out of
+the UPDATE, so the affected count is the number of voters really changed.
+
+A dry run counts the same voters and returns a sample with their current
+and new values, without writing anything.
+"""
+from sqlalchemy import func, or_, select, update
+
+from app.database import db
+from app.models.voter import Voter
+from app.utils.mobile_numbers import normalize_mobile
+from app.utils.partitioning import ensure_partitions
+
+
+# Field -> maximum length of its value, None for the booth number
+ASSIGNABLE_FIELDS = {'karyakarta': 100, 'booth_no': None, 'yadibhag_no': 50, 'yadibhag_name': 200}
+
+# Voters shown by a dry run
+PREVIEW_ROWS = 20
+
+# Filter parameter -> column that must equal it
+TEXT_FILTERS = {
+    'voter_id': Voter.voter_id,
+    'full_name': Voter.full_name,
+    'yadibhag_no': Voter.yadibhag_no,
+    'yadibhag_name': Voter.yadibhag_name,
+    'voter_srno': Voter.voter_srno,
+    'gender': Voter.gender,
+    'voting_card_no': Voter.voting_card_no,
+    'karyakarta': Voter.karyakarta,
+}
+
+# Filter parameter -> (integer column, error message)
+NUMBER_FILTERS = {
+    'booth_no': (Voter.booth_no, 'Invalid booth number'),
+    'age': (Voter.age, 'Invalid age'),
+}
+
+
+def filter_conditions(params):
+    """
+    Conditions of the filter parameters, all of which a voter must meet to be changed.
+
+    Raises ValueError for an invalid number and for the general search, which
+    matches any field and so cannot select voters precisely.
+    """
+    if str(params.get('query') or '').strip():
+        raise ValueError('A bulk edit cannot use the general search; filter by individual fields')
+    conditions = []
+    for name, column in TEXT_FILTERS.items():
+        value = str(params.get(name) or '').strip()
+        if value:
+            conditions.append(column == value)
+    for name, (column, message) in NUMBER_FILTERS.items():
+        value = str(params.get(name) or '').strip()
+        if value:
+            try:
+                conditions.append(column == int(value))
+            except ValueError:
+                raise ValueError(message)
+    mobile_no = str(params.get('mobile_no') or '').strip()
+    if mobile_no:
+        normalized = normalize_mobile(mobile_no)
+        conditions.append(Voter.mobile_norm == normalized if normalized else Voter.mobile_no == mobile_no)
+    return conditions
+
+
+def parse_assignments(params):
+    """
+    New values from set_<field> parameters; blank values leave the field unchanged.
+
+    Raises ValueError for an invalid value or when nothing is assigned.
+    """
+    assignments = {}
+    for field, max_length in ASSIGNABLE_FIELDS.items():
+        value = params.get(f'set_{field}')
+        value = str(value).strip() if value is not None else ''
+        if not value:
+            continue
+        if max_length is None:
+            try:
+                assignments[field] = int(value)
+            except ValueError:
+                raise ValueError('Invalid booth number')
+        elif len(value) > max_length:
+            raise ValueError(f'{field.replace("_", " ").capitalize()} can be at most {max_length} characters')
+        else:
+            assignments[field] = value
+    if not assignments:
+        raise ValueError('Enter a new karyakarta, booth number or yadibhag')
+    return assignments
+
+
+def changed_condition(assignments):
+    """Voters for which at least one assignment changes something"""
+    return or_(*(getattr(Voter, field).is_distinct_from(value) for field, value in assignments.items()))
+
+
+def preview_bulk_edit(conditions, assignments, limit=PREVIEW_ROWS):
+    """Number of voters the edit would change and the first of them"""
+    where = [*conditions, changed_condition(assignments)]
+    count = db.session.execute(select(func.count()).select_from(Voter).where(*where)).scalar()
+    sample = db.session.execute(select(Voter).where(*where).order_by(Voter.id).limit(limit)).scalars().all()
+    return count, sample
+
+
+def apply_bulk_edit(conditions, assignments):
+    """Change the matching voters with a single UPDATE and commit; returns the number of voters changed"""
+    if 'booth_no' in assignments:
+        # On a partitioned voters table the rows move to the new booth's partition
+        ensure_partitions(db.engine, {assignments['booth_no']})
+    result = db.session.execute(
+        update(Voter).where(*conditions, changed_condition(assignments)).values(**assignments)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
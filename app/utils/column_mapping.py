@@ -0,0 +1,106 @@
+"""
+Column mapping helpers shared by the Excel upload pipeline
+"""
+import hashlib
+import re
+
+
+# Keywords used to map spreadsheet headers to voter fields (order matters)
+FIELD_KEYWORDS = {
+    'voter_id': ['voter', 'id', 'voterid', 'voter_id', 'voter id', 'srno', 'voter srno', 'voter_srno', 'votersrno', 'voting card no', 'voting card no.', 'voting_card_no', 'votingcardno'],
+    'booth_no': ['booth no.', 'booth_no', 'booth no', 'boothno', 'booth_no.', 'booth'],
+    'first_name': ['englishname', 'english_name', 'first', 'first_name', 'first name'],  # Prioritize EnglishName for actual names
+    'father_name': ['middle', 'middle_name', 'middle name', 'father', 'father_name', 'father name'],
+    'surname': ['last name', 'surname', 'last', 'last_name'],
+    'full_name': ['full name', 'full_name', 'fullname', 'complete name'],  # Don't map general 'name' or yadibhag name to full name
+    'mobile_no': ['mobile no.', 'mobile number', 'phone', 'mobile', 'phone number', 'mobile_no.', 'mobile no', 'mobile_no'],
+    'yadibhag_no': ['yadibhag no', 'yadibhag_no', 'yadibhag no.', 'yadibhag', 'yadi no', 'yadi_no'],
+    'yadibhag_name': ['yadibhag name', 'yadibhag_name', 'yadibhagname', 'yadi name', 'yadi_name'],
+    'voter_srno': ['voter srno', 'voter_srno', 'voter serial', 'voter_serial', 'votersrno', 'serial no', 'serial_no'],
+    'age': ['age'],
+    'gender': ['gender'],
+    'voting_card_no': ['voting card no.', 'voting card no', 'voting_card_no', 'votingcardno', 'voting card', 'card no'],
+    'karyakarta': ['karyakarta']
+}
+
+# Exact header names used to fill a field from an otherwise unmapped column
+FALLBACK_KEYWORDS = {
+    'first_name': ['englishname', 'english_name', 'first', 'first_name', 'first name'],
+    'father_name': ['middle', 'father name', 'father', 'middle name', 'middle_name', 'father_name'],
+    'surname': ['last name', 'surname', 'last', 'last_name'],
+    'full_name': ['full name', 'fullname', 'full_name'],
+    'mobile_no': ['mobile no.', 'mobile number', 'phone', 'mobile', 'phone number', 'mobile_no.', 'mobile no'],
+    'yadibhag_no': ['yadibhag no', 'yadibhag_no', 'yadibhag no.', 'yadibhag'],
+    'yadibhag_name': ['yadibhag name', 'yadibhag_name'],
+    'voter_srno': ['voter srno', 'voter_srno', 'voter serial', 'voter_serial'],
+    'age': ['age'],
+    'gender': ['gender'],
+    'voting_card_no': ['voting card no.', 'voting card no', 'voting_card_no', 'voting card', 'card no', 'card_no'],
+    'karyakarta': ['karyakarta'],
+}
+
+# Booth columns are matched on substrings, like the primary mapping
+BOOTH_FALLBACK_KEYWORDS = ['booth no.', 'booth_no', 'booth no', 'boothno', 'booth_no.', 'booth']
+
+
+def normalize_header(column):
+    """Lower-case a header and collapse internal whitespace"""
+    return re.sub(r'\s+', ' ', str(column)).strip().lower()
+
+
+def normalize_headers(columns):
+    """Normalize a header row, keeping duplicate headers distinct"""
+    headers = []
+    seen = {}
+    for column in columns:
+        header = normalize_header(column)
+        if header in seen:
+            seen[header] += 1
+            header = f'{header}.{seen[header]}'
+        else:
+            seen[header] = 0
+        headers.append(header)
+    return headers
+
+
+def header_signature(columns):
+    """Return a stable hash identifying a spreadsheet layout"""
+    headers = normalize_headers(columns)
+    return hashlib.sha256('\x1f'.join(headers).encode('utf-8')).hexdigest()
+
+
+def detect_column_mapping(headers):
+    """
+    Map normalized headers to voter fields.
+
+    Exact keyword matches are claimed before substring matches so that a column
+    named e.g. 'voter id' is never lost to a looser match such as 'id' in
+    'yadibhag id'. Within each pass fields and columns keep their sheet order,
+    which makes the result deterministic for a given header row.
+    """
+    mapping = {}
+    for exact in (True, False):
+        for field, keywords in FIELD_KEYWORDS.items():
+            if field in mapping.values():
+                continue
+            for header in headers:
+                if header in mapping:
+                    continue
+                if header in keywords or (not exact and any(keyword in header for keyword in keywords)):
+                    mapping[header] = field
+                    break
+    return mapping
+
+
+def compute_fallbacks(headers, mapping):
+    """List the unmapped headers that may still fill an empty field per row"""
+    fallbacks = {}
+    for field, keywords in FALLBACK_KEYWORDS.items():
+        columns = [header for header in headers if header not in mapping and header in keywords]
+        if columns:
+            fallbacks[field] = columns
+    booth_columns = [header for header in headers
+                     if header not in mapping and any(keyword in header for keyword in BOOTH_FALLBACK_KEYWORDS)]
+    if booth_columns:
+        fallbacks['booth_no'] = booth_columns
+    return fallbacks
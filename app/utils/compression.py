@@ -0,0 +1,144 @@
+"""
+gzip and brotli compression of HTML, JSON and static text responses.
+
+Responses are compressed when the client accepts an encoding we support and
+the body is at least COMPRESS_MIN_BYTES long. Page and JSON responses are
+compressed per request at a fast level; static files are compressed once per
+worker at the highest level and kept in memory, keyed by path and mtime.
+Brotli is preferred when the brotli package is installed and the client
+accepts it, otherwise gzip is used.
+
+Streams (server-sent events), partial and conditional responses are left
+alone. Strong ETags of compressed responses become weak, because the bytes
+differ from the uncompressed representation.
+"""
+import gzip
+import os
+import threading
+
+from flask import request
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip only
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml', 'font/ttf',
+}
+
+# Per-request compression favours speed; static files are compressed once, so they get the best ratio
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+STATIC_LEVELS = {'br': 11, 'gzip': 9}
+
+# Largest total size of compressed static files kept per worker
+STATIC_CACHE_BYTES = 16 * 1024 * 1024
+
+
+def supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """Best supported encoding the client accepts, or None"""
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+class StaticCompressionCache:
+    """Compressed static file bodies of this worker"""
+
+    def __init__(self, max_bytes=STATIC_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = {}  # (path, mtime, encoding) -> bytes
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, encoding, min_bytes):
+        """Compressed body of the file, or None when it is too small or does not shrink"""
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        key = (path, mtime, encoding)
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key]
+        with open(path, 'rb') as f:
+            data = f.read()
+        body = compress(data, encoding, STATIC_LEVELS[encoding]) if len(data) >= min_bytes else None
+        if body is not None and len(body) >= len(data):
+            body = None
+        with self._lock:
+            if self._size + len(body or b'') > self.max_bytes:
+                self._entries.clear()
+                self._size = 0
+            self._entries[key] = body
+            self._size += len(body or b'')
+        return body
+
+
+static_cache = StaticCompressionCache()
+
+
+def _compress_response(app):
+    min_bytes = app.config['COMPRESS_MIN_BYTES']
+
+    def compress_response(response):
+        if response.mimetype not in COMPRESSIBLE_TYPES:
+            return response
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or request.method == 'HEAD' or request.range
+                or 'Content-Encoding' in response.headers):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if response.direct_passthrough:
+            # send_file responses: only static files, whose compressed bodies are cached
+            if request.endpoint != 'static':
+                return response
+            path = safe_join(app.static_folder, request.view_args['filename'])
+            body = static_cache.get(path, encoding, min_bytes) if path else None
+            if body is None:
+                return response
+            response.close()
+            response.direct_passthrough = False
+        elif response.is_streamed:
+            return response
+        else:
+            data = response.get_data()
+            if len(data) < min_bytes:
+                return response
+            body = compress(data, encoding, DYNAMIC_LEVELS[encoding])
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+    return compress_response
+
+
+def init_compression(app):
+    """Compress responses after every other after_request hook has run"""
+    if not app.config['COMPRESS_ENABLED']:
+        return
+    # after_request hooks run in reverse order of registration, so register first to run last
+    app.after_request_funcs.setdefault(None, []).insert(0, _compress_response(app))
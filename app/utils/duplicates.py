@@ -0,0 +1,94 @@
+"""
+Detection of voter IDs that appear more than once within one upload.
+
+Runs over the parsed rows of all sheets before anything is loaded. Rows
+sharing a voter ID are exact duplicates when every compared field matches,
+and conflicts otherwise. Which row of a repeated voter ID is loaded is
+decided by the duplicate policy:
+
+- first: the first row in sheet order
+- last: the last row in sheet order
+- reject: the first row when the copies are identical; any conflict rejects the upload
+
+Everything is done with pandas duplicated()/groupby over hashed rows, so the
+pass stays linear in the number of rows. Nothing here touches the database.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from app.utils.voter_record import VOTER_FIELDS
+
+
+POLICIES = ('first', 'last', 'reject')
+
+# Fields compared to tell exact duplicates from conflicting ones; derived search keys follow from these
+COMPARED_FIELDS = ['booth_no', 'first_name', 'father_name', 'surname', 'full_name', 'mobile_no', 'yadibhag_no',
+                   'yadibhag_name', 'voter_srno', 'age', 'gender', 'voting_card_no', 'karyakarta']
+
+REPORT_COLUMNS = ['Voter ID', 'Sheet', 'Row', 'Duplicate', 'Action', 'Differing Fields'] + COMPARED_FIELDS
+
+# dropped: per sheet, the indexes of rows not to load; report: DataFrame of REPORT_COLUMNS, or None
+DuplicateCheck = namedtuple('DuplicateCheck', ['dropped', 'duplicate_rows', 'conflicts', 'report'])
+
+
+def find_duplicates(sheets, policy='first'):
+    """
+    Find repeated voter IDs in [(sheet label, VoterRecords), ...].
+
+    The report lists every row of a repeated voter ID with its sheet and
+    spreadsheet row number (the header is row 1), whether it is an exact or a
+    conflicting duplicate, the fields that differ and whether it was kept.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f'Duplicate policy must be one of {", ".join(POLICIES)}')
+    lengths = [len(rows) for _, rows in sheets]
+    empty = [set() for _ in sheets]
+    if sum(lengths) == 0:
+        return DuplicateCheck(empty, 0, 0, None)
+
+    voter_ids = pd.Series([record.voter_id for _, records in sheets for record in records])
+    repeated = voter_ids.duplicated(keep=False).to_numpy()
+    if not repeated.any():
+        return DuplicateCheck(empty, 0, 0, None)
+
+    # Only the rows of repeated voter IDs are materialized in full
+    positions = np.flatnonzero(repeated)
+    sheet_index = np.repeat(np.arange(len(sheets)), lengths)
+    row_index = np.concatenate([np.arange(length) for length in lengths])
+    flat_records = [record for _, records in sheets for record in records]
+    dups = pd.DataFrame.from_records([flat_records[position].as_tuple() for position in positions],
+                                     columns=VOTER_FIELDS)[['voter_id'] + COMPARED_FIELDS]
+    dups['sheet'] = sheet_index[positions]
+    dups['row'] = row_index[positions]
+
+    values = dups[COMPARED_FIELDS].astype(str)
+    dups['hash'] = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    conflict = (dups.groupby('voter_id')['hash'].transform('nunique') > 1).to_numpy()
+    keep = ~dups['voter_id'].duplicated(keep='last' if policy == 'last' else 'first').to_numpy()
+
+    # Names of the fields that differ within each conflicting voter ID
+    differing = pd.Series('', index=dups.index)
+    if conflict.any():
+        changed = values[conflict].groupby(dups['voter_id'][conflict]).nunique() > 1
+        names = changed.apply(lambda flags: ', '.join(flags.index[flags.to_numpy()]), axis=1)
+        differing[conflict] = dups['voter_id'][conflict].map(names).to_numpy()
+
+    dropped = [set() for _ in sheets]
+    for sheet, row in zip(dups['sheet'][~keep], dups['row'][~keep]):
+        dropped[sheet].add(int(row))
+
+    labels = [label for label, _ in sheets]
+    report = pd.DataFrame({
+        'Voter ID': dups['voter_id'],
+        'Sheet': [labels[sheet] for sheet in dups['sheet']],
+        'Row': dups['row'] + 2,
+        'Duplicate': np.where(conflict, 'conflict', 'exact'),
+        'Action': np.where(keep, 'kept', 'dropped'),
+        'Differing Fields': differing,
+    })
+    report = pd.concat([report, dups[COMPARED_FIELDS]], axis=1)
+    # Rows of one voter ID together, in sheet order
+    report = report.sort_values('Voter ID', kind='stable')[REPORT_COLUMNS]
+    return DuplicateCheck(dropped, int((~keep).sum()), int(dups['voter_id'][conflict].nunique()), report)
@@ -0,0 +1,348 @@
+"""
+Server-sent events that push star rating changes to open search pages.
+
+star_voter and unstar_voter publish compact {voter_id, rating, by} deltas
+after their commit. Every open /events/stars stream owns a bounded queue
+fed by the broker of its worker process, so fan-out costs one queue put per
+client and no database query.
+
+With EVENTS_BACKEND=database the deltas also reach the other workers:
+
+- PostgreSQL: NOTIFY on the star_events channel, received by one LISTEN
+  connection per worker
+- SQLite: rows appended to the star_events table, polled by one thread per
+  worker
+
+Deltas from other workers also bump the local search cache generation,
+because cached results filtered or displayed by star rating are stale.
+Listener threads start lazily in each worker, after gunicorn has forked.
+
+The same channel carries data change notices, sent after uploads, bulk
+edits, clear data and the maintenance commands of the flask CLI, so that
+the other workers drop their cached search results and name index. The
+memory backend cannot reach other processes; after a CLI command its
+worker has to be restarted instead.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import select
+import threading
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy import text
+
+from app.utils.partitioning import is_postgres
+
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('memory', 'database')
+
+CHANNEL = 'star_events'
+
+# Sent to a stream whose queue overflowed or whose Last-Event-ID is too old; the page re-runs its search
+RESYNC = 'resync'
+
+# Type of the events that tell workers that voters changed outside of them
+DATA_CHANGED = 'data_changed'
+
+# Seconds between SSE comment lines that keep proxies from closing idle streams
+KEEPALIVE_SECONDS = 15
+
+# Range of seconds after which a client turned away at EVENTS_MAX_STREAMS tries again
+BUSY_RETRY_SECONDS = (30, 90)
+
+# SQLite backend: poll interval and number of recent rows kept in star_events
+POLL_SECONDS = 1.0
+TABLE_RETENTION = 1000
+
+
+class EventBroker:
+    """In-process fan-out of events to the streams of this worker"""
+
+    def __init__(self, history=256, queue_size=100):
+        # Distinguishes event ids of this worker from ids issued by others or before a restart
+        self.origin = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history)  # (sequence, event) for Last-Event-ID replay
+        self._sequence = 0
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self, max_subscribers=None):
+        """Return a queue of (event id, event) for a new stream, or None when the worker is at capacity"""
+        with self._lock:
+            if max_subscribers is not None and len(self._subscribers) >= max_subscribers:
+                return None
+            subscriber = queue.Queue(maxsize=self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def event_id(self, sequence):
+        return f'{self.origin}-{sequence}'
+
+    def dispatch(self, event):
+        """Deliver an event to every stream of this worker"""
+        with self._lock:
+            self._sequence += 1
+            self._history.append((self._sequence, event))
+            item = (self.event_id(self._sequence), event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(item)
+            except queue.Full:
+                # A stalled client: drop its backlog and let it resynchronize instead of blocking publishers
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait((None, RESYNC))
+
+    def replay(self, last_event_id):
+        """
+        Events published after last_event_id, or None if they can no longer be replayed.
+
+        Returns an empty list for a client that has seen everything.
+        """
+        origin, _, sequence = (last_event_id or '').partition('-')
+        if origin != self.origin or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        with self._lock:
+            history = list(self._history)
+            if sequence >= self._sequence:
+                return []
+        if not history or history[0][0] > sequence + 1:
+            return None
+        return [(self.event_id(seq), event) for seq, event in history if seq > sequence]
+
+
+broker = EventBroker()
+
+
+class MemoryBackend:
+    """Single worker: events never leave the process"""
+
+    def publish(self, event):
+        broker.dispatch(event)
+
+    def start(self):
+        pass
+
+
+class DatabaseBackend:
+    """Base of the backends that relay events between workers through the database"""
+
+    def __init__(self, engine, on_remote=None, on_data_change=None):
+        self.engine = engine
+        self.on_remote = on_remote
+        self.on_data_change = on_data_change
+        self._pid = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def start(self):
+        """Start the listener thread of this worker process once and wait until it listens"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready = threading.Event()
+            threading.Thread(target=self._run, name='star-events', daemon=True).start()
+        # Events published before the listener is ready would not reach this worker's own streams
+        self._ready.wait(5)
+
+    def _run(self):
+        delay = 1
+        while True:
+            try:
+                self.listen()
+                delay = 1
+            except Exception as e:
+                logger.warning('Star event listener failed, retrying in %ss: %s', delay, e)
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    def publish(self, event):
+        self.start()
+        self.send(event)
+
+    def receive(self, payload):
+        event = json.loads(payload)
+        origin = event.pop('origin', None)
+        if event.get('type') == DATA_CHANGED:
+            if origin != broker.origin and self.on_data_change:
+                self.on_data_change()
+            return
+        if origin != broker.origin and self.on_remote:
+            self.on_remote()
+        broker.dispatch(event)
+
+    def encode(self, event):
+        return json.dumps({**event, 'origin': broker.origin}, separators=(',', ':'))
+
+
+class PostgresBackend(DatabaseBackend):
+    def send(self, event):
+        with self.engine.begin() as conn:
+            conn.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': CHANNEL, 'payload': self.encode(event)})
+
+    def listen(self):
+        raw = self.engine.raw_connection()
+        try:
+            connection = raw.driver_connection
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {CHANNEL}')
+            self._ready.set()
+            while True:
+                if select.select([connection], [], [], KEEPALIVE_SECONDS) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    self.receive(connection.notifies.pop(0).payload)
+        finally:
+            raw.invalidate()
+
+
+class TableBackend(DatabaseBackend):
+    def __init__(self, engine, on_remote=None, on_data_change=None):
+        super().__init__(engine, on_remote, on_data_change)
+        self._last_id = None
+
+    def send(self, event):
+        with self.engine.begin() as conn:
+            conn.execute(text('INSERT INTO star_events (payload, created_at) VALUES (:payload, CURRENT_TIMESTAMP)'),
+                         {'payload': self.encode(event)})
+
+    def listen(self):
+        if self._last_id is None:
+            # Start from the current end; older events were published before this worker existed
+            with self.engine.connect() as conn:
+                self._last_id = conn.execute(text('SELECT COALESCE(MAX(id), 0) FROM star_events')).scalar()
+        self._ready.set()
+        polls = 0
+        while True:
+            with self.engine.connect() as conn:
+                rows = conn.execute(text('SELECT id, payload FROM star_events WHERE id > :last_id ORDER BY id'),
+                                    {'last_id': self._last_id}).all()
+            for event_id, payload in rows:
+                self._last_id = event_id
+                self.receive(payload)
+            polls += 1
+            if polls % 60 == 0:
+                with self.engine.begin() as conn:
+                    conn.execute(text('DELETE FROM star_events WHERE id <= :cutoff'),
+                                 {'cutoff': self._last_id - TABLE_RETENTION})
+            time.sleep(POLL_SECONDS)
+
+
+_backend = MemoryBackend()
+
+
+def init_events(app, db, on_remote=None, on_data_change=None):
+    """
+    Choose the event backend from EVENTS_BACKEND.
+
+    on_remote is called for star changes of other workers, on_data_change
+    for data change notices of other processes.
+    """
+    global _backend
+    name = app.config['EVENTS_BACKEND']
+    if name not in BACKENDS:
+        raise ValueError(f'EVENTS_BACKEND must be one of {", ".join(BACKENDS)}')
+    if name == 'memory':
+        _backend = MemoryBackend()
+        return
+    with app.app_context():
+        engine = db.engine
+    backend_class = PostgresBackend if is_postgres(engine) else TableBackend
+    _backend = backend_class(engine, on_remote, on_data_change)
+    # Every worker listens from its first request on, so its search cache learns about remote changes
+    app.before_request(_backend.start)
+
+
+def publish_star_change(voter_id, rating, by):
+    """Broadcast a committed star rating change; failures only cost the live update"""
+    try:
+        _backend.publish({'voter_id': voter_id, 'rating': rating, 'by': by})
+    except Exception as e:
+        logger.warning('Could not publish star change of voter %s: %s', voter_id, e)
+
+
+def publish_data_change():
+    """
+    Tell the other workers that voters changed, e.g. by an upload or a flask CLI command.
+
+    Returns False when the notice could not be sent, always with the memory
+    backend, whose single worker cannot be reached from other processes.
+    Failures only cost the other workers' cache invalidation.
+    """
+    if not isinstance(_backend, DatabaseBackend):
+        return False
+    try:
+        # Sent without starting a listener: the sending process may have no streams to feed
+        _backend.send({'type': DATA_CHANGED})
+    except Exception as e:
+        logger.warning('Could not publish a data change: %s', e)
+        return False
+    return True
+
+
+def format_event(event_id, event):
+    if event == RESYNC:
+        return f'event: {RESYNC}\ndata: {{}}\n\n'
+    return f'id: {event_id}\nevent: star\ndata: {json.dumps(event, separators=(",", ":"))}\n\n'
+
+
+def busy_stream():
+    """
+    SSE body for a client over the stream cap: only a retry delay, then the stream ends.
+
+    EventSource gives up for good on an error status such as 503, but
+    reconnects after a stream that ends normally, so the client comes back
+    on its own after the (jittered) delay instead of all at once.
+    """
+    return f'retry: {random.randint(*BUSY_RETRY_SECONDS) * 1000}\n\n'
+
+
+def stream_star_events(subscriber, last_event_id=None, max_seconds=300):
+    """
+    Yield the SSE body of one stream until max_seconds have passed.
+
+    The browser reconnects on its own and sends Last-Event-ID, so ending
+    streams regularly frees worker threads without losing events.
+    """
+    _backend.start()
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield 'retry: 3000\n\n'
+        if last_event_id:
+            missed = broker.replay(last_event_id)
+            for event_id, event in missed if missed is not None else [(None, RESYNC)]:
+                yield format_event(event_id, event)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event_id, event = subscriber.get(timeout=min(KEEPALIVE_SECONDS, remaining))
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event_id, event)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,287 @@
+"""
+Zip bundles of the star report split into one file per booth or karyakarta.
+
+The voters are read by a single streamed query ordered by the grouping
+column, with the rater of each voter joined in, so consecutive rows form
+one slice. Each slice is handed to a process pool that writes its XLSX or
+CSV file, and finished files are appended to the zip on disk as they come
+back. At most one slice per worker is in flight besides the one being read,
+so memory stays bounded by a few of the largest booths, never by the roll.
+
+Jobs are recorded in the export_jobs table so that any gunicorn worker can
+report their progress; the bundle itself is built on a background thread
+of the worker that received the request. That thread dies with its worker,
+e.g. when gunicorn recycles it after max_requests, so a running job stamps
+heartbeat_at every HEARTBEAT_SECONDS, and pending or running jobs without a
+stamp for STALE_SECONDS are marked failed when jobs are listed or polled.
+"""
+import csv
+import itertools
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from flask import current_app
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import aliased
+
+from app.database import db
+from app.models.export_job import ExportJob
+from app.models.star_log import StarLog
+from app.models.star_log_summary import StarLogSummary
+from app.models.user import User
+from app.models.voter import Voter
+
+
+GROUP_BY = ('booth', 'karyakarta')
+FILE_FORMATS = ('xlsx', 'csv')
+
+REPORT_COLUMNS = ['Voter ID', 'Full Name', 'Voting Card No', 'Number of Stars', 'Star Status',
+                  'Karyakarta Name', 'Star Given By', 'Booth No', 'Mobile No']
+
+# Rows fetched per round trip of the streamed query
+YIELD_ROWS = 1000
+
+# Seconds between heartbeats of a running job, and without one after which it is considered dead
+HEARTBEAT_SECONDS = 10
+STALE_SECONDS = 60
+
+UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\x00-\x1f]+')
+
+
+def report_row(voter, star_given_by):
+    """One star report line of a voter, keyed by REPORT_COLUMNS"""
+    star_count = voter.star_rating
+    return {
+        'Voter ID': voter.voter_id,
+        'Full Name': voter.get_display_name(),
+        'Voting Card No': voter.voting_card_no or 'N/A',
+        'Number of Stars': star_count,
+        'Star Status': f"{star_count} stars" if star_count > 0 else "No stars",
+        'Karyakarta Name': voter.karyakarta or 'N/A',
+        'Star Given By': star_given_by or 'N/A',
+        'Booth No': voter.booth_no or 'N/A',
+        'Mobile No': voter.mobile_no or 'N/A',
+    }
+
+
+def filter_star_status(query, star_status):
+    if star_status == 'with_stars':
+        return query.filter(Voter.star_rating > 0)
+    if star_status == 'without_stars':
+        return query.filter(Voter.star_rating == 0)
+    return query
+
+
+def report_query(group_by, star_status=None):
+    """
+    Stream (voter, rater username, group key) rows ordered by group.
+
+    The rater is the user of the voter's latest star log, or of its compacted
+    summary, like latest_raters() but joined into the same query.
+    """
+    latest = (select(StarLog.voter_id, func.max(StarLog.id).label('log_id'))
+              .group_by(StarLog.voter_id)
+              .subquery())
+    log_user = aliased(User)
+    summary_user = aliased(User)
+    # NULL and empty karyakarta names sort together as one "unassigned" slice
+    key = Voter.booth_no if group_by == 'booth' else func.coalesce(Voter.karyakarta, '')
+    query = (select(Voter, func.coalesce(log_user.username, summary_user.username), key)
+             .outerjoin(latest, latest.c.voter_id == Voter.id)
+             .outerjoin(StarLog, StarLog.id == latest.c.log_id)
+             .outerjoin(log_user, log_user.id == StarLog.user_id)
+             .outerjoin(StarLogSummary, StarLogSummary.voter_id == Voter.id)
+             .outerjoin(summary_user, summary_user.id == StarLogSummary.last_user_id))
+    query = filter_star_status(query, star_status)
+    return db.session.execute(query.order_by(key, Voter.id).execution_options(yield_per=YIELD_ROWS))
+
+
+def iter_slices(result):
+    """(group key, report rows) for each run of rows sharing a group key"""
+    for key, rows in itertools.groupby(result, key=lambda row: row[2]):
+        yield key, [list(report_row(voter, rater).values()) for voter, rater, _ in rows]
+
+
+def slice_name(group_by, key, taken):
+    """File name (without extension) of a slice, unique within the bundle"""
+    if group_by == 'booth':
+        name = f'booth_{key:03d}' if key is not None else 'booth_unassigned'
+    else:
+        # Keep Devanagari and other letters; drop only what file systems reject
+        name = 'karyakarta_' + (UNSAFE_FILENAME.sub('_', key).strip(' ._')[:80] or 'unassigned')
+    unique, n = name, 1
+    while unique in taken:
+        n += 1
+        unique = f'{name}_{n}'
+    taken.add(unique)
+    return unique
+
+
+def write_slice(directory, name, rows, file_format):
+    """Write one slice file; runs in a pool worker. Returns (path, row count)."""
+    path = os.path.join(directory, f'{name}.{file_format}')
+    if file_format == 'csv':
+        # BOM so that Excel opens Marathi names as UTF-8
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_COLUMNS)
+            writer.writerows(rows)
+        return path, len(rows)
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Star Report')
+    header = []
+    for title in REPORT_COLUMNS:
+        cell = WriteOnlyCell(worksheet, value=title)
+        cell.font = Font(color='FFFFFF', bold=True)
+        cell.fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+        header.append(cell)
+    worksheet.append(header)
+    for row in rows:
+        worksheet.append(row)
+    workbook.save(path)
+    return path, len(rows)
+
+
+def build_bundle(zip_path, slices, group_by, file_format, max_workers=1):
+    """
+    Write the (key, rows) slices into a zip at zip_path; returns (file count, row count).
+
+    Slices are written by a process pool when more than one worker is
+    allowed, and added to the zip in order as they finish.
+    """
+    workdir = tempfile.mkdtemp(dir=os.path.dirname(zip_path))
+    # XLSX files are already deflated
+    compression = zipfile.ZIP_DEFLATED if file_format == 'csv' else zipfile.ZIP_STORED
+    files = rows = 0
+    taken = set()
+    try:
+        with zipfile.ZipFile(zip_path + '.part', 'w', compression) as bundle:
+            def add(result):
+                nonlocal files, rows
+                path, count = result
+                bundle.write(path, arcname=os.path.basename(path))
+                os.remove(path)
+                files += 1
+                rows += count
+
+            if max_workers <= 1:
+                for key, slice_rows in slices:
+                    add(write_slice(workdir, slice_name(group_by, key, taken), slice_rows, file_format))
+            else:
+                # Spawned workers only import this module, never the forked web worker's state
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                    pending = deque()
+                    for key, slice_rows in slices:
+                        pending.append(pool.submit(write_slice, workdir, slice_name(group_by, key, taken),
+                                                   slice_rows, file_format))
+                        del slice_rows
+                        # Wait for the oldest slice before reading more than one slice per worker ahead
+                        while len(pending) >= max_workers:
+                            add(pending.popleft().result())
+                    while pending:
+                        add(pending.popleft().result())
+        os.replace(zip_path + '.part', zip_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if os.path.exists(zip_path + '.part'):
+            os.remove(zip_path + '.part')
+    return files, rows
+
+
+def _heartbeat(app, job_id, stop):
+    """Stamp the job every HEARTBEAT_SECONDS until stop is set"""
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            with app.app_context(), db.engine.begin() as conn:
+                conn.execute(update(ExportJob).where(ExportJob.id == job_id)
+                             .values(heartbeat_at=func.current_timestamp()))
+        except Exception as e:
+            app.logger.warning('Could not record the heartbeat of export job %s: %s', job_id, e)
+
+
+def run_export_job(app, job_id):
+    """Build the bundle of an export job and record the outcome"""
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(app, job_id, stop), name=f'export-{job_id}-heartbeat', daemon=True).start()
+    try:
+        _run_export_job(app, job_id)
+    finally:
+        stop.set()
+
+
+def _run_export_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(ExportJob, job_id)
+        job.status = 'running'
+        job.heartbeat_at = db.func.current_timestamp()
+        db.session.commit()
+        group_by, file_format, star_status = job.group_by, job.file_format, job.star_status
+        directory = app.config['EXPORT_DIR']
+        os.makedirs(directory, exist_ok=True)
+        zip_path = os.path.join(directory, f'star_report_{group_by}_{job_id}.zip')
+        try:
+            files, rows = build_bundle(zip_path, iter_slices(report_query(group_by, star_status)),
+                                       group_by, file_format, app.config['EXPORT_WORKERS'])
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            app.logger.exception('Export job %s failed', job_id)
+        else:
+            job = db.session.get(ExportJob, job_id)
+            job.status = 'done'
+            job.path = zip_path
+            job.file_count = files
+            job.row_count = rows
+        job.finished_at = db.func.current_timestamp()
+        db.session.commit()
+
+
+def start_export_job(user, group_by, file_format, star_status=None):
+    """Record an export job and start building its bundle in the background"""
+    if group_by not in GROUP_BY:
+        raise ValueError(f'Group by must be one of {", ".join(GROUP_BY)}')
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f'Format must be one of {", ".join(FILE_FORMATS)}')
+    job = ExportJob(user_id=user.id, group_by=group_by, file_format=file_format, star_status=star_status or None)
+    db.session.add(job)
+    db.session.commit()
+    threading.Thread(target=run_export_job, args=(current_app._get_current_object(), job.id),
+                     name=f'export-{job.id}', daemon=True).start()
+    return job
+
+
+def fail_stale_export_jobs():
+    """Mark pending and running jobs whose worker stopped building them as failed; returns how many"""
+    now = db.session.query(func.current_timestamp()).scalar()
+    result = db.session.execute(
+        update(ExportJob)
+        .where(ExportJob.status.in_(('pending', 'running')),
+               func.coalesce(ExportJob.heartbeat_at, ExportJob.created_at) < now - timedelta(seconds=STALE_SECONDS))
+        .values(status='failed', error='The worker building this export stopped; start it again',
+                finished_at=func.current_timestamp())
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def delete_export_job(job):
+    if job.path and os.path.exists(job.path):
+        os.remove(job.path)
+    db.session.delete(job)
+    db.session.commit()
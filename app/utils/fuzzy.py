@@ -0,0 +1,300 @@
+"""
+Typo-tolerant name search over an in-memory trigram index.
+
+The index is built from the transliterated name keys (app.utils.search_keys),
+which already fold script and common spelling variants, so edit distance
+only has to absorb real typos. Distinct name words form a small vocabulary
+compared to the number of voters:
+
+- each vocabulary word has a posting list of the voters carrying it, and
+  each voter the ids of its name words
+- trigrams of the words select candidate words for a query word, which are
+  re-ranked by bounded Levenshtein distance
+- multi-word queries take the candidates of the rarest query word and score
+  them by how well their other name words match the remaining query words
+
+Searches stop at a deadline, checked in every candidate loop, and report
+whether the result was truncated. The index lives in each worker process
+and is built on a background thread, from the worker's first request on and
+again after invalidate_name_index() (uploads, clear_data) or when it is
+older than its TTL. Searches keep using the previous index while a rebuild
+runs, so no request waits for a build.
+"""
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+from array import array
+
+from app.utils.search_keys import name_key
+
+
+logger = logging.getLogger(__name__)
+
+# Shortest query key matched by edit distance; shorter keys only match by prefix
+MIN_FUZZY_LENGTH = 3
+
+
+def max_distance(key):
+    """Edits tolerated for a key of this length"""
+    return 1 if len(key) <= 4 else 2
+
+
+def trigrams(key):
+    padded = f'${key}$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_levenshtein(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j, cb in enumerate(b, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class FuzzyNameIndex:
+    def __init__(self):
+        self.words = []  # word id -> key
+        self.word_ids = {}  # key -> word id
+        self.postings = []  # word id -> array of voter ids
+        self.voter_words = []  # per name part: array of word ids indexed by voter id, -1 if blank
+        self.trigram_words = {}  # trigram -> array of word ids
+        self.sorted_words = []  # keys in sorted order, for prefix lookups
+        self.voter_count = 0
+        self.built_at = 0.0
+        self.build_seconds = 0.0
+        self.generation = 0
+
+    @classmethod
+    def build(cls, rows):
+        """Build the index from (voter id, key, key, ...) rows"""
+        started = time.perf_counter()
+        index = cls()
+        for row in rows:
+            voter_id = row[0]
+            index.voter_count += 1
+            if not index.voter_words:
+                index.voter_words = [array('i') for _ in row[1:]]
+            if len(index.voter_words[0]) <= voter_id:
+                padding = [-1] * (voter_id + 1 - len(index.voter_words[0]))
+                for words in index.voter_words:
+                    words.extend(padding)
+            seen = set()
+            for slot, key in enumerate(row[1:]):
+                if not key:
+                    continue
+                word_id = index.word_ids.get(key)
+                if word_id is None:
+                    word_id = index.word_ids[key] = len(index.words)
+                    index.words.append(key)
+                    index.postings.append(array('i'))
+                index.voter_words[slot][voter_id] = word_id
+                if word_id not in seen:
+                    seen.add(word_id)
+                    index.postings[word_id].append(voter_id)
+        for word_id, key in enumerate(index.words):
+            for trigram in trigrams(key):
+                index.trigram_words.setdefault(trigram, array('i')).append(word_id)
+        index.sorted_words = sorted(index.words)
+        index.built_at = time.time()
+        index.build_seconds = time.perf_counter() - started
+        return index
+
+    def match_word(self, key, deadline=None):
+        """
+        Return ([(word id, similarity)], truncated) for vocabulary words close to key, best first.
+
+        Stops comparing words once time.perf_counter() passes deadline.
+        """
+        matches = {}
+        truncated = False
+        # Words the user may still be typing
+        start = bisect.bisect_left(self.sorted_words, key)
+        for word in self.sorted_words[start:start + 50]:
+            if not word.startswith(key):
+                break
+            matches[self.word_ids[word]] = 1.0 if word == key else 0.5 + 0.4 * len(key) / len(word)
+        if len(key) >= MIN_FUZZY_LENGTH:
+            limit = max_distance(key)
+            query_trigrams = trigrams(key)
+            # Each edit destroys at most three trigrams
+            required = max(1, len(query_trigrams) - 3 * limit)
+            shared = {}
+            for trigram in query_trigrams:
+                for word_id in self.trigram_words.get(trigram, ()):
+                    shared[word_id] = shared.get(word_id, 0) + 1
+                if deadline is not None and time.perf_counter() > deadline:
+                    truncated = True
+                    break
+            for count, (word_id, shared_count) in enumerate(shared.items()):
+                if count % 256 == 255 and deadline is not None and time.perf_counter() > deadline:
+                    truncated = True
+                    break
+                if shared_count < required or word_id in matches:
+                    continue
+                word = self.words[word_id]
+                distance = bounded_levenshtein(key, word, limit)
+                if distance <= limit:
+                    matches[word_id] = 1.0 - distance / max(len(key), len(word))
+        return sorted(matches.items(), key=lambda item: (-item[1], self.words[item[0]])), truncated
+
+    def search(self, text, limit=20, budget_ms=50):
+        """
+        Return ([(voter id, score)], truncated) for the voters whose names best match text.
+
+        score is the mean similarity of the query words to the voter's best
+        matching name words, between 0 and 1.
+        """
+        deadline = time.perf_counter() + budget_ms / 1000
+        keys = [key for key in (name_key(word) for word in str(text).split()) if key]
+        if not keys:
+            return [], False
+        truncated = False
+        word_matches = []
+        for key in keys:
+            matches, word_truncated = self.match_word(key, deadline)
+            word_matches.append(matches)
+            truncated = truncated or word_truncated
+
+        if len(keys) == 1:
+            # Voters sharing a name are interchangeable, so show a few voters of each close
+            # spelling before filling the remaining places with the best ones
+            matches = word_matches[0][:limit]
+            per_word = max(2, limit // max(1, len(matches)))
+            results = {}
+            for quota in (per_word, limit):
+                for word_id, similarity in matches:
+                    if time.perf_counter() > deadline:
+                        truncated = True
+                        break
+                    taken = 0
+                    for voter_id in self.postings[word_id]:
+                        if len(results) >= limit or taken >= quota:
+                            break
+                        if voter_id not in results:
+                            results[voter_id] = similarity
+                        taken += 1
+            ranked = sorted(results.items(), key=lambda item: -item[1])
+            return ranked, truncated or time.perf_counter() > deadline
+
+        similarities = [dict(matches) for matches in word_matches]
+        matched = [i for i in range(len(keys)) if word_matches[i]]
+        if not matched:
+            return [], truncated
+        # Candidates come from the query word with the fewest voters
+        base = min(matched, key=lambda i: sum(len(self.postings[word_id]) for word_id in similarities[i]))
+        others = [similarities[i] for i in range(len(keys)) if i != base]
+
+        candidates = {}
+        for word_id, similarity in word_matches[base]:
+            for voter_id in self.postings[word_id]:
+                if voter_id not in candidates:
+                    candidates[voter_id] = similarity
+            if time.perf_counter() > deadline:
+                truncated = True
+                break
+
+        scored = []
+        for count, (voter_id, total) in enumerate(candidates.items()):
+            voter_word_ids = [words[voter_id] for words in self.voter_words]
+            for query_similarities in others:
+                total += max(query_similarities.get(word_id, 0.0) for word_id in voter_word_ids)
+            scored.append((total, -voter_id))
+            if count % 4096 == 4095 and time.perf_counter() > deadline:
+                truncated = True
+                break
+        top = heapq.nlargest(limit, scored)
+        return [(-negative_id, total / len(keys)) for total, negative_id in top], truncated or time.perf_counter() > deadline
+
+
+_lock = threading.Lock()
+_index = None
+_generation = 0
+_builder = None  # pid of the process whose background build is running
+_app = None
+_load_rows = None
+
+
+def _start_build():
+    """Start a background build in this process unless one is running; call with _lock held"""
+    global _builder
+    # A builder recorded before gunicorn forked this worker does not run here
+    if _app is None or _builder == os.getpid():
+        return
+    _builder = os.getpid()
+    threading.Thread(target=_build, name='fuzzy-index', daemon=True).start()
+
+
+def _build():
+    global _index, _builder
+    try:
+        while True:
+            with _lock:
+                generation = _generation
+            with _app.app_context():
+                index = FuzzyNameIndex.build(_load_rows())
+            index.generation = generation
+            with _lock:
+                _index = index
+                # Invalidated while building: the new index already misses some changes
+                if generation == _generation:
+                    return
+    except Exception:
+        logger.exception('Could not build the fuzzy name index')
+    finally:
+        with _lock:
+            _builder = None
+
+
+def _warm():
+    if _index is None:
+        with _lock:
+            _start_build()
+
+
+def init_name_index(app, load_rows):
+    """Build each worker's index from load_rows(), run in an app context, starting with its first request"""
+    global _app, _load_rows
+    _app = app
+    _load_rows = load_rows
+    app.before_request(_warm)
+
+
+def invalidate_name_index():
+    """Mark the index of this worker outdated after voters were added, removed or renamed"""
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def is_current(index):
+    """Whether index already covers every change reported by invalidate_name_index()"""
+    with _lock:
+        return index.generation == _generation
+
+
+def get_name_index(ttl=300):
+    """
+    Return the worker's index, or None until its first build has finished.
+
+    A missing, invalidated or stale index is rebuilt in the background while
+    the current one keeps being returned.
+    """
+    with _lock:
+        index = _index
+        if index is None or index.generation != _generation or time.time() - index.built_at >= ttl:
+            _start_build()
+    return index
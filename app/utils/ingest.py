@@ -0,0 +1,309 @@
+"""
+Excel ingest pipeline: sheet discovery, parallel parsing and row normalization.
+
+Nothing in this module touches the database or the Flask app so that the
+parsing functions can run inside ProcessPoolExecutor workers.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from app.utils.column_mapping import normalize_headers, detect_column_mapping, compute_fallbacks
+from app.utils.search_keys import voter_search_keys
+from app.utils.mobile_numbers import mobile_keys
+from app.utils.voter_record import VoterRecord
+
+
+# Workbook types accepted on their own or inside a .zip archive
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+# One sheet of an upload. workbook is the uploaded file as a seekable buffer, or as bytes once the
+# unit is sent to a worker process; member is the file name inside a .zip archive, if any
+IngestUnit = namedtuple('IngestUnit', ['label', 'workbook', 'member', 'sheet_name'])
+
+
+# Parse pool of this web worker process, created by the first parallel parse and kept for later uploads
+# so that its workers import pandas and openpyxl only once; (pid, max_workers) it was made for
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+# Text fragments that mark a cell as a booth/yadibhag label rather than a person's name
+BOOTH_NAME_INDICATORS = ['booth', ' booth', 'बूथ', 'जाहीर', 'nahi', 'no', 'not', 'yadibhag', 'yadi', 'bhag', ':', 'टेल्को', 'कपूर', 'से.क्र', 'सेन्ट', 'उर्सल', 'स्कुल', 'लोकम', 'टेतको']
+
+# Fields whose fallback values are skipped when they look like booth names
+NAME_FIELDS = {'first_name', 'father_name', 'surname', 'full_name', 'yadibhag_name'}
+
+
+def looks_like_booth_name(value):
+    return any(indicator in value.lower() for indicator in BOOTH_NAME_INDICATORS)
+
+
+def process_excel_file(excel_file, column_mapping=None, fallbacks=None, sheet_name=0):
+    """
+    Process Excel file and extract voter data without restrictions.
+
+    excel_file is a buffer holding the workbook, or its path.
+
+    column_mapping maps normalized headers to voter fields and fallbacks lists
+    the unmapped headers that may fill a blank field; both come from a saved
+    mapping profile. When they are omitted the mapping is detected from the
+    header row.
+    """
+    # Read Excel file
+    df = pd.read_excel(excel_file, sheet_name=sheet_name)
+    df.columns = normalize_headers(df.columns)
+    
+    if column_mapping is None:
+        column_mapping = detect_column_mapping(list(df.columns))
+    if fallbacks is None:
+        fallbacks = compute_fallbacks(list(df.columns), column_mapping)
+    
+    if 'voter_id' not in column_mapping.values():
+        raise ValueError('No Voter ID column found in Excel file. Please include a column with voter identification (e.g., voter_id, srno, voting card no, etc.)')
+    
+    # Rename columns based on mapping
+    renamed_df = df.rename(columns={header: field for header, field in column_mapping.items() if header in df.columns})
+    
+    # Process each row
+    voters_data = []
+    for index, row in renamed_df.iterrows():
+        # Extract data - no validation, accept any data
+        # Only use actual voter ID from Excel, don't generate one
+        voter_id_val = row.get('voter_id')
+        if voter_id_val is None or pd.isna(voter_id_val) or str(voter_id_val).strip() == '':
+            raise ValueError(f'Voter ID is missing in row {index + 1}. All voters must have a valid ID.')
+        voter_data = {
+            'voter_id': str(voter_id_val).strip(),
+            'booth_no': None,
+            'first_name': str(row.get('first_name', '')).strip() if pd.notna(row.get('first_name', '')) else '',
+            'father_name': str(row.get('father_name', '')).strip() if pd.notna(row.get('father_name', '')) else '',
+            'surname': str(row.get('surname', '')).strip() if pd.notna(row.get('surname', '')) else '',
+            'full_name': str(row.get('full_name', '')).strip() if pd.notna(row.get('full_name', '')) else '',
+            'mobile_no': str(row.get('mobile_no', '')).strip() if pd.notna(row.get('mobile_no', '')) else '',
+            'yadibhag_no': str(row.get('yadibhag_no', '')).strip() if pd.notna(row.get('yadibhag_no', '')) else '',
+            'yadibhag_name': str(row.get('yadibhag_name', '')).strip() if pd.notna(row.get('yadibhag_name', '')) else '',
+            'voter_srno': str(row.get('voter_srno', '')).strip() if pd.notna(row.get('voter_srno', '')) else '',
+            'age': None,
+            'gender': str(row.get('gender', '')).strip() if pd.notna(row.get('gender', '')) else '',
+            'voting_card_no': str(row.get('voting_card_no', '')).strip() if pd.notna(row.get('voting_card_no', '')) else '',
+            'karyakarta': str(row.get('karyakarta', '')).strip() if pd.notna(row.get('karyakarta', '')) else ''
+        }
+        
+        # Extract age if available
+        age_val = row.get('age')
+        if age_val is not None and pd.notna(age_val):
+            try:
+                voter_data['age'] = int(age_val)
+            except (ValueError, TypeError):
+                # If age is not numeric, ignore it
+                pass
+        
+        # Extract booth number if available and is numeric
+        booth_val = row.get('booth_no')
+        if booth_val is not None and pd.notna(booth_val):
+            try:
+                voter_data['booth_no'] = int(booth_val)
+            except (ValueError, TypeError):
+                # If booth number is not numeric, ignore it
+                pass
+        
+        # Fill empty fields from unmapped columns listed in the profile
+        for field in ['first_name', 'father_name', 'surname', 'full_name', 'mobile_no', 'yadibhag_no', 'yadibhag_name',
+                      'voter_srno', 'age', 'gender', 'voting_card_no']:
+            if voter_data[field] not in ('', None):
+                continue
+            for col in fallbacks.get(field, []):
+                val = row.get(col)
+                if val is None or not pd.notna(val):
+                    continue
+                if field == 'age':
+                    try:
+                        voter_data['age'] = int(val)
+                        break
+                    except (ValueError, TypeError):
+                        continue
+                val_str = str(val).strip()
+                # Skip if it looks like a booth name or yadibhag name
+                if field in NAME_FIELDS and looks_like_booth_name(val_str):
+                    continue
+                voter_data[field] = val_str
+                break
+        
+        # Look for full name (constructed from other name fields if no explicit full name field exists)
+        if not voter_data['full_name']:
+            full_name_parts = []
+            for part in [voter_data['first_name'], voter_data['father_name'], voter_data['surname']]:
+                if part and not looks_like_booth_name(part):
+                    full_name_parts.append(part)
+            
+            if full_name_parts:
+                voter_data['full_name'] = ' '.join(full_name_parts)
+        
+        # Look for karyakarta
+        if not voter_data['karyakarta']:
+            for col in fallbacks.get('karyakarta', []):
+                val = row.get(col)
+                if val is not None and pd.notna(val):
+                    voter_data['karyakarta'] = str(val).strip()
+                    break
+        
+        # Try to extract booth number from any column if not already set
+        if voter_data['booth_no'] is None:
+            for col in fallbacks.get('booth_no', []):
+                booth_val = row.get(col)
+                if booth_val is not None and pd.notna(booth_val):
+                    try:
+                        voter_data['booth_no'] = int(booth_val)
+                        break
+                    except (ValueError, TypeError):
+                        pass
+        
+        # Transliterated name keys, computed here so that parallel workers share the work
+        voter_data.update(voter_search_keys(
+            *(part if not looks_like_booth_name(part) else '' for part in
+              (voter_data['first_name'], voter_data['father_name'], voter_data['surname'])),
+            voter_data['full_name']
+        ))
+        voter_data.update(mobile_keys(voter_data['mobile_no']))
+        
+        # Only the slotted record outlives the loop iteration
+        voters_data.append(VoterRecord(**voter_data))
+    
+    return voters_data
+
+
+def iter_chunks(rows, chunk_size):
+    """Yield consecutive slices of at most chunk_size rows"""
+    for start in range(0, len(rows), chunk_size):
+        yield rows[start:start + chunk_size]
+
+
+def hash_chunk(rows):
+    """Return a stable hash of a chunk of normalized voter rows"""
+    payload = json.dumps([row.as_dict() for row in rows], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _open_workbook(workbook):
+    if isinstance(workbook, bytes):
+        return io.BytesIO(workbook)
+    # The upload buffer is shared by the units of a request, read one after the other
+    workbook.seek(0)
+    return workbook
+
+
+def _open_unit(unit):
+    """Return something pandas can read for the workbook holding a unit"""
+    if unit.member is None:
+        return _open_workbook(unit.workbook)
+    with zipfile.ZipFile(_open_workbook(unit.workbook)) as archive:
+        return io.BytesIO(archive.read(unit.member))
+
+
+def _portable_unit(unit, members):
+    """The unit with its workbook as bytes, for a worker process; members caches the bytes by member"""
+    if unit.member not in members:
+        members[unit.member] = _open_unit(unit).read()
+    return unit._replace(workbook=members[unit.member], member=None)
+
+
+def _sheet_names(workbook):
+    with pd.ExcelFile(workbook) as excel:
+        return excel.sheet_names
+
+
+def discover_units(workbook, filename):
+    """List every sheet of an uploaded workbook, or of each workbook inside a .zip archive, given its buffer"""
+    if filename.lower().endswith('.zip'):
+        with zipfile.ZipFile(_open_workbook(workbook)) as archive:
+            members = sorted(
+                name for name in archive.namelist()
+                if name.lower().endswith(EXCEL_EXTENSIONS)
+                and not name.endswith('/')
+                and not os.path.basename(name).startswith(('.', '~$'))
+                and '__MACOSX' not in name
+            )
+        if not members:
+            raise ValueError('The zip archive does not contain any .xlsx or .xls files')
+        workbooks = [(member, member) for member in members]
+    else:
+        workbooks = [(filename, None)]
+    
+    units = []
+    for label, member in workbooks:
+        source = IngestUnit(label, workbook, member, 0)
+        sheet_names = _sheet_names(_open_unit(source))
+        for sheet_name in sheet_names:
+            sheet_label = label if len(sheet_names) == 1 else f'{label} [{sheet_name}]'
+            units.append(IngestUnit(sheet_label, workbook, member, sheet_name))
+    return units
+
+
+def read_headers(unit):
+    """Return the header row of a unit without reading its data rows"""
+    return list(pd.read_excel(_open_unit(unit), sheet_name=unit.sheet_name, nrows=0).columns)
+
+
+def parse_unit(unit, column_mapping=None, fallbacks=None):
+    """Normalize the rows of one sheet; runs in a worker process"""
+    try:
+        return process_excel_file(_open_unit(unit), column_mapping, fallbacks, sheet_name=unit.sheet_name)
+    except ValueError as ve:
+        raise ValueError(f'{unit.label}: {ve}')
+
+
+def _parse_pool(max_workers):
+    global _pool, _pool_key
+    key = (os.getpid(), max_workers)
+    with _pool_lock:
+        if _pool_key != key:
+            if _pool is not None and _pool_key[0] == key[0]:
+                _pool.shutdown(wait=False)
+            # Spawned workers only import this module, never the forked web worker's state
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_key = key
+        return _pool
+
+
+def _discard_pool(pool):
+    """Forget a pool whose worker died, so that the next parallel parse starts a fresh one"""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_key = None, None
+    pool.shutdown(wait=False)
+
+
+def parse_units(jobs, max_workers=1, upload_size=None, min_parallel_size=0):
+    """
+    Parse (unit, column_mapping, fallbacks) jobs and return their voter rows in job order.
+
+    Jobs run in this process's parse pool when there is more than one of them,
+    more than one worker is allowed and the upload is at least
+    min_parallel_size bytes; a single sheet or a small upload is parsed inline,
+    where it is done before the pool would have handed it out. Workers receive
+    the bytes of the workbook holding their sheet, as they cannot share the
+    upload buffer.
+    """
+    if max_workers <= 1 or len(jobs) <= 1 or (upload_size is not None and upload_size < min_parallel_size):
+        return [parse_unit(*job) for job in jobs]
+    
+    members = {}
+    jobs = [(_portable_unit(unit, members), column_mapping, fallbacks) for unit, column_mapping, fallbacks in jobs]
+    pool = _parse_pool(max_workers)
+    try:
+        futures = [pool.submit(parse_unit, *job) for job in jobs]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
@@ -0,0 +1,263 @@
+"""
+Per-request performance instrumentation exported in Prometheus text format.
+
+Each request records its latency, the number and total time of the SQL
+statements it ran (via SQLAlchemy cursor events) and the ORM rows it loaded.
+Aggregates are kept per endpoint in this worker process and rendered by
+render_metrics() for the /metrics endpoint.
+"""
+import heapq
+import re
+import threading
+import time
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Statements-per-request histogram buckets
+STATEMENT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)
+
+# Number of slowest SQL statements kept for /metrics
+SLOWEST_STATEMENTS = 10
+
+# Longest statement text kept for the slowest statement list
+STATEMENT_TEXT_LIMIT = 300
+
+SELECT_LIST = re.compile(r'^SELECT .+? FROM ')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            yield bound, running
+
+
+class RequestStats:
+    """Counters for the request in flight, stored on flask.g"""
+    __slots__ = ('started', 'sql_count', 'sql_time', 'rows', 'timeline')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.rows = 0
+        # List of (offset, duration, statement, parameters) when the request is being profiled
+        self.timeline = None
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # (endpoint, method) -> Histogram
+        self.statements = {}  # endpoint -> Histogram of statements per request
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.sql_seconds = {}  # endpoint -> total SQL time
+        self.sql_total = {}  # endpoint -> total statements
+        self.rows = {}  # endpoint -> ORM rows loaded
+        self.slow_requests = {}  # endpoint -> count above the slow request threshold
+        self.slowest = []  # min-heap of (duration, statement, endpoint)
+
+    def record_request(self, endpoint, method, status, duration, stats, slow):
+        with self._lock:
+            key = (endpoint, method)
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(duration)
+            if endpoint not in self.statements:
+                self.statements[endpoint] = Histogram(STATEMENT_BUCKETS)
+            self.statements[endpoint].observe(stats.sql_count)
+            status_key = (endpoint, method, status)
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.sql_seconds[endpoint] = self.sql_seconds.get(endpoint, 0.0) + stats.sql_time
+            self.sql_total[endpoint] = self.sql_total.get(endpoint, 0) + stats.sql_count
+            self.rows[endpoint] = self.rows.get(endpoint, 0) + stats.rows
+            if slow:
+                self.slow_requests[endpoint] = self.slow_requests.get(endpoint, 0) + 1
+
+    def record_statement(self, duration, statement, endpoint):
+        # Cheap check first: most statements are faster than the current top N
+        if len(self.slowest) >= SLOWEST_STATEMENTS and duration <= self.slowest[0][0]:
+            return
+        # Collapse whitespace and the select list so the interesting part of the statement fits the label
+        statement = SELECT_LIST.sub('SELECT ... FROM ', ' '.join(statement.split()), count=1)
+        with self._lock:
+            entry = (duration, statement[:STATEMENT_TEXT_LIMIT], endpoint)
+            if len(self.slowest) < SLOWEST_STATEMENTS:
+                heapq.heappush(self.slowest, entry)
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+
+registry = MetricsRegistry()
+
+
+def current_stats():
+    """Return the RequestStats of the request in flight, if any"""
+    if not has_app_context():
+        return None
+    return g.get('_request_stats')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_query_started'].pop()
+    duration = time.perf_counter() - started
+    stats = current_stats()
+    if stats is None:
+        return
+    stats.sql_count += 1
+    stats.sql_time += duration
+    if stats.timeline is not None:
+        stats.timeline.append((started - stats.started, duration, statement, repr(parameters)[:200]))
+    registry.record_statement(duration, statement, request.endpoint or 'unmatched')
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute is not called for failed statements
+    started = exception_context.connection.info.get('_query_started') if exception_context.connection else None
+    if started:
+        started.pop()
+
+
+def _on_load(target, context):
+    stats = current_stats()
+    if stats is not None:
+        stats.rows += 1
+
+
+def _start_request():
+    g._request_stats = RequestStats()
+
+
+def _finish_request(app):
+    def finish(response):
+        stats = g.pop('_request_stats', None)
+        if stats is None:
+            return response
+        duration = time.perf_counter() - stats.started
+        endpoint = request.endpoint or 'unmatched'
+        slow = duration * 1000 >= app.config['SLOW_REQUEST_MS']
+        registry.record_request(endpoint, request.method, response.status_code, duration, stats, slow)
+        if slow:
+            app.logger.warning(
+                'Slow request %s %s (%s): %.0f ms, %d SQL statements in %.0f ms, %d rows loaded',
+                request.method, request.full_path.rstrip('?'), endpoint, duration * 1000,
+                stats.sql_count, stats.sql_time * 1000, stats.rows
+            )
+        return response
+    return finish
+
+
+def register_sql_events(db):
+    """Attach the statement timing and row counting listeners, once per process"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+        event.listen(db.Model, 'load', _on_load, propagate=True)
+
+
+def init_metrics(app, db):
+    """Register request hooks and SQLAlchemy events on the app"""
+    if not app.config['METRICS_ENABLED']:
+        return
+    register_sql_events(db)
+    # Registered first so that the timing covers the other before_request hooks
+    app.before_request_funcs.setdefault(None, []).insert(0, _start_request)
+    app.after_request(_finish_request(app))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _histogram_lines(name, histogram, **labels):
+    for bound, count in histogram.cumulative():
+        yield f'{name}_bucket{_labels(**labels, le=bound)} {count}'
+    yield f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}'
+    yield f'{name}_sum{_labels(**labels)} {histogram.total:.6f}'
+    yield f'{name}_count{_labels(**labels)} {histogram.count}'
+
+
+def render_metrics(extra=()):
+    """
+    Render all collected metrics in the Prometheus text exposition format.
+
+    extra is an iterable of (name, type, help text, value) for unlabelled
+    metrics owned by other modules, such as the search cache counters.
+    """
+    lines = []
+    with registry._lock:
+        lines.append('# HELP voter_http_request_duration_seconds Request latency by endpoint.')
+        lines.append('# TYPE voter_http_request_duration_seconds histogram')
+        for (endpoint, method), histogram in sorted(registry.latency.items()):
+            lines.extend(_histogram_lines('voter_http_request_duration_seconds', histogram, endpoint=endpoint, method=method))
+
+        lines.append('# HELP voter_http_requests_total Requests by endpoint and status code.')
+        lines.append('# TYPE voter_http_requests_total counter')
+        for (endpoint, method, status), count in sorted(registry.requests.items()):
+            lines.append(f'voter_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        lines.append('# HELP voter_sql_statements_per_request SQL statements executed per request.')
+        lines.append('# TYPE voter_sql_statements_per_request histogram')
+        for endpoint, histogram in sorted(registry.statements.items()):
+            lines.extend(_histogram_lines('voter_sql_statements_per_request', histogram, endpoint=endpoint))
+
+        lines.append('# HELP voter_sql_statements_total SQL statements executed.')
+        lines.append('# TYPE voter_sql_statements_total counter')
+        for endpoint, count in sorted(registry.sql_total.items()):
+            lines.append(f'voter_sql_statements_total{_labels(endpoint=endpoint)} {count}')
+
+        lines.append('# HELP voter_sql_duration_seconds_total Time spent executing SQL.')
+        lines.append('# TYPE voter_sql_duration_seconds_total counter')
+        for endpoint, seconds in sorted(registry.sql_seconds.items()):
+            lines.append(f'voter_sql_duration_seconds_total{_labels(endpoint=endpoint)} {seconds:.6f}')
+
+        lines.append('# HELP voter_orm_rows_loaded_total ORM rows loaded from query results.')
+        lines.append('# TYPE voter_orm_rows_loaded_total counter')
+        for endpoint, count in sorted(registry.rows.items()):
+            lines.append(f'voter_orm_rows_loaded_total{_labels(endpoint=endpoint)} {count}')
+
+        lines.append('# HELP voter_slow_requests_total Requests slower than SLOW_REQUEST_MS.')
+        lines.append('# TYPE voter_slow_requests_total counter')
+        for endpoint, count in sorted(registry.slow_requests.items()):
+            lines.append(f'voter_slow_requests_total{_labels(endpoint=endpoint)} {count}')
+
+        lines.append('# HELP voter_sql_slowest_statement_seconds Slowest SQL statements seen by this worker.')
+        lines.append('# TYPE voter_sql_slowest_statement_seconds gauge')
+        for rank, (duration, statement, endpoint) in enumerate(sorted(registry.slowest, reverse=True), start=1):
+            lines.append(f'voter_sql_slowest_statement_seconds{_labels(rank=rank, endpoint=endpoint, statement=statement)} {duration:.6f}')
+
+    for name, metric_type, help_text, value in extra:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
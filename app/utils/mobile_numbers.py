@@ -0,0 +1,72 @@
+"""
+Canonical mobile numbers for indexed exact and suffix lookups.
+
+Rolls hold mobile numbers as typed: "+91 98765 43210", "098765-43210",
+Devanagari digits, or "9876543210.0" from float-typed Excel cells. At
+ingest each number is reduced to its 10 digits (mobile_norm) and the same
+digits reversed (mobile_rev). Both columns are indexed, so a full number is
+an exact lookup and "last 4 digits" is a prefix range scan on mobile_rev.
+Nothing here touches the database, so ingest workers can compute the keys.
+"""
+import re
+
+from sqlalchemy import or_
+
+from app.utils.search_keys import DEVANAGARI_DIGITS, key_prefix_condition
+
+
+# Float-typed cells come back as "9876543210.0" or "9.87654321E9"
+FLOAT_NUMBER = re.compile(r'^\d+(\.\d+)?[eE][+-]?\d+$|^\d+\.0+$')
+NON_DIGITS = re.compile(r'\D')
+# What a search box input must look like to be treated as a number
+NUMERIC_INPUT = re.compile(r'^\+?[\d\s()-]+$')
+
+MOBILE_DIGITS = 10
+# Shorter numeric searches would match too many voters to be worth an index scan
+MIN_PARTIAL_DIGITS = 3
+
+
+def normalize_mobile(value):
+    """The 10-digit form of a mobile number, or None if it is not one"""
+    if value is None:
+        return None
+    text = str(value).strip().translate(DEVANAGARI_DIGITS)
+    if FLOAT_NUMBER.match(text):
+        try:
+            text = str(int(float(text)))
+        except (ValueError, OverflowError):
+            return None
+    digits = NON_DIGITS.sub('', text)
+    # Country code (+91, 0091) or trunk prefix (0)
+    if len(digits) == 14 and digits.startswith('0091'):
+        digits = digits[4:]
+    elif len(digits) == 12 and digits.startswith('91'):
+        digits = digits[2:]
+    elif len(digits) == 11 and digits.startswith('0'):
+        digits = digits[1:]
+    return digits if len(digits) == MOBILE_DIGITS else None
+
+
+def mobile_keys(value):
+    """Values of the mobile_norm and mobile_rev columns"""
+    norm = normalize_mobile(value)
+    return {'mobile_norm': norm, 'mobile_rev': norm[::-1] if norm else None}
+
+
+def mobile_search_condition(norm_column, rev_column, text):
+    """
+    Indexed condition for a numeric search input, or None if it is not numeric.
+
+    A full number is matched exactly; fewer digits match the start or the end
+    of the number, both as index range scans.
+    """
+    text = str(text).strip().translate(DEVANAGARI_DIGITS)
+    if not NUMERIC_INPUT.match(text):
+        return None
+    norm = normalize_mobile(text)
+    if norm:
+        return norm_column == norm
+    digits = NON_DIGITS.sub('', text)
+    if len(digits) < MIN_PARTIAL_DIGITS or len(digits) > MOBILE_DIGITS:
+        return None
+    return or_(key_prefix_condition(norm_column, digits), key_prefix_condition(rev_column, digits[::-1]))
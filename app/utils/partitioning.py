@@ -0,0 +1,292 @@
+"""
+PostgreSQL declarative partitioning of voters and star_logs by booth number.
+
+Partitioned tables cannot enforce a unique constraint that leaves out the
+partition key, so once voters is partitioned the global uniqueness of
+voter_id is kept by the voter_id_registry table, maintained by a trigger.
+star_logs carries a denormalized booth_no so that it can be partitioned the
+same way and reference voters by (id, booth_no). Foreign keys that other
+tables hold on voters or star_logs are moved to the new tables as well:
+as (column, booth_no) when the table has a booth_no column, otherwise they
+are dropped, since a single column cannot reference a partitioned table.
+
+SQLite and unmigrated PostgreSQL databases keep the plain tables, and the
+helpers used at request time do nothing for them.
+"""
+import logging
+import re
+
+from sqlalchemy import bindparam, text
+
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('range', 'list')
+
+# Minimum server version: foreign keys that reference partitioned tables need 12
+MIN_SERVER_VERSION = 120000
+
+PARTITIONED_TABLES = ('voters', 'star_logs')
+
+# Engine URL -> bool, so request handlers do not query the catalog every time
+_partitioned = {}
+
+REGISTRY_DDL = """
+CREATE TABLE voter_id_registry (
+    voter_id VARCHAR(100) PRIMARY KEY,
+    booth_no INTEGER
+);
+
+CREATE FUNCTION voter_id_registry_sync() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM voter_id_registry WHERE voter_id = OLD.voter_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        -- Raises a unique violation for a voter_id already present in any partition
+        INSERT INTO voter_id_registry (voter_id, booth_no) VALUES (NEW.voter_id, NEW.booth_no);
+    END IF;
+    RETURN NULL;
+END $$;
+
+CREATE TRIGGER voters_voter_id_unique
+    AFTER INSERT OR DELETE OR UPDATE OF voter_id, booth_no ON voters
+    FOR EACH ROW EXECUTE FUNCTION voter_id_registry_sync();
+"""
+
+
+def is_postgres(engine):
+    return engine.dialect.name == 'postgresql'
+
+
+def is_partitioned(engine):
+    """Return True if the voters table of this database is partitioned"""
+    if not is_postgres(engine):
+        return False
+    key = str(engine.url)
+    if key not in _partitioned:
+        with engine.connect() as conn:
+            _partitioned[key] = bool(conn.execute(text(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('voters')"
+            )).scalar())
+    return _partitioned[key]
+
+
+def partition_settings(conn):
+    """Return (strategy, width) recorded by the migration"""
+    return conn.execute(text('SELECT strategy, width FROM voter_partitioning')).one()
+
+
+def partition_suffix(strategy, booth_no, width):
+    """Partition name suffix and bound clause for the partition holding booth_no"""
+    if strategy == 'list':
+        return f'b{booth_no}'.replace('-', 'm'), f'FOR VALUES IN ({int(booth_no)})'
+    low = (booth_no - 1) // width * width + 1
+    high = low + width
+    return f'b{low}_{high - 1}'.replace('-', 'm'), f'FOR VALUES FROM ({low}) TO ({high})'
+
+
+def planned_partitions(strategy, booth_nos, width):
+    """Distinct (suffix, bound clause) pairs covering the given booth numbers"""
+    partitions = {}
+    for booth_no in sorted(set(b for b in booth_nos if b is not None)):
+        suffix, bound = partition_suffix(strategy, booth_no, width)
+        partitions[suffix] = bound
+    return sorted(partitions.items())
+
+
+def _existing_partitions(conn):
+    return set(conn.execute(text(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        "WHERE i.inhparent = to_regclass('voters')"
+    )).scalars())
+
+
+def _create_partition(conn, suffix, bound):
+    for table in PARTITIONED_TABLES:
+        conn.execute(text(f'CREATE TABLE {table}_{suffix} PARTITION OF {table} {bound}'))
+    return [f'{table}_{suffix}' for table in PARTITIONED_TABLES]
+
+
+def ensure_partitions(engine, booth_nos):
+    """
+    Create the partitions an upload needs before its rows are inserted.
+
+    A partition cannot be attached while the default partition still holds
+    rows in its range; those booths keep using the default partition and are
+    reported in the log.
+    """
+    if not is_partitioned(engine):
+        return []
+    created = []
+    with engine.connect() as conn:
+        strategy, width = partition_settings(conn)
+        existing = _existing_partitions(conn)
+        conn.commit()
+        for suffix, bound in planned_partitions(strategy, booth_nos, width):
+            if f'voters_{suffix}' in existing:
+                continue
+            try:
+                with conn.begin():
+                    created.extend(_create_partition(conn, suffix, bound))
+            except Exception as e:
+                logger.warning('Booths %s stay in the default partition: %s', bound, e)
+    return created
+
+
+def partition_order(booth_no):
+    """Sort key that groups rows of the same partition together for insertion"""
+    return (booth_no is None, booth_no or 0)
+
+
+def registered_voter_ids(session, voter_ids):
+    """The given voter IDs that already exist in any partition, with one index lookup per ID in a single query"""
+    query = text('SELECT voter_id FROM voter_id_registry WHERE voter_id IN :voter_ids').bindparams(
+        bindparam('voter_ids', expanding=True))
+    return {voter_id for (voter_id,) in session.execute(query, {'voter_ids': list(voter_ids)})}
+
+
+def _recreate_indexes(conn, old_table, new_table):
+    """Rename the indexes of the old table and recreate its non-unique ones on the new table"""
+    rows = conn.execute(text(
+        'SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisunique FROM pg_index i '
+        'JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = to_regclass(:table)'
+    ), {'table': old_table}).all()
+    for name, definition, unique in rows:
+        conn.execute(text(f'ALTER INDEX {name} RENAME TO {name[:50]}_unpart'))
+        if not unique:
+            definition = re.sub(r' ON (ONLY )?\S+ ', f' ON {new_table} ', definition, count=1)
+            conn.execute(text(definition))
+
+
+def _referencing_foreign_keys(conn):
+    """(table, constraint, columns, referenced table, referenced columns) of the foreign keys other tables hold on voters and star_logs"""
+    return conn.execute(text(
+        'SELECT c.conrelid::regclass::text, c.conname, '
+        'ARRAY(SELECT a.attname::text FROM unnest(c.conkey) WITH ORDINALITY k(attnum, n) '
+        '      JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum ORDER BY k.n), '
+        'c.confrelid::regclass::text, '
+        'ARRAY(SELECT a.attname::text FROM unnest(c.confkey) WITH ORDINALITY k(attnum, n) '
+        '      JOIN pg_attribute a ON a.attrelid = c.confrelid AND a.attnum = k.attnum ORDER BY k.n) '
+        "FROM pg_constraint c WHERE c.contype = 'f' "
+        "AND c.confrelid IN (to_regclass('voters'), to_regclass('star_logs')) "
+        "AND c.conrelid NOT IN (to_regclass('voters'), to_regclass('star_logs'))"
+    )).all()
+
+
+def _repoint_foreign_keys(conn, foreign_keys):
+    """
+    Move foreign keys found by _referencing_foreign_keys from the old tables to the partitioned ones.
+
+    A reference to id becomes a reference to (id, booth_no) when the table
+    has a booth_no column, which is first synced from the referenced rows;
+    any other foreign key is dropped and reported in the log.
+    """
+    for table, name, columns, referenced, referenced_columns in foreign_keys:
+        conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT {name}'))
+        has_booth_no = conn.execute(text(
+            "SELECT 1 FROM pg_attribute WHERE attrelid = to_regclass(:table) AND attname = 'booth_no' AND NOT attisdropped"
+        ), {'table': table}).scalar()
+        if len(columns) == 1 and list(referenced_columns) == ['id'] and has_booth_no:
+            column = columns[0]
+            conn.execute(text(
+                f'UPDATE {table} t SET booth_no = r.booth_no FROM {referenced} r '
+                f'WHERE r.id = t.{column} AND t.booth_no IS DISTINCT FROM r.booth_no'
+            ))
+            conn.execute(text(
+                f'ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}, booth_no) '
+                f'REFERENCES {referenced} (id, booth_no) ON UPDATE CASCADE'
+            ))
+        else:
+            logger.warning('Dropped foreign key %s of %s (%s) on %s: it cannot reference the partitioned table',
+                           name, table, ', '.join(columns), referenced)
+
+
+def migrate(engine, strategy='range', width=25, drop_old=False):
+    """
+    Move the voters and star_logs tables to partitioned tables in one transaction.
+
+    The old tables are kept as voters_unpartitioned and star_logs_unpartitioned
+    unless drop_old is set. Returns the names of the partitions created.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown partitioning strategy {strategy!r}')
+    if not is_postgres(engine):
+        raise ValueError('Partitioning needs PostgreSQL; SQLite databases stay unpartitioned')
+    if is_partitioned(engine):
+        raise ValueError('The voters table is already partitioned')
+
+    key = 'booth_no'
+    method = 'RANGE' if strategy == 'range' else 'LIST'
+    with engine.begin() as conn:
+        version = conn.execute(text('SHOW server_version_num')).scalar()
+        if int(version) < MIN_SERVER_VERSION:
+            raise ValueError('Partitioning needs PostgreSQL 12 or newer')
+
+        conn.execute(text('LOCK TABLE voters, star_logs IN ACCESS EXCLUSIVE MODE'))
+        foreign_keys = _referencing_foreign_keys(conn)
+        conn.execute(text('ALTER TABLE star_logs RENAME TO star_logs_unpartitioned'))
+        conn.execute(text('ALTER TABLE voters RENAME TO voters_unpartitioned'))
+
+        conn.execute(text(f'CREATE TABLE voters (LIKE voters_unpartitioned INCLUDING DEFAULTS) PARTITION BY {method} ({key})'))
+        conn.execute(text('ALTER TABLE voters ADD CONSTRAINT voters_id_booth_no_key UNIQUE (id, booth_no)'))
+        conn.execute(text(f'CREATE TABLE star_logs (LIKE star_logs_unpartitioned INCLUDING DEFAULTS) PARTITION BY {method} ({key})'))
+        conn.execute(text('ALTER TABLE star_logs ADD CONSTRAINT star_logs_id_booth_no_key UNIQUE (id, booth_no)'))
+        for table in PARTITIONED_TABLES:
+            sequence = conn.execute(text(f"SELECT pg_get_serial_sequence('{table}_unpartitioned', 'id')")).scalar()
+            if sequence:
+                conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id'))
+            _recreate_indexes(conn, f'{table}_unpartitioned', table)
+        conn.execute(text('CREATE INDEX IF NOT EXISTS voters_part_voter_id_idx ON voters (voter_id)'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS voters_part_booth_yadibhag_idx ON voters (booth_no, yadibhag_no)'))
+        conn.execute(text('CREATE INDEX IF NOT EXISTS star_logs_part_voter_idx ON star_logs (voter_id, booth_no)'))
+
+        booth_nos = conn.execute(text('SELECT DISTINCT booth_no FROM voters_unpartitioned')).scalars().all()
+        created = []
+        for suffix, bound in planned_partitions(strategy, booth_nos, width):
+            created.extend(_create_partition(conn, suffix, bound))
+        for table in PARTITIONED_TABLES:
+            # NULL and not yet planned booth numbers land in the default partition
+            conn.execute(text(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT'))
+            created.append(f'{table}_default')
+
+        conn.execute(text('INSERT INTO voters SELECT * FROM voters_unpartitioned'))
+        conn.execute(text(
+            'UPDATE star_logs_unpartitioned s SET booth_no = v.booth_no '
+            'FROM voters_unpartitioned v WHERE v.id = s.voter_id'
+        ))
+        conn.execute(text('INSERT INTO star_logs SELECT * FROM star_logs_unpartitioned'))
+        conn.execute(text(
+            'ALTER TABLE star_logs ADD CONSTRAINT star_logs_voter_booth_fkey FOREIGN KEY (voter_id, booth_no) '
+            'REFERENCES voters (id, booth_no) ON UPDATE CASCADE'
+        ))
+        conn.execute(text('ALTER TABLE star_logs ADD CONSTRAINT star_logs_user_fkey FOREIGN KEY (user_id) REFERENCES users (id)'))
+        # Still pointing at the old tables, where they would block drop_old and reject new rows
+        _repoint_foreign_keys(conn, foreign_keys)
+
+        conn.execute(text(REGISTRY_DDL))
+        conn.execute(text('INSERT INTO voter_id_registry (voter_id, booth_no) SELECT voter_id, booth_no FROM voters'))
+        conn.execute(text('CREATE TABLE voter_partitioning (strategy VARCHAR(10) NOT NULL, width INTEGER NOT NULL)'))
+        conn.execute(text('INSERT INTO voter_partitioning (strategy, width) VALUES (:strategy, :width)'),
+                     {'strategy': strategy, 'width': width})
+
+        if drop_old:
+            conn.execute(text('DROP TABLE star_logs_unpartitioned'))
+            conn.execute(text('DROP TABLE voters_unpartitioned'))
+        conn.execute(text('ANALYZE voters'))
+        conn.execute(text('ANALYZE star_logs'))
+
+    _partitioned[str(engine.url)] = True
+    return created
+
+
+def partition_status(engine):
+    """Return (partition, bound, rows) for every partition of voters and star_logs"""
+    if not is_partitioned(engine):
+        return []
+    with engine.connect() as conn:
+        return conn.execute(text(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint '
+            'FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            "WHERE i.inhparent IN (to_regclass('voters'), to_regclass('star_logs')) ORDER BY c.relname"
+        )).all()
@@ -0,0 +1,128 @@
+"""
+Password hashing policy and bounded, off-thread password verification.
+
+Hashing is deliberately slow: werkzeug's default pbkdf2 takes hundreds of
+milliseconds of CPU. Verification and hashing run on a small pool of
+threads (hashlib releases the GIL while hashing) or processes, so a rush of
+logins uses at most PASSWORD_VERIFY_WORKERS cores and other requests keep
+being served. When PASSWORD_VERIFY_QUEUE jobs are already waiting, further
+logins and password changes are turned away with PasswordBusy instead of
+queueing. A job keeps its place in that bound until it has finished, also
+when its request stopped waiting for it.
+
+PASSWORD_HASH_METHOD is any werkzeug method string, e.g. "pbkdf2:sha256:600000"
+or "scrypt:32768:8:1". Stored hashes made with another method are replaced
+on the next successful login (needs_rehash).
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+POOL_KINDS = ('thread', 'process')
+
+
+class PasswordBusy(Exception):
+    """Too many password verifications are already waiting"""
+
+
+def hash_prefix(method):
+    """
+    Canonical prefix of the hashes werkzeug makes with a method, e.g. pbkdf2 -> pbkdf2:sha256:600000.
+
+    Filled in from the method string with werkzeug's defaults, so no hash has
+    to be computed to learn it.
+    """
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        n, r, p = (params + ['', '', ''])[:3]
+        return f'scrypt:{n or 2 ** 15}:{r or 8}:{p or 1}'
+    if name == 'pbkdf2':
+        hash_name, iterations = (params + ['', ''])[:2]
+        return f'pbkdf2:{hash_name or "sha256"}:{iterations or DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+class PasswordPolicy:
+    def __init__(self, method='pbkdf2', workers=2, pool='thread', queue_size=32, timeout=30):
+        if pool not in POOL_KINDS:
+            raise ValueError(f'PASSWORD_VERIFY_POOL must be one of {", ".join(POOL_KINDS)}')
+        self.method = method
+        # Canonical prefix of hashes made with this method, e.g. pbkdf2 -> pbkdf2:sha256:600000
+        self.prefix = hash_prefix(method)
+        self.workers = workers
+        self.pool_kind = pool
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + queue_size) if workers else None
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # Pools do not survive gunicorn's fork, so each worker process creates its own
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                executor = ThreadPoolExecutor if self.pool_kind == 'thread' else ProcessPoolExecutor
+                self._pool = executor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordBusy()
+        try:
+            future = self._executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Released when the job is done: a hash that is already running cannot be cancelled
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # The pool is too far behind; turn the login away like a full queue
+            future.cancel()
+            raise PasswordBusy() from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        if not stored_hash or password is None:
+            return False
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split('$', 1)[0] != self.prefix
+
+
+policy = PasswordPolicy()
+
+
+def init_passwords(app):
+    """Apply the hashing and verification settings of the app"""
+    global policy
+    policy = PasswordPolicy(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_VERIFY_WORKERS'],
+        pool=app.config['PASSWORD_VERIFY_POOL'],
+        queue_size=app.config['PASSWORD_VERIFY_QUEUE'],
+    )
+
+
+def hash_password(password):
+    """Hash a password off the request thread; raises PasswordBusy when the pool is saturated"""
+    return policy.hash(password)
+
+
+def verify_password(stored_hash, password):
+    """Check a password off the request thread; raises PasswordBusy when the pool is saturated"""
+    return policy.verify(stored_hash, password)
+
+
+def needs_rehash(stored_hash):
+    return policy.needs_rehash(stored_hash)
@@ -0,0 +1,167 @@
+"""
+On-demand profiling of single requests for main users.
+
+A main user opts in per request with the X-Profile header or a _profile=1 query
+parameter. The request then runs under cProfile with its SQL statements
+timed, and the result is kept in a bounded in-memory ring buffer of this
+worker process. Requests without the flag only pay for one header and one
+query-string lookup.
+"""
+import cProfile
+import itertools
+import pstats
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, request
+from flask_login import current_user
+
+from app.utils.metrics import RequestStats, register_sql_events
+
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ARG = '_profile'
+
+# Call tree nodes below this share of the request time are folded away
+MIN_NODE_FRACTION = 0.005
+MAX_TREE_DEPTH = 30
+
+# Functions listed in the flat "top by own time" table
+TOP_FUNCTIONS = 25
+
+
+class ProfileStore:
+    """Ring buffer of the last N request profiles"""
+
+    def __init__(self, size=20):
+        self._profiles = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def resize(self, size):
+        with self._lock:
+            self._profiles = deque(self._profiles, maxlen=size)
+
+    def add(self, profile):
+        with self._lock:
+            profile['id'] = next(self._ids)
+            self._profiles.appendleft(profile)
+            return profile['id']
+
+    def all(self):
+        with self._lock:
+            return list(self._profiles)
+
+    def get(self, profile_id):
+        with self._lock:
+            return next((profile for profile in self._profiles if profile['id'] == profile_id), None)
+
+
+profile_store = ProfileStore()
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Built-in functions
+        return name
+    short_path = '/'.join(filename.replace('\\', '/').split('/')[-2:])
+    return f'{name} ({short_path}:{line})'
+
+
+def build_call_tree(profiler, total_time):
+    """Turn cProfile caller data into a nested call tree of dicts"""
+    stats = pstats.Stats(profiler).stats
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, calls, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((func, calls, cumulative))
+
+    # Roots are functions whose callers started before profiling was enabled
+    roots = [func for func, (_, _, _, _, callers) in stats.items()
+             if not any(caller in stats for caller in callers)]
+    threshold = total_time * MIN_NODE_FRACTION
+
+    def node(func, calls, cumulative, path, depth):
+        children = []
+        if depth < MAX_TREE_DEPTH:
+            for child, child_calls, child_cumulative in sorted(callees.get(func, []), key=lambda c: -c[2]):
+                if child_cumulative < threshold or child in path:
+                    continue
+                children.append(node(child, child_calls, child_cumulative, path | {child}, depth + 1))
+        return {
+            'name': _function_label(func),
+            'calls': calls,
+            'cumulative_ms': cumulative * 1000,
+            'own_ms': stats[func][2] * 1000 if func in stats else 0.0,
+            'children': children,
+        }
+
+    tree = []
+    for func in sorted(roots, key=lambda f: -stats[f][3]):
+        if stats[func][3] >= threshold:
+            tree.append(node(func, stats[func][1], stats[func][3], {func}, 0))
+
+    top = sorted(stats.items(), key=lambda item: -item[1][2])[:TOP_FUNCTIONS]
+    top_functions = [{'name': _function_label(func), 'calls': nc, 'own_ms': tt * 1000, 'cumulative_ms': ct * 1000}
+                     for func, (_, nc, tt, ct, _) in top]
+    return tree, top_functions
+
+
+def _profiling_requested():
+    return PROFILE_HEADER in request.headers or request.args.get(PROFILE_ARG)
+
+
+def _start_profile():
+    if not _profiling_requested():
+        return
+    if not current_user.is_authenticated or current_user.role != 'main':
+        return
+    stats = g.get('_request_stats')
+    if stats is None:
+        stats = g._request_stats = RequestStats()
+    stats.timeline = []
+    profiler = cProfile.Profile()
+    g._profiler = profiler
+    g._profile_started = time.perf_counter()
+    profiler.enable()
+
+
+def _finish_profile(response):
+    profiler = g.pop('_profiler', None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    duration = time.perf_counter() - g.pop('_profile_started')
+    stats = g.get('_request_stats')
+    tree, top_functions = build_call_tree(profiler, duration)
+    timeline = stats.timeline if stats is not None else []
+    profile_id = profile_store.add({
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint or 'unmatched',
+        'status': response.status_code,
+        'user': current_user.username,
+        'started_at': datetime.now(),
+        'duration_ms': duration * 1000,
+        'sql_count': len(timeline),
+        'sql_ms': sum(entry[1] for entry in timeline) * 1000,
+        'sql': [{'offset_ms': offset * 1000, 'duration_ms': elapsed * 1000, 'statement': statement, 'parameters': parameters}
+                for offset, elapsed, statement, parameters in timeline],
+        'tree': tree,
+        'top_functions': top_functions,
+    })
+    response.headers['X-Profile-Id'] = str(profile_id)
+    return response
+
+
+def init_profiler(app, db):
+    """Register the opt-in profiling hooks on the app"""
+    if not app.config['PROFILER_ENABLED']:
+        return
+    profile_store.resize(app.config['PROFILER_RING_SIZE'])
+    register_sql_events(db)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
@@ -0,0 +1,162 @@
+"""
+Routing of read-only requests to an optional read replica.
+
+When DATABASE_READ_URL is set it becomes the "replica" bind, and views
+decorated with @read_replica run their queries there through
+RoutingSession. Everything else, and every flush, uses the primary.
+
+Reads after the user's own writes stay consistent: a request that wrote to
+the primary pins that browser session to the primary for
+REPLICA_STICKY_SECONDS. The replica is also skipped while it is unreachable
+or more than REPLICA_MAX_LAG_SECONDS behind; its health is checked at most
+every REPLICA_CHECK_SECONDS per worker.
+
+Results read from the replica may miss writes that the primary already
+has, so they must not go into caches shared by all users, such as the
+search result cache.
+
+For local testing point DATABASE_READ_URL at a second PostgreSQL instance
+replicating the first, or at a copy of the SQLite file.
+"""
+import functools
+import logging
+import threading
+import time
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+
+logger = logging.getLogger(__name__)
+
+BIND_KEY = 'replica'
+
+# Replay lag of a PostgreSQL standby in seconds; 0 on a primary or a standby that has replayed everything it received
+POSTGRES_LAG_SQL = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+class ReplicaHealth:
+    """Cached verdict on whether the replica may serve reads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._healthy = False
+        self.lag = None
+
+    def mark_down(self, reason):
+        with self._lock:
+            if self._healthy:
+                logger.warning('Read replica disabled: %s', reason)
+            self._healthy = False
+            self._checked_at = time.monotonic()
+
+    def healthy(self, engine, max_lag, interval):
+        with self._lock:
+            if time.monotonic() - self._checked_at < interval:
+                return self._healthy
+            # Other threads keep the previous verdict while this one checks
+            self._checked_at = time.monotonic()
+        try:
+            with engine.connect() as conn:
+                lag = float(conn.execute(text(POSTGRES_LAG_SQL)).scalar()) if engine.dialect.name == 'postgresql' \
+                    else float(conn.execute(text('SELECT 0')).scalar())
+        except Exception as e:
+            self.mark_down(e)
+            return False
+        with self._lock:
+            self.lag = lag
+            if lag > max_lag:
+                if self._healthy:
+                    logger.warning('Read replica disabled: %.1fs behind the primary', lag)
+                self._healthy = False
+            else:
+                self._healthy = True
+            return self._healthy
+
+
+health = ReplicaHealth()
+
+
+def use_replica():
+    """True if the queries of the current request should go to the replica"""
+    if not has_request_context() or not g.get('_read_replica'):
+        return False
+    if session.get('_primary_until', 0) > time.time():
+        return False
+    config = current_app.config
+    engine = current_app.extensions['sqlalchemy'].engines.get(BIND_KEY)
+    if engine is None:
+        return False
+    return health.healthy(engine, config['REPLICA_MAX_LAG_SECONDS'], config['REPLICA_CHECK_SECONDS'])
+
+
+def used_replica():
+    """True if a query of the current request was sent to the replica"""
+    return has_request_context() and bool(g.get('_used_replica'))
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that sends the reads of @read_replica views to the replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and use_replica():
+            g._used_replica = True
+            return self._db.engines[BIND_KEY]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_replica(view):
+    """Let a read-only view query the replica when one is configured and healthy"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g._read_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _note_write(*args):
+    if has_request_context():
+        g._wrote_primary = True
+
+
+def _note_orm_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _note_write()
+
+
+def _pin_to_primary(response):
+    if g.get('_wrote_primary'):
+        session['_primary_until'] = time.time() + current_app.config['REPLICA_STICKY_SECONDS']
+    return response
+
+
+def _on_replica_error(exception_context):
+    if exception_context.is_disconnect:
+        health.mark_down(exception_context.original_exception)
+
+
+def replica_bind(url):
+    """SQLALCHEMY_BINDS entry for DATABASE_READ_URL, or {} when there is no replica"""
+    if not url:
+        return {}
+    if url.startswith('postgres://'):
+        url = url.replace('postgres://', 'postgresql://', 1)
+    return {BIND_KEY: {'url': url, 'pool_pre_ping': True}}
+
+
+def init_replica(app, db):
+    """Track writes for read-after-write stickiness and watch the replica for disconnects"""
+    if BIND_KEY not in app.config.get('SQLALCHEMY_BINDS', {}):
+        return
+    event.listen(RoutingSession, 'after_flush', _note_write)
+    event.listen(RoutingSession, 'do_orm_execute', _note_orm_write)
+    with app.app_context():
+        event.listen(db.engines[BIND_KEY], 'handle_error', _on_replica_error)
+    app.after_request(_pin_to_primary)
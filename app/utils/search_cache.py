@@ -0,0 +1,91 @@
+"""
+Bounded LRU cache for live search results.
+
+Entries are keyed by the normalized search parameters and are only valid for the
+data generation they were computed in. Every write that can change search
+results (upload, star, unstar, clear data) bumps the generation, which empties
+the cache and changes every ETag.
+
+The cache and the generation counter live in the worker process; each worker
+keeps its own copy.
+"""
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+
+
+# Request parameters that affect search results
+SEARCH_PARAMS = ('query', 'voter_id', 'full_name', 'booth_no', 'mobile_no', 'yadibhag_no', 'yadibhag_name',
+                 'voter_srno', 'age', 'gender', 'voting_card_no', 'karyakarta', 'star_status', 'booth_scope',
+                 'mode')
+
+
+class SearchCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        # Distinguishes ETags issued before and after a worker restart, when the generation starts over
+        self._epoch = uuid.uuid4().hex[:8]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, args):
+        """Normalize request args to a hashable key, ignoring empty and unrelated parameters"""
+        return tuple((name, args.get(name)) for name in SEARCH_PARAMS if args.get(name))
+
+    def etag(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        return f'{self._epoch}-{self.generation}-{digest}'
+
+    def get(self, key):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, key, payload, generation):
+        with self._lock:
+            # Drop results computed before a concurrent write bumped the generation
+            if generation != self.generation:
+                return
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_not_modified(self):
+        """Count a live search answered with 304; requests run on several threads of a worker"""
+        with self._lock:
+            self.not_modified += 1
+
+    def bump(self):
+        """Invalidate every cached result after a data change"""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'generation': self.generation,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+            }
+
+
+search_cache = SearchCache()
+
+
+def bump_data_generation():
+    search_cache.bump()
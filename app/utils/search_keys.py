@@ -0,0 +1,155 @@
+"""
+Normalized, script-independent search keys for voter names.
+
+Rolls spell the same name in Devanagari and in Latin script ("घनवट" and
+"Ghanwat"), and Latin spellings of one name vary ("Pooja"/"Puja",
+"Ashwini"/"Ashvini"). Each name part is reduced to a key that both
+spellings share:
+
+1. Unicode NFC, case folding and removal of punctuation and whitespace
+2. Transliteration of Devanagari into Latin letters
+3. Folding of spelling variants: ee/oo, w/v, y/i, ph/f, aspirate 'h',
+   the vowel 'a' and doubled letters
+
+Keys are stored in indexed columns at ingest and matched by prefix, so a
+name search is an index range scan instead of a leading-wildcard ilike.
+Nothing here touches the database, so ingest workers can compute keys.
+"""
+import re
+import unicodedata
+
+from sqlalchemy import and_, or_
+
+
+# Devanagari consonants; a consonant carries an inherent 'a' unless a vowel sign or virama follows
+CONSONANTS = {
+    'क': 'k', 'ख': 'kh', 'ग': 'g', 'घ': 'gh', 'ङ': 'n',
+    'च': 'ch', 'छ': 'chh', 'ज': 'j', 'झ': 'jh', 'ञ': 'ny',
+    'ट': 't', 'ठ': 'th', 'ड': 'd', 'ढ': 'dh', 'ण': 'n',
+    'त': 't', 'थ': 'th', 'द': 'd', 'ध': 'dh', 'न': 'n',
+    'प': 'p', 'फ': 'ph', 'ब': 'b', 'भ': 'bh', 'म': 'm',
+    'य': 'y', 'र': 'r', 'ल': 'l', 'व': 'v', 'श': 'sh',
+    'ष': 'sh', 'स': 's', 'ह': 'h', 'ळ': 'l',
+}
+
+# Independent vowels
+VOWELS = {
+    'अ': 'a', 'आ': 'aa', 'इ': 'i', 'ई': 'ii', 'उ': 'u', 'ऊ': 'uu', 'ऋ': 'ru',
+    'ए': 'e', 'ऐ': 'ai', 'ओ': 'o', 'औ': 'au', 'ऑ': 'o', 'ऍ': 'e',
+}
+
+# Dependent vowel signs
+VOWEL_SIGNS = {
+    'ा': 'aa', 'ि': 'i', 'ी': 'ii', 'ु': 'u', 'ू': 'uu', 'ृ': 'ru',
+    'े': 'e', 'ै': 'ai', 'ो': 'o', 'ौ': 'au', 'ॉ': 'o', 'ॅ': 'e',
+}
+
+# Anusvara, chandrabindu and visarga
+MODIFIERS = {'ं': 'n', 'ँ': 'n', 'ः': 'h'}
+
+VIRAMA = '्'
+NUKTA = '़'
+
+# Conjuncts whose Marathi pronunciation differs from their parts
+CONJUNCTS = {'ज्ञ': 'dny'}
+
+DEVANAGARI_DIGITS = str.maketrans('०१२३४५६७८९', '0123456789')
+
+# Spelling variants folded after transliteration, applied in order
+FOLDS = [
+    (re.compile(r'[^a-z0-9]'), ''),
+    (re.compile(r'ph'), 'f'),
+    (re.compile(r'ee'), 'i'),
+    (re.compile(r'oo'), 'u'),
+    (re.compile(r'w'), 'v'),
+    (re.compile(r'y'), 'i'),
+    (re.compile(r'z'), 'j'),
+    (re.compile(r'n(?=[bpm])'), 'm'),
+    # Aspiration is written inconsistently ("Jadhav"/"Jadav"); keep it only in ch, sh and at the start
+    (re.compile(r'(?<=[^cs])h'), ''),
+    (re.compile(r'a'), ''),
+    (re.compile(r'(.)\1+'), r'\1'),
+]
+
+# Columns of the Voter model holding the key of each name part
+KEY_FIELDS = {'first_name': 'first_name_key', 'father_name': 'father_name_key', 'surname': 'surname_key'}
+
+
+def normalize_text(value):
+    """NFC-normalize and case-fold text, dropping punctuation and whitespace"""
+    value = unicodedata.normalize('NFC', str(value)).casefold()
+    return ''.join(ch for ch in value if unicodedata.category(ch)[0] in 'LMN')
+
+
+def transliterate(value):
+    """Transliterate the Devanagari characters of a normalized string into Latin letters"""
+    for conjunct, latin in CONJUNCTS.items():
+        value = value.replace(conjunct, latin + VIRAMA)
+    value = value.replace(NUKTA, '').translate(DEVANAGARI_DIGITS)
+    output = []
+    for index, ch in enumerate(value):
+        if ch in CONSONANTS:
+            output.append(CONSONANTS[ch])
+            following = value[index + 1] if index + 1 < len(value) else ''
+            if following not in VOWEL_SIGNS and following != VIRAMA:
+                output.append('a')
+        elif ch in VOWEL_SIGNS:
+            output.append(VOWEL_SIGNS[ch])
+        elif ch in VOWELS:
+            output.append(VOWELS[ch])
+        elif ch in MODIFIERS:
+            output.append(MODIFIERS[ch])
+        elif ch != VIRAMA:
+            output.append(ch)
+    return ''.join(output)
+
+
+def name_key(value):
+    """Return the search key of one name, or None if nothing searchable is left"""
+    if not value:
+        return None
+    key = transliterate(normalize_text(value))
+    for pattern, replacement in FOLDS:
+        key = pattern.sub(replacement, key)
+    return key or None
+
+
+def voter_search_keys(first_name, father_name, surname, full_name):
+    """
+    Keys for the first_name_key, father_name_key and surname_key columns.
+
+    Rolls that only carry a full name are split into first, middle and last
+    words.
+    """
+    if not (first_name or father_name or surname) and full_name:
+        words = full_name.split()
+        first_name = words[0] if words else ''
+        surname = words[-1] if len(words) > 1 else ''
+        father_name = ' '.join(words[1:-1])
+    return {
+        'first_name_key': name_key(first_name),
+        'father_name_key': name_key(father_name),
+        'surname_key': name_key(surname),
+    }
+
+
+def key_prefix_condition(column, key):
+    """column starts with key, written as a range so that a plain b-tree index serves it"""
+    upper = key[:-1] + chr(ord(key[-1]) + 1)
+    return and_(column >= key, column < upper)
+
+
+def name_search_condition(columns, text):
+    """
+    Match every word of text against the start of any of the key columns.
+
+    Returns None when text has no searchable word, e.g. only punctuation.
+    """
+    conditions = []
+    for word in str(text).split():
+        key = name_key(word)
+        if key:
+            conditions.append(or_(*(key_prefix_condition(column, key) for column in columns)))
+    if not conditions:
+        return None
+    return and_(*conditions)
@@ -0,0 +1,112 @@
+"""
+Tuned SQLite settings for single-box deployments.
+
+With SQLite's defaults a write waits for every reader to finish and a
+second writer fails at once with "database is locked", so a star click
+during an upload errors out. With SQLITE_TUNED every new connection gets:
+
+- journal_mode=WAL: readers and the single writer no longer block each other
+- busy_timeout: a writer waits up to SQLITE_BUSY_TIMEOUT_MS for the lock
+- synchronous=NORMAL: safe with WAL, fsyncs only at checkpoints
+- mmap_size and cache_size: reads served from memory instead of read() calls
+
+Each worker also runs PRAGMA optimize (ANALYZE of the tables whose
+statistics are stale) and a passive WAL checkpoint every
+SQLITE_MAINTENANCE_SECONDS. `flask sqlite-maintenance` runs a full ANALYZE
+and truncates the WAL, e.g. nightly from cron.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, text
+
+
+logger = logging.getLogger(__name__)
+
+_maintenance = {}  # pid -> thread
+_lock = threading.Lock()
+
+
+def is_file_database(engine):
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+
+
+def connection_pragmas(config):
+    return [
+        'PRAGMA journal_mode=WAL',
+        f'PRAGMA busy_timeout={int(config["SQLITE_BUSY_TIMEOUT_MS"])}',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA mmap_size={int(config["SQLITE_MMAP_BYTES"])}',
+        # Negative: KiB rather than pages
+        f'PRAGMA cache_size={-int(config["SQLITE_CACHE_KB"])}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def tune_engine(engine, config):
+    """Apply the pragmas to every new connection of a file-backed SQLite engine"""
+    if not is_file_database(engine):
+        return False
+    pragmas = connection_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return True
+
+
+def run_maintenance(engine, analyze=False, truncate=False):
+    """
+    Refresh the planner statistics and checkpoint the WAL.
+
+    analyze runs a full ANALYZE instead of PRAGMA optimize; truncate resets
+    the WAL file to zero bytes, waiting for readers. Returns the checkpoint
+    result (busy, WAL frames, frames checkpointed).
+    """
+    with engine.connect() as conn:
+        conn.exec_driver_sql('ANALYZE' if analyze else 'PRAGMA optimize')
+        conn.commit()
+        mode = 'TRUNCATE' if truncate else 'PASSIVE'
+        return tuple(conn.execute(text(f'PRAGMA wal_checkpoint({mode})')).one())
+
+
+def _maintenance_loop(engine, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            busy, frames, checkpointed = run_maintenance(engine)
+            logger.debug('SQLite maintenance: %s of %s WAL frames checkpointed', checkpointed, frames)
+        except Exception:
+            logger.exception('SQLite maintenance failed')
+
+
+def start_maintenance(engine, interval):
+    """Start this process's maintenance thread; gunicorn workers each start their own after forking"""
+    pid = os.getpid()
+    with _lock:
+        if pid in _maintenance or interval <= 0:
+            return
+        thread = threading.Thread(target=_maintenance_loop, args=(engine, interval), name='sqlite-maintenance', daemon=True)
+        _maintenance[pid] = thread
+        thread.start()
+
+
+def init_sqlite(app, db):
+    """Tune the SQLite engines of the app; must run before the first connection is opened"""
+    if not app.config['SQLITE_TUNED']:
+        return
+    with app.app_context():
+        engine = db.engine
+        for bind_engine in db.engines.values():
+            tune_engine(bind_engine, app.config)
+    if is_file_database(engine):
+        interval = app.config['SQLITE_MAINTENANCE_SECONDS']
+        app.before_request(lambda: start_maintenance(engine, interval))
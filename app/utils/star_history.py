@@ -0,0 +1,186 @@
+"""
+Retention and compaction of the star_logs audit table.
+
+Every star rating change appends a StarLog row. Rows newer than the
+retention window are kept as they are; older rows of each voter are folded
+into one StarLogSummary row (first and last rating time, number of ratings
+and removals, the last rating and who gave it) and then moved out of
+star_logs, into the star_log_archive table, a gzip-compressed CSV export or
+both.
+
+Compaction runs in batches of voters, one transaction per batch, so it can
+be interrupted and rerun: a rerun only finds the rows that are still in
+star_logs and merges them into the existing summaries.
+
+The voter detail page reads a voter's history page by page with
+history_page(), keyset-paginated over the (voter_id, timestamp, id) index
+so that every page costs the same however long the history is.
+"""
+import csv
+import gzip
+import os
+from datetime import timedelta
+from itertools import groupby
+
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import aliased
+
+from app.database import db
+from app.models.star_log import StarLog
+from app.models.star_log_archive import StarLogArchive
+from app.models.star_log_summary import StarLogSummary
+from app.models.user import User
+
+
+# Entries per page of a voter's history
+HISTORY_PAGE_SIZE = 20
+
+EXPORT_COLUMNS = ('id', 'voter_id', 'booth_no', 'user_id', 'action', 'old_rating', 'new_rating', 'timestamp')
+
+
+def retention_cutoff(session, keep_days):
+    """Timestamp before which logs are compacted, computed from the database clock that stamped them"""
+    now = session.query(func.current_timestamp()).scalar()
+    return now - timedelta(days=keep_days)
+
+
+def merge_into_summary(summary, logs):
+    """Fold a voter's logs, oldest first, into its summary"""
+    first, last = logs[0], logs[-1]
+    if summary.first_rated_at is None or first.timestamp < summary.first_rated_at:
+        summary.first_rated_at = first.timestamp
+    if summary.last_rated_at is None or last.timestamp >= summary.last_rated_at:
+        summary.last_rated_at = last.timestamp
+        summary.last_action = last.action
+        summary.last_rating = last.new_rating
+        summary.last_user_id = last.user_id
+    summary.booth_no = last.booth_no if last.booth_no is not None else summary.booth_no
+    summary.rating_count = (summary.rating_count or 0) + sum(1 for log in logs if log.action != 'DELETE')
+    summary.removal_count = (summary.removal_count or 0) + sum(1 for log in logs if log.action == 'DELETE')
+
+
+def _log_row(log):
+    return {column: getattr(log, column) for column in EXPORT_COLUMNS}
+
+
+def compact_star_logs(cutoff, archive_table=True, export_path=None, batch_size=500, progress=None):
+    """
+    Summarize and move out the star logs older than cutoff.
+
+    Returns (voters summarized, logs compacted). progress, if given, is
+    called with the running totals after every batch.
+    """
+    session = db.session
+    voter_ids = [row[0] for row in session.query(StarLog.voter_id)
+                 .filter(StarLog.timestamp < cutoff).distinct().order_by(StarLog.voter_id)]
+    export_file = writer = None
+    if export_path:
+        new_file = not os.path.exists(export_path)
+        # Appending adds a gzip member per run, which gzip readers concatenate transparently
+        export_file = gzip.open(export_path, 'at', newline='', encoding='utf-8')
+        writer = csv.DictWriter(export_file, fieldnames=EXPORT_COLUMNS)
+        if new_file:
+            writer.writeheader()
+
+    voters = compacted = 0
+    try:
+        for start in range(0, len(voter_ids), batch_size):
+            batch = voter_ids[start:start + batch_size]
+            logs = (StarLog.query
+                    .filter(StarLog.voter_id.in_(batch), StarLog.timestamp < cutoff)
+                    .order_by(StarLog.voter_id, StarLog.timestamp, StarLog.id)
+                    .all())
+            summaries = {summary.voter_id: summary
+                         for summary in StarLogSummary.query.filter(StarLogSummary.voter_id.in_(batch))}
+            for voter_id, voter_logs in groupby(logs, key=lambda log: log.voter_id):
+                summary = summaries.get(voter_id)
+                if summary is None:
+                    summary = StarLogSummary(voter_id=voter_id, rating_count=0, removal_count=0)
+                    session.add(summary)
+                merge_into_summary(summary, list(voter_logs))
+
+            rows = [_log_row(log) for log in logs]
+            if archive_table and rows:
+                session.execute(insert(StarLogArchive), rows)
+            if writer is not None:
+                writer.writerows(rows)
+            session.query(StarLog).filter(StarLog.id.in_([log.id for log in logs])).delete(synchronize_session=False)
+            session.commit()
+            if export_file is not None:
+                export_file.flush()
+
+            voters += len(batch)
+            compacted += len(logs)
+            if progress:
+                progress(voters, compacted)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        if export_file is not None:
+            export_file.close()
+    return voters, compacted
+
+
+def latest_raters():
+    """
+    Map voter id -> username of whoever changed the voter's rating last.
+
+    Raw logs take precedence; voters whose history was fully compacted fall
+    back to their summary. Two queries in total instead of one per voter.
+    """
+    latest = (db.session.query(func.max(StarLog.id).label('log_id'))
+              .group_by(StarLog.voter_id)
+              .subquery())
+    raters = dict(db.session.query(StarLogSummary.voter_id, User.username)
+                  .join(User, User.id == StarLogSummary.last_user_id)
+                  .all())
+    raters.update(db.session.query(StarLog.voter_id, User.username)
+                  .join(latest, StarLog.id == latest.c.log_id)
+                  .join(User, User.id == StarLog.user_id)
+                  .all())
+    return raters
+
+
+def history_page(voter_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of a voter's star logs, newest first, with the username of each.
+
+    The cursor is the id of the last entry of the previous page. The next
+    page continues below that log's own (timestamp, id), read back from the
+    table so that the comparison never depends on how the database driver
+    formats timestamps. Returns (entries, next cursor); the next cursor is
+    None on the last page.
+    """
+    query = (db.session.query(StarLog.id, StarLog.action, StarLog.old_rating, StarLog.new_rating,
+                              StarLog.timestamp, User.username)
+             .outerjoin(User, User.id == StarLog.user_id)
+             .filter(StarLog.voter_id == voter_id))
+    if cursor is not None:
+        cursor_log = aliased(StarLog)
+        cursor_time = select(cursor_log.timestamp).where(cursor_log.id == cursor).scalar_subquery()
+        query = query.filter(tuple_(StarLog.timestamp, StarLog.id) < tuple_(cursor_time, cursor))
+    rows = query.order_by(StarLog.timestamp.desc(), StarLog.id.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    entries = [{
+        'id': row.id,
+        'action': row.action,
+        'old_rating': row.old_rating,
+        'new_rating': row.new_rating,
+        'timestamp': row.timestamp.isoformat(),
+        'display_time': row.timestamp.strftime('%m/%d %H:%M'),
+        'username': row.username or 'N/A',
+    } for row in rows[:limit]]
+    return entries, next_cursor
+
+
+def serialize_summary(summary):
+    """The compacted history of a voter for the history endpoint"""
+    return {
+        'first_rated_at': summary.first_rated_at.strftime('%m/%d/%Y'),
+        'last_rated_at': summary.last_rated_at.strftime('%m/%d/%Y'),
+        'rating_count': summary.rating_count,
+        'removal_count': summary.removal_count,
+        'last_rating': summary.last_rating or 0,
+        'last_user': summary.last_user.username if summary.last_user else 'N/A',
+    }
@@ -0,0 +1,68 @@
+"""
+Star rating changes that stay correct with several workers and threads.
+
+Reading voter.star_rating, assigning the new value and logging the old one
+lost updates when two clicks on the same voter overlapped: both logged the
+same old rating and the later write silently replaced the earlier one. The
+rating is now changed with a conditional UPDATE ... WHERE star_rating = :old
+and logged in the same transaction, so every StarLog's old_rating is the
+rating it really replaced and the logs of a voter chain up in commit order.
+
+When another request changed the rating in between, the UPDATE matches no
+row; the change is retried from the fresh rating up to STAR_RATING_RETRIES
+times before RatingConflict is raised (a 409 for the client).
+"""
+from sqlalchemy import select, update
+
+from app.database import db
+from app.models.star_log import StarLog
+from app.models.voter import Voter
+
+
+class RatingConflict(Exception):
+    """The rating kept changing under the request; nothing was written"""
+
+
+class VoterNotFound(Exception):
+    """No voter has the id, e.g. after clear_data removed the roll"""
+
+
+def star_action(old_rating, new_rating):
+    if new_rating == 0:
+        return 'DELETE'
+    return 'ADD' if old_rating == 0 else 'EDIT'
+
+
+def change_star_rating(voter_id, rating, user_id, retries=3):
+    """
+    Set a voter's rating and log the change in one transaction; returns the replaced rating.
+
+    Raises VoterNotFound when there is no such voter and RatingConflict when
+    the rating changed under every attempt.
+    """
+    for _ in range(retries + 1):
+        current = db.session.execute(
+            select(Voter.star_rating, Voter.booth_no).where(Voter.id == voter_id)
+        ).one_or_none()
+        if current is None:
+            raise VoterNotFound(voter_id)
+        old_rating, booth_no = current
+        unchanged = Voter.star_rating.is_(None) if old_rating is None else Voter.star_rating == old_rating
+        result = db.session.execute(
+            update(Voter).where(Voter.id == voter_id, unchanged).values(star_rating=rating)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            db.session.add(StarLog(
+                voter_id=voter_id,
+                booth_no=booth_no,
+                user_id=user_id,
+                action=star_action(old_rating, rating),
+                old_rating=old_rating,
+                new_rating=rating
+            ))
+            db.session.commit()
+            return old_rating
+        # Changed by another request since it was read: start over from the committed rating
+        db.session.rollback()
+    raise RatingConflict(f'The rating of voter {voter_id} changed {retries + 1} times while it was being set')
@@ -0,0 +1,61 @@
+"""
+Buffering of uploaded files and the upload size limit.
+
+Uploads used to be copied to tempfile.gettempdir()/<filename> and read back,
+so two users uploading "voters.xlsx" at once overwrote each other's file and
+a failed upload left its copy behind. Now the multipart parser writes every
+uploaded file into a SpooledTemporaryFile: files up to UPLOAD_SPOOL_MB stay
+in memory, larger ones spill to an anonymous temporary file that is unique
+to the request and removed when it is closed at the end of the request. The
+SHA-256 the upload ledger is keyed by is computed as the parser writes the
+bytes, and the ingest pipeline reads the sheets straight from that buffer.
+
+MAX_CONTENT_LENGTH (UPLOAD_MAX_MB) is enforced by werkzeug while the body
+streams in, so an oversized upload is refused before it has been read in
+full; the user gets a message instead of a bare 413 page.
+"""
+import hashlib
+import tempfile
+
+from flask import Request, current_app, flash, jsonify, redirect, request
+from werkzeug.exceptions import RequestEntityTooLarge
+
+
+class HashingSpooledFile(tempfile.SpooledTemporaryFile):
+    """Spooled upload buffer that hashes the bytes written into it"""
+
+    def __init__(self, max_size):
+        super().__init__(max_size=max_size, mode='w+b')
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return super().write(data)
+
+
+class SpooledRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpooledFile(current_app.config['UPLOAD_SPOOL_MB'] * 1024 * 1024)
+
+
+def upload_digest(file_storage):
+    """(sha256 hex, size) of an uploaded file, computed while it streamed in"""
+    stream = file_storage.stream
+    return stream.digest.hexdigest(), stream.size
+
+
+def _upload_too_large(error):
+    message = f'The file is larger than the upload limit of {current_app.config["UPLOAD_MAX_MB"]} MB'
+    if request.is_json or request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        return jsonify({'success': False, 'message': message}), 413
+    flash(message, 'error')
+    return redirect(request.url)
+
+
+def init_uploads(app):
+    """Spool uploaded files and limit request bodies to UPLOAD_MAX_MB"""
+    app.request_class = SpooledRequest
+    app.config['MAX_CONTENT_LENGTH'] = app.config['UPLOAD_MAX_MB'] * 1024 * 1024
+    app.register_error_handler(RequestEntityTooLarge, _upload_too_large)
@@ -0,0 +1,46 @@
+"""
+Compact record of one parsed voter row, shared by the ingest pipeline.
+
+A roll of a million voters used to be held as a million 19-key dicts, and
+then again as a million ORM Voter instances with their SQLAlchemy state.
+VoterRecord stores the same values in __slots__ (no per-row dict), pickles
+as a plain tuple between ingest workers and the web worker, and is turned
+into insert parameters one chunk at a time.
+"""
+
+# Voter columns filled at ingest, in table order
+VOTER_FIELDS = ('voter_id', 'booth_no', 'first_name', 'father_name', 'surname', 'full_name', 'mobile_no',
+                'yadibhag_no', 'yadibhag_name', 'voter_srno', 'age', 'gender', 'voting_card_no', 'karyakarta',
+                'first_name_key', 'father_name_key', 'surname_key', 'mobile_norm', 'mobile_rev')
+
+# Text fields default to '' like the parsed cells; numbers and derived keys to None
+DEFAULTS = {field: None if field in ('booth_no', 'age') or field.endswith(('_key', '_norm', '_rev')) else ''
+            for field in VOTER_FIELDS}
+
+
+def _from_tuple(values):
+    record = object.__new__(VoterRecord)
+    for field, value in zip(VOTER_FIELDS, values):
+        setattr(record, field, value)
+    return record
+
+
+class VoterRecord:
+    __slots__ = VOTER_FIELDS
+
+    def __init__(self, **fields):
+        for field in VOTER_FIELDS:
+            setattr(self, field, fields.get(field, DEFAULTS[field]))
+
+    def __reduce__(self):
+        return _from_tuple, (self.as_tuple(),)
+
+    def __repr__(self):
+        return f'<VoterRecord {self.voter_id}>'
+
+    def as_tuple(self):
+        return tuple(getattr(self, field) for field in VOTER_FIELDS)
+
+    def as_dict(self):
+        """Insert parameters of the record, keyed by Voter column"""
+        return {field: getattr(self, field) for field in VOTER_FIELDS}
@@ -0,0 +1,7 @@
+"""
+Reproducible benchmarks for ingest, search, starring, reporting and login.
+
+    python -m benchmarks.generator --rows 100000 --format xlsx --out roll.xlsx
+    python -m benchmarks.run --rows 10000 --out results.json
+    python -m benchmarks.compare before.json after.json
+"""
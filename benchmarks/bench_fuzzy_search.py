@@ -0,0 +1,117 @@
+"""
+Benchmark recall and latency of the typo-tolerant name search index.
+
+Builds FuzzyNameIndex from a generated roll, then searches for names with one
+random typo (substitution, insertion, deletion or transposition). A query
+counts as recalled when the top results contain a voter with the intended
+name. Run from the project root:
+
+    python benchmarks/bench_fuzzy_search.py --rows 1000000 --extra-surnames 20000
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.fuzzy import FuzzyNameIndex
+from app.utils.search_keys import name_key, voter_search_keys
+from benchmarks.generator import RollGenerator, FIRST_NAMES
+
+
+def add_typo(word, rng):
+    """Apply one random edit to a Latin word"""
+    position = rng.randrange(len(word))
+    operation = rng.choice(['substitute', 'insert', 'delete', 'transpose'])
+    letter = rng.choice(string.ascii_lowercase)
+    if operation == 'substitute':
+        return word[:position] + letter + word[position + 1:]
+    if operation == 'insert':
+        return word[:position] + letter + word[position:]
+    if operation == 'delete' and len(word) > 3:
+        return word[:position] + word[position + 1:]
+    position = min(position, len(word) - 2)
+    return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--extra-surnames', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--budget-ms', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    generator = RollGenerator(args.rows, extra_surnames=args.extra_surnames)
+    latin = {devanagari: latin for latin, devanagari in FIRST_NAMES + generator.surnames}
+    voters = []
+    keys = {}
+    for voter_id, record in enumerate(generator.records(), start=1):
+        voter_keys = voter_search_keys(record['first_name'], record['father_name'], record['surname'], '')
+        keys[voter_id] = voter_keys
+        voters.append((voter_id, latin.get(record['first_name'], record['first_name']),
+                       latin.get(record['surname'], record['surname'])))
+
+    started = time.perf_counter()
+    index = FuzzyNameIndex.build((voter_id, *voter_keys.values()) for voter_id, voter_keys in keys.items())
+    build_seconds = time.perf_counter() - started
+    print(f'indexed {index.voter_count} voters, {len(index.words)} distinct name words in {build_seconds:.1f}s')
+
+    rng = random.Random(args.seed)
+    latencies = []
+    recalled = 0
+    exact_recalled = 0
+    truncated = 0
+    for query_number in range(args.queries):
+        voter_id, first_name, surname = rng.choice(voters)
+        typo = add_typo(surname.lower(), rng)
+        # Every other query also carries the correctly spelled first name
+        text = typo if query_number % 2 else f'{first_name} {typo}'
+        started = time.perf_counter()
+        results, was_truncated = index.search(text, limit=args.limit, budget_ms=args.budget_ms)
+        latencies.append(time.perf_counter() - started)
+        truncated += was_truncated
+        target = keys[voter_id]
+        fields = ('surname_key',) if query_number % 2 else ('first_name_key', 'surname_key')
+        wanted = [target[field] for field in fields]
+        if any([keys[found][field] for field in fields] == wanted for found, _ in results):
+            recalled += 1
+        # What the exact key search finds: only typos that the key folding already absorbs
+        exact_recalled += name_key(typo) == target['surname_key']
+
+    result = {
+        'rows': args.rows,
+        'distinct_words': len(index.words),
+        'build_seconds': round(build_seconds, 2),
+        'queries': args.queries,
+        'limit': args.limit,
+        'budget_ms': args.budget_ms,
+        'recall': round(recalled / args.queries, 3),
+        'exact_key_recall': round(exact_recalled / args.queries, 3),
+        'truncated': round(truncated / args.queries, 3),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2),
+    }
+    for name, value in result.items():
+        print(f'{name:<18} {value}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark the memory of an upload: per-row dicts and ORM instances against VoterRecords and Core inserts.
+
+A generated roll is parsed once; each mode then runs in its own process
+under tracemalloc against a throwaway SQLite database:
+
+- dicts: the parsed rows held as dicts and loaded as ORM Voter instances,
+  chunk by chunk (the upload path before VoterRecord)
+- records: the parsed rows held as VoterRecords and loaded with Core
+  executemany inserts, chunk by chunk
+
+Reports the memory held by the parsed rows and the peak while loading them
+(held rows included), both per 100k rows. Run from the project root:
+
+    python benchmarks/bench_ingest_memory.py --rows 100000
+"""
+import argparse
+import gc
+import json
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Add the project directory to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RollGenerator
+
+
+MODES = ('dicts', 'records')
+
+
+def megabytes_per_100k(size, rows):
+    return round(size / 2 ** 20 * 100000 / rows, 1)
+
+
+def run_mode(args):
+    """Child process: load the pickled records in one mode and measure it"""
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(args.workdir, f"{args.mode}.db")}'
+    from app.app import app
+    from app.database import db
+    from app.models.voter import Voter
+    from app.utils.ingest import iter_chunks
+
+    with app.app_context():
+        tracemalloc.start()
+        with open(os.path.join(args.workdir, 'records.pickle'), 'rb') as f:
+            rows = pickle.load(f)
+        if args.mode == 'dicts':
+            rows = [record.as_dict() for record in rows]
+        gc.collect()
+        held, _ = tracemalloc.get_traced_memory()
+
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        for chunk in iter_chunks(rows, args.chunk_rows):
+            if args.mode == 'dicts':
+                voters = [Voter(**row) for row in chunk]
+                db.session.add_all(voters)
+                db.session.commit()
+                del voters
+            else:
+                db.session.execute(Voter.__table__.insert(), [record.as_dict() for record in chunk])
+                db.session.commit()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        loaded = db.session.query(Voter).count()
+
+    print(json.dumps({'rows': loaded, 'held_mb_per_100k': megabytes_per_100k(held, len(rows)),
+                      'load_peak_mb_per_100k': megabytes_per_100k(peak, len(rows)),
+                      'load_seconds': round(elapsed, 2)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--chunk-rows', type=int, default=5000)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    from app.utils.ingest import process_excel_file
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'roll.xlsx')
+        started = time.perf_counter()
+        RollGenerator(args.rows, seed=args.seed).write_xlsx(path)
+        records = process_excel_file(path)
+        with open(os.path.join(workdir, 'records.pickle'), 'wb') as f:
+            pickle.dump(records, f)
+        print(f'built and parsed {len(records)} rows in {time.perf_counter() - started:.1f}s')
+
+        results = {}
+        for mode in MODES:
+            command = [sys.executable, os.path.abspath(__file__), '--mode', mode, '--workdir', workdir,
+                       '--chunk-rows', str(args.chunk_rows)]
+            output = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+            result = results[mode] = json.loads(output.strip().splitlines()[-1])
+            print(f'{mode:<8} held {result["held_mb_per_100k"]:7.1f} MB/100k rows  '
+                  f'load peak {result["load_peak_mb_per_100k"]:7.1f} MB/100k rows  '
+                  f'load {result["load_seconds"]:.1f}s ({result["rows"]} rows)')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rows': args.rows, 'chunk_rows': args.chunk_rows, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
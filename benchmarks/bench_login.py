@@ -0,0 +1,186 @@
+"""
+Benchmark login throughput and its impact on concurrent search latency.
+
+Each configuration runs in its own process against a throwaway SQLite
+database, served by a threaded WSGI server (like the gthread workers):
+first searches alone, then searches while several clients log in as fast as
+they can. Compares inline verification with thread and process pools and a
+lower hashing cost. Run from the project root:
+
+    python benchmarks/bench_login.py --seconds 10 --login-clients 8
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Add the project directory to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RollGenerator
+
+
+MAIN_USER = ('santosh ghanwat', 'ghanwat@187514')
+
+# name -> environment of the configuration
+CONFIGURATIONS = {
+    'inline': {'PASSWORD_VERIFY_WORKERS': '0'},
+    'threads-1': {'PASSWORD_VERIFY_WORKERS': '1', 'PASSWORD_VERIFY_POOL': 'thread'},
+    'threads-2': {'PASSWORD_VERIFY_WORKERS': '2', 'PASSWORD_VERIFY_POOL': 'thread'},
+    'processes-1': {'PASSWORD_VERIFY_WORKERS': '1', 'PASSWORD_VERIFY_POOL': 'process'},
+    'threads-1-pbkdf2-100k': {'PASSWORD_VERIFY_WORKERS': '1', 'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:100000'},
+}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+def opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect())
+
+
+def post_login(client, base):
+    """Status of a login attempt; 302 is a successful login, 200 re-renders the form with an error"""
+    data = urllib.parse.urlencode({'username': MAIN_USER[0], 'password': MAIN_USER[1]}).encode()
+    try:
+        client.open(f'{base}/login', data=data, timeout=60)
+    except urllib.error.HTTPError as e:
+        return e.code
+    return 200
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+def search_latencies(client, base, terms, seconds, bump):
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    index = 0
+    while time.perf_counter() < deadline:
+        # Every search reaches the database instead of the result cache
+        bump()
+        started = time.perf_counter()
+        request = urllib.request.Request(f'{base}/search?' + urllib.parse.urlencode({'query': terms[index % len(terms)]}),
+                                         headers={'X-Requested-With': 'XMLHttpRequest'})
+        client.open(request, timeout=60).read()
+        latencies.append(time.perf_counter() - started)
+        index += 1
+    return latencies
+
+
+def summarize(latencies):
+    return {
+        'searches': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+def run_configuration(args):
+    """Child process: serve the app and measure one configuration"""
+    from werkzeug.serving import make_server
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+    from app.app import app
+    from app.utils.search_cache import bump_data_generation
+
+    generator = RollGenerator(args.rows, seed=args.seed)
+    path = os.path.join(workdir, 'roll.xlsx')
+    generator.write_xlsx(path)
+    test_client = app.test_client()
+    test_client.post('/login', data={'username': MAIN_USER[0], 'password': MAIN_USER[1]})
+    with open(path, 'rb') as f:
+        test_client.post('/upload', data={'file': (f, 'roll.xlsx')}, content_type='multipart/form-data')
+    terms = sorted({record['surname'] for record in generator.records()})[:20]
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    searcher = opener()
+    post_login(searcher, base)
+    idle = search_latencies(searcher, base, terms, args.seconds, bump_data_generation)
+
+    stop = threading.Event()
+    logins = []
+    rejected = []
+
+    def log_in():
+        while not stop.is_set():
+            started = time.perf_counter()
+            status = post_login(opener(), base)
+            (logins if status == 302 else rejected).append(time.perf_counter() - started)
+
+    clients = [threading.Thread(target=log_in) for _ in range(args.login_clients)]
+    for thread in clients:
+        thread.start()
+    started = time.perf_counter()
+    loaded = search_latencies(searcher, base, terms, args.seconds, bump_data_generation)
+    stop.set()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    print(json.dumps({
+        'search_idle': summarize(idle),
+        'search_during_logins': summarize(loaded),
+        'logins_per_s': round(len(logins) / elapsed, 2),
+        'login_p50_ms': round(percentile(logins, 0.5) * 1000, 1) if logins else None,
+        'logins_rejected': len(rejected),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--seconds', type=float, default=10, help='duration of each measurement')
+    parser.add_argument('--login-clients', type=int, default=8)
+    parser.add_argument('--configurations', default=','.join(CONFIGURATIONS))
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_configuration(args)
+        return
+
+    results = {}
+    for name in args.configurations.split(','):
+        env = {**os.environ, **CONFIGURATIONS[name]}
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', '--rows', str(args.rows), '--seed', str(args.seed),
+             '--seconds', str(args.seconds), '--login-clients', str(args.login_clients)],
+            env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        result = results[name] = json.loads(output.strip().splitlines()[-1])
+        print(f'{name:<24} logins/s {result["logins_per_s"]:>6}  login p50 {result["login_p50_ms"]} ms  '
+              f'search p50 {result["search_idle"]["p50_ms"]} -> {result["search_during_logins"]["p50_ms"]} ms  '
+              f'p95 {result["search_idle"]["p95_ms"]} -> {result["search_during_logins"]["p95_ms"]} ms  '
+              f'rejected {result["logins_rejected"]}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'rows': args.rows, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
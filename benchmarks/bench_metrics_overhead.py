@@ -0,0 +1,102 @@
+"""
+Measure the overhead of the request/SQL instrumentation.
+
+Runs the same batch of search requests through the Flask test client with
+METRICS_ENABLED on and off, each in a fresh process against the same SQLite
+database, and reports the per-request difference. Run from the project root:
+
+    python benchmarks/bench_metrics_overhead.py --voters 5000 --requests 2000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Add the project directory to Python path
+sys.path.insert(0, ROOT)
+
+QUERIES = ['patil', 'ghan', 'ram', '98', 'k1', 'pawar', 'sunita', '12']
+
+
+def seed(voters):
+    from app.app import app, db
+    from app.models.voter import Voter
+    rng = random.Random(7)
+    names = ['Santosh', 'Ganesh', 'Sunita', 'Rekha', 'Amol']
+    surnames = ['Ghanwat', 'Patil', 'Pawar', 'Jadhav']
+    with app.app_context():
+        db.session.bulk_insert_mappings(Voter, [{
+            'voter_id': f'V{i:08d}',
+            'booth_no': rng.randint(1, 50),
+            'full_name': f'{rng.choice(names)} {rng.choice(surnames)}',
+            'mobile_no': str(rng.randint(7000000000, 9999999999)),
+            'karyakarta': f'k{rng.randint(1, 20)}',
+            'star_rating': 0,
+        } for i in range(voters)])
+        db.session.commit()
+
+
+def run(requests, rounds):
+    from app.app import app
+    from app.utils.search_cache import search_cache
+    client = app.test_client()
+    client.post('/login', data={'username': 'santosh ghanwat', 'password': 'ghanwat@187514'})
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for i in range(requests):
+            # Bump the generation so every request reaches the database
+            search_cache.bump()
+            client.get(f'/search?query={QUERIES[i % len(QUERIES)]}', headers={'X-Requested-With': 'XMLHttpRequest'})
+        timings.append((time.perf_counter() - started) / requests)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--voters', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--child', choices=['seed', 'run'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == 'seed':
+        seed(args.voters)
+        return
+    if args.child == 'run':
+        print(json.dumps(run(args.requests, args.rounds)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tmp, "bench.db")}', SLOW_REQUEST_MS='100000')
+        subprocess.run([sys.executable, __file__, '--child', 'seed', '--voters', str(args.voters)],
+                       env=env, check=True, capture_output=True)
+        results = {}
+        for enabled in ('false', 'true'):
+            output = subprocess.run([sys.executable, __file__, '--child', 'run', '--requests', str(args.requests),
+                                     '--rounds', str(args.rounds)],
+                                    env=dict(env, METRICS_ENABLED=enabled), check=True, capture_output=True, text=True)
+            results[enabled] = json.loads(output.stdout.strip().splitlines()[-1])
+
+    baseline = statistics.median(results['false'])
+    instrumented = statistics.median(results['true'])
+    overhead = (instrumented - baseline) / baseline * 100
+    print(f'metrics off: {baseline * 1000:.3f} ms/request')
+    print(f'metrics on:  {instrumented * 1000:.3f} ms/request')
+    print(f'overhead:    {overhead:+.1f}%')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'voters': args.voters, 'requests': args.requests, 'off_ms': baseline * 1000,
+                       'on_ms': instrumented * 1000, 'overhead_percent': overhead}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark bytes on the wire and modelled time to interactive of the search page.
+
+Loads a generated roll into a throwaway SQLite database, then fetches the
+search page, the assets it links and a full search JSON response with and
+without compression. Transfer times are modelled for throttled connection
+profiles (the WebPageTest 2G and 3G presets): a request costs its round
+trips plus its bytes over the profile's bandwidth, assets load in parallel
+over new connections, and the page is interactive once the HTML, CSS and
+JavaScript have arrived. A repeat visit reuses immutable cached assets.
+
+Assets that have not been vendored (python -m app.utils.assets) are still
+CDN links and are left out of the byte counts. Run from the project root:
+
+    python benchmarks/bench_page_weight.py --rows 5000
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import tempfile
+from collections import Counter
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import RollGenerator
+
+
+MAIN_USER = ('santosh ghanwat', 'ghanwat@187514')
+
+# name -> (download kbit/s, round trip ms)
+PROFILES = {
+    '2g': (280, 800),
+    '3g-slow': (400, 400),
+    '3g': (1600, 300),
+}
+
+# Round trips to open a connection: TCP and TLS 1.3
+HANDSHAKE_RTTS = 2
+
+ASSET_LINK = re.compile(r'<(?:link[^>]+href|script[^>]+src)="([^"]+)"')
+FONT_URL = re.compile(r'url\(([^)]+\.woff2)\)')
+
+
+def transfer_ms(size, profile, round_trips=1):
+    kbps, rtt = PROFILES[profile]
+    return round_trips * rtt + size * 8 / kbps
+
+
+def fetch(client, url, encoding, **kwargs):
+    """Response bytes as sent over the wire for the given Accept-Encoding"""
+    headers = dict(kwargs.pop('headers', {}))
+    if encoding:
+        headers['Accept-Encoding'] = encoding
+    response = client.get(url, headers=headers, **kwargs)
+    if response.status_code != 200:
+        raise RuntimeError(f'{url} returned {response.status_code}')
+    return response
+
+
+def decoded(response):
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        return gzip.decompress(response.data)
+    if encoding == 'br':
+        from app.utils.compression import brotli
+        return brotli.decompress(response.data)
+    return response.data
+
+
+def measure(client, search_term, encoding):
+    """Byte counts of the search page, its assets, its fonts and a search response"""
+    page = fetch(client, '/search', encoding)
+    html = decoded(page).decode('utf-8')
+    assets, fonts, cdn = {}, {}, []
+    for url in ASSET_LINK.findall(html):
+        if not url.startswith('/static/'):
+            cdn.append(url)
+            continue
+        response = fetch(client, url, encoding)
+        assets[url] = len(response.data)
+        if url.split('?')[0].endswith('.css'):
+            base = url.split('?')[0].rsplit('/', 1)[0]
+            for font in set(FONT_URL.findall(decoded(response).decode('utf-8'))):
+                font_url = os.path.normpath(f'{base}/{font.strip(chr(34) + chr(39))}')
+                fonts[font_url] = len(fetch(client, font_url, encoding).data)
+    search = fetch(client, '/search', encoding, query_string={'query': search_term},
+                   headers={'X-Requested-With': 'XMLHttpRequest'})
+    return {
+        'html_bytes': len(page.data),
+        'asset_bytes': sum(assets.values()),
+        'font_bytes': sum(fonts.values()),
+        'search_json_bytes': len(search.data),
+        'search_results': len(json.loads(decoded(search))['voters']),
+        'assets': assets,
+        'fonts': fonts,
+        'cdn_assets': cdn,
+    }
+
+
+def timings(sizes, profile, cache_assets):
+    """Modelled milliseconds to interactive on a first and a repeat visit, and for one search"""
+    html = transfer_ms(sizes['html_bytes'], profile, HANDSHAKE_RTTS + 1)
+    # Assets are discovered in the HTML and load in parallel over new connections sharing the bandwidth
+    assets = transfer_ms(sizes['asset_bytes'], profile, HANDSHAKE_RTTS + 1) if sizes['assets'] else 0
+    fonts = transfer_ms(sizes['font_bytes'], profile) if sizes['fonts'] else 0
+    # Without immutable caching every asset is revalidated with a round trip per connection
+    repeat_assets = 0 if cache_assets or not sizes['assets'] else transfer_ms(0, profile, HANDSHAKE_RTTS + 1)
+    return {
+        'first_visit_interactive_ms': round(html + assets),
+        'first_visit_loaded_ms': round(html + assets + fonts),
+        'repeat_visit_interactive_ms': round(html + repeat_assets),
+        'search_ms': round(transfer_ms(sizes['search_json_bytes'], profile)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+        os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+        from app.app import app
+
+        generator = RollGenerator(args.rows, seed=args.seed)
+        path = os.path.join(workdir, 'roll.xlsx')
+        generator.write_xlsx(path)
+        client = app.test_client()
+        client.post('/login', data={'username': MAIN_USER[0], 'password': MAIN_USER[1]})
+        with open(path, 'rb') as f:
+            client.post('/upload', data={'file': (f, 'roll.xlsx')}, content_type='multipart/form-data')
+        # The most common surname gives a full page of results
+        search_term = Counter(record['surname'] for record in generator.records()).most_common(1)[0][0]
+
+        with app.app_context():
+            plain = measure(client, search_term, None)
+            compressed = measure(client, search_term, 'gzip, deflate, br')
+
+    if plain['cdn_assets']:
+        print(f'{len(plain["cdn_assets"])} assets still load from CDNs and are not counted; '
+              'run python -m app.utils.assets to vendor them')
+    print(f'{"":<20}{"uncompressed":>14}{"compressed":>14}')
+    for key in ('html_bytes', 'asset_bytes', 'font_bytes', 'search_json_bytes'):
+        print(f'{key:<20}{plain[key]:>14}{compressed[key]:>14}')
+    print(f'search results: {compressed["search_results"]}')
+
+    results = {}
+    for profile in PROFILES:
+        results[profile] = {
+            'before': timings(plain, profile, cache_assets=False),
+            'after': timings(compressed, profile, cache_assets=True),
+        }
+        before, after = results[profile]['before'], results[profile]['after']
+        print(f'{profile}: first visit {before["first_visit_interactive_ms"]} -> {after["first_visit_interactive_ms"]} ms, '
+              f'repeat visit {before["repeat_visit_interactive_ms"]} -> {after["repeat_visit_interactive_ms"]} ms, '
+              f'search {before["search_ms"]} -> {after["search_ms"]} ms')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rows': args.rows, 'uncompressed': plain, 'compressed': compressed, 'profiles': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
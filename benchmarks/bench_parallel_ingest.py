@@ -0,0 +1,67 @@
+"""
+Benchmark parallel parsing of a multi-sheet workbook.
+
+Builds a generated roll split over several sheets and times parse_units() with
+1, 2, 4 and 8 worker processes. Run from the project root:
+
+    python benchmarks/bench_parallel_ingest.py --sheets 8 --rows 20000
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.column_mapping import normalize_headers, detect_column_mapping, compute_fallbacks
+from app.utils.ingest import discover_units, read_headers, parse_units
+from benchmarks.generator import RollGenerator
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sheets', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=10000, help='rows per sheet')
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'roll.xlsx')
+        started = time.perf_counter()
+        RollGenerator(args.sheets * args.rows, booths=args.sheets).write_xlsx(path, sheets=args.sheets)
+        print(f'built {args.sheets} sheets x {args.rows} rows in {time.perf_counter() - started:.1f}s')
+
+        # Held in memory like an upload below the spool threshold
+        with open(path, 'rb') as f:
+            workbook = io.BytesIO(f.read())
+        jobs = []
+        for unit in discover_units(workbook, 'roll.xlsx'):
+            headers = normalize_headers(read_headers(unit))
+            mapping = detect_column_mapping(headers)
+            jobs.append((unit, mapping, compute_fallbacks(headers, mapping)))
+
+        results = []
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            started = time.perf_counter()
+            parsed = parse_units(jobs, workers)
+            elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            total_rows = sum(len(rows) for rows in parsed)
+            results.append({'workers': workers, 'seconds': round(elapsed, 3), 'rows': total_rows,
+                            'rows_per_second': round(total_rows / elapsed), 'speedup': round(baseline / elapsed, 2)})
+            print(f'workers={workers:<2} {elapsed:7.2f}s  {total_rows / elapsed:9.0f} rows/s  speedup x{baseline / elapsed:.2f}')
+
+    print(f'cpu_count={os.cpu_count()}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'sheets': args.sheets, 'rows_per_sheet': args.rows, 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
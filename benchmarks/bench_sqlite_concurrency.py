@@ -0,0 +1,215 @@
+"""
+Benchmark concurrent reads and writes on SQLite with default and tuned settings.
+
+Each configuration runs in its own process against a throwaway SQLite
+database, served by a threaded WSGI server (like the gthread workers).
+Searching clients and star-rating clients run together while another client
+keeps uploading fresh rolls, the case that used to fail with "database is
+locked". Reports throughput, latency and failed requests of each client kind.
+Run from the project root:
+
+    python benchmarks/bench_sqlite_concurrency.py --seconds 20 --readers 4 --writers 4
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+# Add the project directory to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RollGenerator
+
+
+MAIN_USER = ('santosh ghanwat', 'ghanwat@187514')
+
+# name -> environment of the configuration
+CONFIGURATIONS = {
+    'default': {'SQLITE_TUNED': 'false'},
+    'tuned': {'SQLITE_TUNED': 'true'},
+}
+
+
+def opener():
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+
+def log_in(client, base):
+    data = urllib.parse.urlencode({'username': MAIN_USER[0], 'password': MAIN_USER[1]}).encode()
+    client.open(f'{base}/login', data=data, timeout=60).read()
+
+
+def request_status(client, request):
+    try:
+        with client.open(request, timeout=120) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def multipart(path):
+    """Body and content type of a form posting one file"""
+    boundary = uuid.uuid4().hex
+    with open(path, 'rb') as f:
+        data = f.read()
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n').encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def write_roll(generator, path, prefix):
+    """The generated roll with voter IDs made unique by prefix, so that every upload inserts rows"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Sheet1')
+    worksheet.append(generator.header_row())
+    for row in generator.rows_iter():
+        worksheet.append([prefix + row[0]] + row[1:])
+    workbook.save(path)
+
+
+def summarize(latencies, failures, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'per_s': round(len(ordered) / elapsed, 2),
+        'failed': failures,
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1) if ordered else None,
+        'mean_ms': round(statistics.mean(ordered) * 1000, 1) if ordered else None,
+    }
+
+
+def run_configuration(args):
+    """Child process: serve the app and measure one configuration"""
+    from werkzeug.serving import make_server
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+    from app.app import app
+    from app.utils.search_cache import bump_data_generation
+
+    generator = RollGenerator(args.rows, seed=args.seed)
+    path = os.path.join(workdir, 'roll.xlsx')
+    generator.write_xlsx(path)
+    test_client = app.test_client()
+    test_client.post('/login', data={'username': MAIN_USER[0], 'password': MAIN_USER[1]})
+    with open(path, 'rb') as f:
+        test_client.post('/upload', data={'file': (f, 'roll.xlsx')}, content_type='multipart/form-data')
+    terms = sorted({record['surname'] for record in generator.records()})[:20]
+    upload_generator = RollGenerator(args.upload_rows, seed=args.seed + 1)
+    uploads = []
+    for index in range(args.uploads):
+        upload_path = os.path.join(workdir, f'upload_{index}.xlsx')
+        write_roll(upload_generator, upload_path, f'U{index}-')
+        uploads.append(upload_path)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    stop = threading.Event()
+    results = {kind: ([], [0]) for kind in ('search', 'star', 'upload')}
+
+    def client_loop(kind, make_request, seed):
+        client = opener()
+        log_in(client, base)
+        rng = random.Random(seed)
+        latencies, failures = results[kind]
+        while not stop.is_set():
+            request = make_request(rng)
+            if request is None:
+                break
+            started = time.perf_counter()
+            status = request_status(client, request)
+            if status in (200, 302):
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures[0] += 1
+
+    def search_request(rng):
+        # Every search reaches the database instead of the result cache
+        bump_data_generation()
+        return urllib.request.Request(f'{base}/search?' + urllib.parse.urlencode({'query': rng.choice(terms)}),
+                                      headers={'X-Requested-With': 'XMLHttpRequest'})
+
+    def star_request(rng):
+        return urllib.request.Request(f'{base}/star/{rng.randint(1, args.rows)}',
+                                      data=json.dumps({'rating': rng.randint(1, 5)}).encode(),
+                                      headers={'Content-Type': 'application/json'})
+
+    pending_uploads = list(uploads)
+
+    def upload_request(rng):
+        if not pending_uploads:
+            return None
+        body, content_type = multipart(pending_uploads.pop(0))
+        return urllib.request.Request(f'{base}/upload', data=body, headers={'Content-Type': content_type})
+
+    threads = [threading.Thread(target=client_loop, args=('search', search_request, i)) for i in range(args.readers)]
+    threads += [threading.Thread(target=client_loop, args=('star', star_request, 100 + i)) for i in range(args.writers)]
+    threads.append(threading.Thread(target=client_loop, args=('upload', upload_request, 200)))
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    print(json.dumps({kind: summarize(latencies, failures[0], elapsed) for kind, (latencies, failures) in results.items()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--upload-rows', type=int, default=2000, help='rows of each concurrent upload')
+    parser.add_argument('--uploads', type=int, default=3, help='rolls uploaded during the measurement')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--configurations', default=','.join(CONFIGURATIONS))
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_configuration(args)
+        return
+
+    results = {}
+    for name in args.configurations.split(','):
+        env = {**os.environ, **CONFIGURATIONS[name]}
+        command = [sys.executable, os.path.abspath(__file__), '--child']
+        for option in ('rows', 'upload_rows', 'uploads', 'seed', 'seconds', 'readers', 'writers'):
+            command += [f'--{option.replace("_", "-")}', str(getattr(args, option))]
+        output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+        result = results[name] = json.loads(output.strip().splitlines()[-1])
+        print(f'{name:<8} ' + '  '.join(
+            f'{kind} {result[kind]["per_s"]}/s p95 {result[kind]["p95_ms"]} ms failed {result[kind]["failed"]}'
+            for kind in ('search', 'star', 'upload')))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'cpus': os.cpu_count(), 'rows': args.rows, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
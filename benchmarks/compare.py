@@ -0,0 +1,52 @@
+"""
+Compare two benchmark result files written by benchmarks.run.
+
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+
+# Metrics where a larger value is an improvement
+HIGHER_IS_BETTER = {'rows_per_s', 'stars_per_s'}
+COMPARED = ('p50_ms', 'p95_ms', 'mean_ms', 'upload_s', 'rows_per_s', 'stars_per_s')
+
+
+def flatten(results, prefix=''):
+    """Yield (scenario path, metrics dict) pairs from nested results"""
+    for name, value in results.items():
+        if isinstance(value, dict) and any(isinstance(v, dict) for v in value.values()):
+            yield from flatten(value, f'{prefix}{name}.')
+        elif isinstance(value, dict):
+            yield f'{prefix}{name}', value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare two benchmark runs')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('revision')} ({before['meta']['database']}, {before['meta']['rows']} rows)")
+    print(f"after:  {after['meta'].get('revision')} ({after['meta']['database']}, {after['meta']['rows']} rows)")
+    previous = dict(flatten(before['results']))
+    for scenario, metrics in flatten(after['results']):
+        old = previous.get(scenario)
+        if old is None:
+            continue
+        for metric in COMPARED:
+            if metric not in metrics or not old.get(metric):
+                continue
+            change = (metrics[metric] - old[metric]) / old[metric] * 100
+            better = change > 0 if metric in HIGHER_IS_BETTER else change < 0
+            marker = '+' if better else '-' if abs(change) >= 5 else ' '
+            print(f'{marker} {scenario:<28} {metric:<12} {old[metric]:>12} -> {metrics[metric]:<12} ({change:+.1f}%)')
+
+
+if __name__ == '__main__':
+    main()
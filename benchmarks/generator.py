@@ -0,0 +1,185 @@
+"""
+Deterministic generator of realistic, messy voter rolls.
+
+Rolls mix Devanagari and Latin names, are organised into booths and
+yadibhags, carry mobile numbers in the formats seen in real sheets
+("+91 98...", "98....0", spaces) and use header spellings that
+process_excel_file has to map, including a 'Name' column holding booth
+labels. The same seed always produces the same rows and headers.
+"""
+import argparse
+import csv
+import random
+
+from openpyxl import Workbook
+
+
+# (Latin, Devanagari) spellings of the same name
+FIRST_NAMES = [
+    ('Santosh', 'संतोष'), ('Ganesh', 'गणेश'), ('Sunita', 'सुनिता'), ('Rekha', 'रेखा'), ('Amol', 'अमोल'),
+    ('Vijay', 'विजय'), ('Suresh', 'सुरेश'), ('Mangesh', 'मंगेश'), ('Savita', 'सविता'), ('Anil', 'अनिल'),
+    ('Prakash', 'प्रकाश'), ('Shubhangi', 'शुभांगी'), ('Dnyaneshwar', 'ज्ञानेश्वर'), ('Kavita', 'कविता'),
+    ('Rahul', 'राहुल'), ('Pooja', 'पूजा'), ('Sachin', 'सचिन'), ('Bhagyashree', 'भाग्यश्री'), ('Nitin', 'नितीन'),
+    ('Ashwini', 'अश्विनी'), ('Tukaram', 'तुकाराम'), ('Vaishali', 'वैशाली'), ('Dattatray', 'दत्तात्रय'), ('Manisha', 'मनीषा'),
+]
+SURNAMES = [
+    ('Ghanwat', 'घनवट'), ('Patil', 'पाटील'), ('Pawar', 'पवार'), ('Jadhav', 'जाधव'), ('Shinde', 'शिंदे'),
+    ('Kulkarni', 'कुलकर्णी'), ('Deshmukh', 'देशमुख'), ('Gaikwad', 'गायकवाड'), ('Kale', 'काळे'), ('More', 'मोरे'),
+    ('Chavan', 'चव्हाण'), ('Bhosale', 'भोसले'), ('Salunkhe', 'साळुंखे'), ('Kamble', 'कांबळे'), ('Thorat', 'थोरात'),
+    ('Waghmare', 'वाघमारे'), ('Londhe', 'लोंढे'), ('Kshirsagar', 'क्षीरसागर'),
+]
+YADIBHAG_NAMES = ['गणेश नगर', 'शिवाजी नगर', 'Telco Colony', 'Sambhaji Chowk', 'महात्मा फुले वसाहत', 'Indira Nagar',
+                  'साईबाबा मंदिर परिसर', 'Gandhi Peth', 'विठ्ठलवाडी', 'Sector 12']
+BOOTH_LABELS = ['Booth {booth}: Zilla Parishad School', 'बूथ {booth} - जाहीर', 'Booth no {booth} Telco']
+
+# Syllables for additional Latin surnames, to give larger rolls a realistic vocabulary
+SURNAME_SYLLABLES = ['ka', 'ga', 'cha', 'ja', 'ta', 'da', 'na', 'pa', 'ba', 'ma', 'ra', 'la', 'va', 'sha', 'sa',
+                     'ni', 'ru', 'ke', 'to', 'de', 'bho', 'dha', 'le', 'war', 'kar', 'kul', 'pat', 'des', 'gai',
+                     'mun', 'the', 'jad', 'kam', 'lon', 'sal', 'vagh', 'shin', 'dhu', 'pol', 'mhe']
+
+# Alternative header spellings per field, as they appear in real sheets
+HEADER_VARIANTS = {
+    'voter_id': ['Voter ID', 'VOTER_ID', 'voter id ', 'Voting Card No.', 'VoterId'],
+    'voter_srno': ['Voter SrNo', 'Serial No', 'voter_srno'],
+    'booth_no': ['Booth No', 'Booth No.', 'BOOTH_NO', 'boothno'],
+    'first_name': ['EnglishName', 'First Name', 'first_name'],
+    'father_name': ['Middle Name', 'Father Name', 'father'],
+    'surname': ['Surname', 'Last Name', 'LAST_NAME'],
+    'mobile_no': ['Mobile No.', 'Mobile Number', 'Phone', 'mobile'],
+    'yadibhag_no': ['Yadibhag No', 'Yadi No', 'yadibhag_no'],
+    'yadibhag_name': ['Yadibhag Name', 'yadi name'],
+    'age': ['Age', 'AGE'],
+    'gender': ['Gender', 'GENDER'],
+    'karyakarta': ['Karyakarta', 'KARYAKARTA'],
+}
+
+# Columns written in this order; 'booth_label' is the misleading 'Name' column.
+# The voter ID comes first because 'srno' headers also match voter_id keywords.
+COLUMN_ORDER = ['voter_id', 'voter_srno', 'booth_no', 'booth_label', 'first_name', 'father_name', 'surname',
+                'yadibhag_no', 'yadibhag_name', 'age', 'gender', 'mobile_no', 'karyakarta', 'remarks']
+
+# Excel's row limit including the header row
+XLSX_MAX_ROWS = 1048575
+
+
+class RollGenerator:
+    def __init__(self, rows, seed=2024, booths=None, devanagari_share=0.4, mobile_share=0.6, extra_surnames=0):
+        self.rows = rows
+        self.seed = seed
+        self.booths = booths or max(1, rows // 1200)
+        self.devanagari_share = devanagari_share
+        self.mobile_share = mobile_share
+        header_rng = random.Random(seed)
+        self.headers = {field: header_rng.choice(variants) for field, variants in HEADER_VARIANTS.items()}
+        self.headers['booth_label'] = 'Name'
+        self.headers['remarks'] = 'Remarks'
+        self.surnames = SURNAMES + self._extra_surnames(extra_surnames)
+        self.karyakartas = [f'{first} {surname}' for (first, _), (surname, _) in
+                            zip(header_rng.sample(FIRST_NAMES, 12), header_rng.sample(SURNAMES * 2, 12))]
+
+    def _extra_surnames(self, count):
+        rng = random.Random(self.seed + 2)
+        known = {latin.lower() for latin, _ in SURNAMES}
+        names = []
+        while len(names) < count:
+            name = ''.join(rng.choice(SURNAME_SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+            if name.lower() not in known:
+                known.add(name.lower())
+                # No Devanagari spelling; both script slots hold the Latin name
+                names.append((name, name))
+        return names
+
+    def header_row(self):
+        return [self.headers[column] for column in COLUMN_ORDER]
+
+    def _mobile(self, rng):
+        if rng.random() > self.mobile_share:
+            return ''
+        digits = str(rng.randint(7000000000, 9999999999))
+        style = rng.random()
+        if style < 0.5:
+            return digits
+        if style < 0.65:
+            return f'+91 {digits[:5]} {digits[5:]}'
+        if style < 0.8:
+            return f'{digits}.0'
+        if style < 0.9:
+            return f'0{digits}'
+        return f'{digits[:5]} {digits[5:]}'
+
+    def records(self):
+        """Yield one dict per voter, keyed by voter field"""
+        rng = random.Random(self.seed + 1)
+        per_booth = max(1, self.rows // self.booths)
+        for index in range(self.rows):
+            booth = min(self.booths, index // per_booth + 1)
+            yadibhag = (index % per_booth) // 300 + 1
+            devanagari = rng.random() < self.devanagari_share
+            pick = 1 if devanagari else 0
+            first = rng.choice(FIRST_NAMES)[pick]
+            father = rng.choice(FIRST_NAMES)[pick]
+            surname = rng.choice(self.surnames)[pick]
+            yield {
+                'voter_srno': str(index % per_booth + 1),
+                'voter_id': f'MT{booth:03d}{index:08d}',
+                'booth_no': booth,
+                'booth_label': rng.choice(BOOTH_LABELS).format(booth=booth),
+                'first_name': first,
+                'father_name': father,
+                'surname': surname,
+                'yadibhag_no': f'{booth}/{yadibhag}',
+                'yadibhag_name': YADIBHAG_NAMES[(booth + yadibhag) % len(YADIBHAG_NAMES)],
+                'age': rng.randint(18, 95),
+                'gender': rng.choice(['M', 'F', 'पु', 'स्त्री']),
+                'mobile_no': self._mobile(rng),
+                'karyakarta': self.karyakartas[booth % len(self.karyakartas)],
+                'remarks': '' if rng.random() < 0.9 else rng.choice(['shifted', 'मयत', 'duplicate?']),
+            }
+
+    def rows_iter(self):
+        for record in self.records():
+            yield [record[column] for column in COLUMN_ORDER]
+
+    def write_xlsx(self, path, sheets=1):
+        """Write the roll as a streamed workbook, split over several sheets if asked or needed"""
+        sheets = max(sheets, -(-self.rows // XLSX_MAX_ROWS))
+        per_sheet = -(-self.rows // sheets)
+        workbook = Workbook(write_only=True)
+        worksheet = None
+        for index, row in enumerate(self.rows_iter()):
+            if index % per_sheet == 0:
+                worksheet = workbook.create_sheet(f'Sheet{index // per_sheet + 1}')
+                worksheet.append(self.header_row())
+            worksheet.append(row)
+        if worksheet is None:
+            workbook.create_sheet('Sheet1').append(self.header_row())
+        workbook.save(path)
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header_row())
+            writer.writerows(self.rows_iter())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic voter roll')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--booths', type=int)
+    parser.add_argument('--sheets', type=int, default=1)
+    parser.add_argument('--extra-surnames', type=int, default=0, help='additional generated surnames')
+    parser.add_argument('--format', choices=['xlsx', 'csv'], default='xlsx')
+    parser.add_argument('--out', required=True)
+    args = parser.parse_args()
+
+    generator = RollGenerator(args.rows, seed=args.seed, booths=args.booths, extra_surnames=args.extra_surnames)
+    if args.format == 'xlsx':
+        generator.write_xlsx(args.out, sheets=args.sheets)
+    else:
+        generator.write_csv(args.out)
+    print(f'wrote {args.rows} rows ({generator.booths} booths) to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
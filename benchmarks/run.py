@@ -0,0 +1,273 @@
+"""
+Run the benchmark scenarios against a fresh database and write JSON results.
+
+Scenarios: upload of a generated roll, AJAX search by each field (uncached),
+repeated cached search, bursts of star ratings, the star report and login.
+Results from different commits can be compared with benchmarks.compare.
+
+    python -m benchmarks.run --rows 10000 --out results.json
+    python -m benchmarks.run --rows 100000 --database-url postgresql://localhost/voter_bench --reset
+
+SQLite runs use a throwaway database file. A --database-url is only used
+with --reset because every table in it is dropped first.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Add the project directory to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import RollGenerator
+
+
+MAIN_USER = ('santosh ghanwat', 'ghanwat@187514')
+AJAX = {'X-Requested-With': 'XMLHttpRequest'}
+SCENARIOS = ('upload', 'search', 'search_cached', 'star_burst', 'star_report', 'login')
+
+
+def summarize(durations, **extra):
+    """Latency summary in milliseconds"""
+    ordered = sorted(durations)
+    result = {
+        'count': len(ordered),
+        'total_s': round(sum(ordered), 4),
+        'mean_ms': round(statistics.mean(ordered) * 1000, 3),
+        'p50_ms': round(ordered[len(ordered) // 2] * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    response = fn(*args, **kwargs)
+    return time.perf_counter() - started, response
+
+
+def sample_search_values(generator, per_field, seed):
+    """Pick realistic search terms for each field from the generated roll"""
+    rng = random.Random(seed)
+    step = max(1, generator.rows // (per_field * 4))
+    picked = [record for index, record in enumerate(generator.records()) if index % step == 0]
+    records = rng.sample(picked, min(per_field, len(picked)))
+    values = {
+        'query': [r['surname'] for r in records],
+        'voter_id': [r['voter_id'] for r in records],
+        'full_name': [r['first_name'] for r in records],
+        'booth_no': [str(r['booth_no']) for r in records],
+        'mobile_no': [''.join(ch for ch in r['mobile_no'] if ch.isdigit())[-6:] or '98' for r in records],
+        'yadibhag_no': [r['yadibhag_no'] for r in records],
+        'yadibhag_name': [r['yadibhag_name'] for r in records],
+        'voter_srno': [r['voter_srno'] for r in records],
+        'age': [str(r['age']) for r in records],
+        'gender': [r['gender'] for r in records],
+        'karyakarta': [r['karyakarta'] for r in records],
+    }
+    return values
+
+
+def reset_database(url):
+    """Drop every table so that the app starts from an empty schema"""
+    from sqlalchemy import MetaData, create_engine
+    engine = create_engine(url)
+    metadata = MetaData()
+    metadata.reflect(engine)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def login(client):
+    response = client.post('/login', data={'username': MAIN_USER[0], 'password': MAIN_USER[1]})
+    if response.status_code != 302:
+        raise RuntimeError(f'login failed with status {response.status_code}')
+
+
+def run_upload(client, voter_model, generator, workdir):
+    # Uploads only accept workbooks, so the roll is always written as .xlsx here
+    path = os.path.join(workdir, 'roll.xlsx')
+    started = time.perf_counter()
+    generator.write_xlsx(path)
+    generate_s = time.perf_counter() - started
+
+    with open(path, 'rb') as f:
+        duration, response = timed(client.post, '/upload', data={'file': (f, os.path.basename(path))},
+                                   content_type='multipart/form-data')
+    loaded = voter_model.query.count()
+    return {
+        'rows': generator.rows,
+        'rows_loaded': loaded,
+        'status': response.status_code,
+        'file_bytes': os.path.getsize(path),
+        'generate_s': round(generate_s, 3),
+        'upload_s': round(duration, 3),
+        'rows_per_s': round(loaded / duration, 1) if duration else None,
+    }
+
+
+def run_search(client, bump, values):
+    results = {}
+    for field, terms in values.items():
+        durations = []
+        hits = 0
+        for term in terms:
+            # Invalidate the result cache so every request reaches the database
+            bump()
+            duration, response = timed(client.get, '/search', query_string={field: term}, headers=AJAX)
+            durations.append(duration)
+            hits += len(response.json['voters'])
+        results[field] = summarize(durations, mean_results=round(hits / len(terms), 1))
+    return results
+
+
+def run_search_cached(client, values, repeats):
+    terms = values['full_name'][:5]
+    durations = []
+    for _ in range(repeats):
+        for term in terms:
+            duration, _ = timed(client.get, '/search', query_string={'full_name': term}, headers=AJAX)
+            durations.append(duration)
+    return summarize(durations)
+
+
+def run_star_burst(client, voter_ids, bursts, burst_size, seed):
+    rng = random.Random(seed)
+    durations = []
+    burst_times = []
+    failures = 0
+    for _ in range(bursts):
+        started = time.perf_counter()
+        for voter_id in rng.sample(voter_ids, min(burst_size, len(voter_ids))):
+            duration, response = timed(client.post, f'/star/{voter_id}', json={'rating': rng.randint(1, 5)})
+            durations.append(duration)
+            failures += response.status_code != 200
+        burst_times.append(time.perf_counter() - started)
+    total = sum(burst_times)
+    return summarize(durations, failures=failures, stars_per_s=round(len(durations) / total, 1) if total else None)
+
+
+def run_star_report(client, repeats):
+    durations = []
+    for _ in range(repeats):
+        duration, response = timed(client.get, '/star_report')
+        if response.status_code != 200:
+            raise RuntimeError(f'star report returned {response.status_code}')
+        durations.append(duration)
+    return summarize(durations)
+
+
+def run_login(app, repeats):
+    durations = []
+    for _ in range(repeats):
+        client = app.test_client()
+        duration, response = timed(client.post, '/login', data={'username': MAIN_USER[0], 'password': MAIN_USER[1]})
+        if response.status_code != 302:
+            raise RuntimeError(f'login returned {response.status_code}')
+        durations.append(duration)
+    return summarize(durations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the voter management benchmark scenarios')
+    parser.add_argument('--rows', type=int, default=10000, help='voters in the generated roll (10k to 1M)')
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--database-url', help='database to benchmark against instead of a throwaway SQLite file')
+    parser.add_argument('--reset', action='store_true', help='drop all tables in --database-url before running')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--searches', type=int, default=20, help='searches per field')
+    parser.add_argument('--bursts', type=int, default=5)
+    parser.add_argument('--burst-size', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=10, help='repetitions of report, login and cached search')
+    parser.add_argument('--out', help='write JSON results to this file')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    if args.database_url and not args.reset:
+        parser.error('--database-url drops every table; pass --reset to confirm')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database_url = args.database_url or f'sqlite:///{os.path.join(workdir, "bench.db")}'
+        if args.database_url:
+            reset_database(database_url)
+        os.environ['DATABASE_URL'] = database_url
+        # Keep benchmark numbers free of slow request warnings and profiler hooks
+        os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+
+        from app.app import app
+        from app.models.voter import Voter
+        from app.utils.search_cache import bump_data_generation
+
+        generator = RollGenerator(args.rows, seed=args.seed)
+        client = app.test_client()
+        login(client)
+        results = {}
+
+        with app.app_context():
+            if 'upload' in scenarios:
+                results['upload'] = run_upload(client, Voter, generator, workdir)
+                print(f"upload: {results['upload']['rows_loaded']} rows in {results['upload']['upload_s']}s")
+            voter_ids = [row[0] for row in Voter.query.with_entities(Voter.id).all()]
+
+            if 'search' in scenarios and voter_ids:
+                values = sample_search_values(generator, args.searches, args.seed)
+                results['search'] = run_search(client, bump_data_generation, values)
+                for field, summary in results['search'].items():
+                    print(f"search {field}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms")
+            if 'search_cached' in scenarios and voter_ids:
+                values = sample_search_values(generator, 5, args.seed)
+                results['search_cached'] = run_search_cached(client, values, args.repeats)
+                print(f"search (cached): p50 {results['search_cached']['p50_ms']} ms")
+            if 'star_burst' in scenarios and voter_ids:
+                results['star_burst'] = run_star_burst(client, voter_ids, args.bursts, args.burst_size, args.seed)
+                print(f"star bursts: {results['star_burst']['stars_per_s']} stars/s")
+            if 'star_report' in scenarios:
+                results['star_report'] = run_star_report(client, args.repeats)
+                print(f"star report: p50 {results['star_report']['p50_ms']} ms")
+            if 'login' in scenarios:
+                results['login'] = run_login(app, args.repeats)
+                print(f"login: p50 {results['login']['p50_ms']} ms")
+
+            dialect = app.extensions['sqlalchemy'].engine.dialect.name
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'database': dialect,
+            'rows': args.rows,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'results written to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
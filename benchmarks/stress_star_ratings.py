@@ -0,0 +1,133 @@
+"""
+Stress concurrent star ratings on the same voters and check the audit log.
+
+Serves the app with a threaded WSGI server (like the gthread workers)
+against a throwaway SQLite database, or the database given with
+--database-url, and lets many clients rate and unrate a handful of voters
+at once. Afterwards every voter's star logs, in id order, must form an
+unbroken chain: each old_rating equals the previous new_rating, the first
+starts from 0 and the last matches the voter's current rating, with one log
+per successful request. Exits with status 1 when the log is inconsistent.
+Run from the project root:
+
+    python benchmarks/stress_star_ratings.py --clients 16 --requests 50 --voters 3
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+# Add the project directory to Python path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.bench_sqlite_concurrency import MAIN_USER, opener, log_in, request_status
+from benchmarks.generator import RollGenerator
+
+
+def check_chains(voters, logs):
+    """Problems found in the logs of {voter id: rating}; logs are (voter_id, old_rating, new_rating) in id order"""
+    problems = []
+    previous = {voter_id: 0 for voter_id in voters}
+    for voter_id, old_rating, new_rating in logs:
+        if old_rating != previous[voter_id]:
+            problems.append(f'voter {voter_id}: log replaced {old_rating} but the rating was {previous[voter_id]}')
+        previous[voter_id] = new_rating
+    for voter_id, rating in voters.items():
+        if previous[voter_id] != rating:
+            problems.append(f'voter {voter_id}: rated {rating} but the last log set {previous[voter_id]}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='rating requests per client')
+    parser.add_argument('--voters', type=int, default=3, help='voters all clients rate')
+    parser.add_argument('--unstar-share', type=float, default=0.2, help='share of requests removing the rating')
+    parser.add_argument('--database-url', help='database to run against instead of a throwaway SQLite file')
+    args = parser.parse_args()
+
+    from werkzeug.serving import make_server
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(workdir, "stress.db")}'
+    os.environ.setdefault('SLOW_REQUEST_MS', str(10 ** 9))
+    from app.app import app
+    from app.database import db
+    from app.models.star_log import StarLog
+    from app.models.voter import Voter
+
+    path = os.path.join(workdir, 'roll.xlsx')
+    RollGenerator(max(args.voters, 10)).write_xlsx(path)
+    test_client = app.test_client()
+    test_client.post('/login', data={'username': MAIN_USER[0], 'password': MAIN_USER[1]})
+    with open(path, 'rb') as f:
+        test_client.post('/upload', data={'file': (f, 'roll.xlsx')}, content_type='multipart/form-data')
+    with app.app_context():
+        voter_ids = [voter_id for (voter_id,) in db.session.query(Voter.id).order_by(Voter.id).limit(args.voters)]
+        # Chains are checked from the first log on
+        db.session.query(StarLog).filter(StarLog.voter_id.in_(voter_ids)).delete(synchronize_session=False)
+        db.session.query(Voter).filter(Voter.id.in_(voter_ids)).update({'star_rating': 0}, synchronize_session=False)
+        db.session.commit()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    statuses = {}
+    lock = threading.Lock()
+    start = threading.Barrier(args.clients)
+
+    def client_loop(seed):
+        client = opener()
+        log_in(client, base)
+        rng = random.Random(seed)
+        start.wait()
+        for _ in range(args.requests):
+            voter_id = rng.choice(voter_ids)
+            if rng.random() < args.unstar_share:
+                request = urllib.request.Request(f'{base}/unstar/{voter_id}', data=b'')
+            else:
+                request = urllib.request.Request(f'{base}/star/{voter_id}',
+                                                 data=json.dumps({'rating': rng.randint(1, 5)}).encode(),
+                                                 headers={'Content-Type': 'application/json'})
+            status = request_status(client, request)
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    threads = [threading.Thread(target=client_loop, args=(seed,)) for seed in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    with app.app_context():
+        voters = dict(db.session.query(Voter.id, Voter.star_rating).filter(Voter.id.in_(voter_ids)))
+        logs = db.session.query(StarLog.voter_id, StarLog.old_rating, StarLog.new_rating) \
+            .filter(StarLog.voter_id.in_(voter_ids)).order_by(StarLog.id).all()
+    problems = check_chains(voters, logs)
+    if len(logs) != statuses.get(200, 0):
+        problems.append(f'{len(logs)} logs for {statuses.get(200, 0)} successful requests')
+
+    total = args.clients * args.requests
+    print(f'{total} requests on {len(voter_ids)} voters in {elapsed:.1f}s ({total / elapsed:.0f}/s), '
+          f'status counts {dict(sorted(statuses.items()))}, {len(logs)} logs')
+    for problem in problems[:20]:
+        print(problem)
+    print('audit log consistent' if not problems else f'{len(problems)} inconsistencies')
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,12 @@
+import os
+
 timeout = 300
 workers = 1
-worker_class = 'sync'
+# Threads instead of sync workers so that open live update streams (/events/stars) do not block other requests;
+# EVENTS_MAX_STREAMS caps the threads streams may hold. With GUNICORN_WORKER_CLASS=gevent (pip install gevent)
+# a stream only holds a greenlet, so EVENTS_MAX_STREAMS can be raised to the number of open search pages
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS') or 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS') or 16)
 max_requests = 50
 max_requests_jitter = 5
 preload_app = True